@@ -4,16 +4,31 @@ import json
 import argparse
 import subprocess
 import shutil
-from openai import OpenAI
 from src.sandbox import Sandbox
 from src.planner import Planner
 from src.synthesizer import Synthesizer
 from src.image_selector import ImageSelector
+from src.llm_client import get_shared_client_pool
+from src.model_router import ModelRouter, parse_route_specs
+from src.compression_scheduler import CompressionScheduler
+from src.background_compression import BackgroundCompressor
+from src.tokenizer import get_tokenizer, set_default_model
+from src.observation_delta import ObservationDeltaEncoder
+from src.observation_pager import ObservationPager, handle_hint
+from src.trajectory_monitor import TrajectoryMonitor
+from src.version_solver import VersionSolver
+from src.repo_index import RepoIndex
+from src.context_packer import ContextPacker, describe_dropped
+from src.image_prefetcher import ImagePrefetcher
+from src.image_catalog import ImageCatalog
+from src.language_handlers import get_language_handler
 from src.observation_compressor import (
     AgentStep,
+    CompressionRecord,
     ObservationCompressor,
     RunTokenLedger,
     build_observation_metadata,
+    estimate_tokens,
     should_apply_compression,
 )
 from dotenv import load_dotenv
@@ -23,6 +38,9 @@ from dotenv import load_dotenv
 load_dotenv(override=True)
 
 class DockerAgent:
+    # Token budget for the relevant config files packed into the planner prompt.
+    PLANNER_CONTEXT_TOKEN_BUDGET = 8000
+
     def __init__(
         self,
         repo_url,
@@ -31,6 +49,18 @@ class DockerAgent:
         workplace="workplace",
         base_commit=None,
         enable_observation_compression=False,
+        model_routes=None,
+        enable_batch_actions=False,
+        enable_tool_calling=False,
+        enable_trajectory_monitor=True,
+        enable_image_prefetch=True,
+        enable_image_catalog=True,
+        catalog_tie_break=False,
+        context_budget_tokens=32000,
+        enable_background_compression=True,
+        enable_delta_observations=True,
+        enable_batch_compression=True,
+        enable_output_paging=True,
     ):
         self.repo_url = repo_url
         self.workplace = os.path.abspath(workplace)
@@ -45,18 +75,29 @@ class DockerAgent:
         self.run_summary_path = os.path.join(self.workplace, "agent_run_summary.json")
         self._environment_revision = 0
         self._current_verification_group = []
-        self.enable_observation_compression = enable_observation_compression
-        self.compression_delay = 2
-        self.compression_context_before = 1
-        self.compression_threshold_chars = 1500
-        self.compression_benefit_tokens = 300
-        self.agent_steps = []
         self.run_token_ledger = RunTokenLedger()
-        self.compression_stats = {
-            "candidate_steps": 0,
-            "compressed_steps": 0,
-            "saved_tokens_est": 0,
+        self._init_compression_state(
+            enable_observation_compression=enable_observation_compression,
+            context_budget_tokens=context_budget_tokens,
+            enable_background_compression=enable_background_compression,
+            enable_delta_observations=enable_delta_observations,
+            enable_batch_compression=enable_batch_compression,
+            enable_output_paging=enable_output_paging,
+        )
+        self.enable_batch_actions = enable_batch_actions
+        self.enable_tool_calling = enable_tool_calling
+        self.trajectory_monitor = TrajectoryMonitor() if enable_trajectory_monitor else None
+        self.batch_stats = {
+            "batches": 0,
+            "batched_commands": 0,
+            "rejected_batches": 0,
         }
+        self.context_packing = None
+        # Pulls likely base images while the selector's remaining LLM calls run.
+        self.image_prefetcher = ImagePrefetcher() if enable_image_prefetch else None
+        # Probed tools/runtimes of base images, cached on disk by image id.
+        self.image_catalog = ImageCatalog() if enable_image_catalog else None
+        self.base_image_capabilities = None
         
         # 1. Prepare local workplace and clone repo
         self._prepare_workplace()
@@ -73,17 +114,30 @@ class DockerAgent:
         if not api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables.")
             
-        self.client = OpenAI(
+        # One process-wide pool: keep-alive connections, rate limiting and retries
+        # are shared by every agent (and every component) in this process.
+        self.client = get_shared_client_pool(
             api_key=api_key,
             base_url=base_url if base_url else None
         )
+        # The pool outlives this run; the summary reports only this run's calls.
+        self._client_stats_at_start = self.client.get_stats()
+        # Route each call type (planner, relevance, compression, ...) to its own
+        # model chain; unrouted call types use `model`.
+        self.model_router = ModelRouter(self.client, model, routes=model_routes)
+        # Budgets and compression savings are counted in planner-model tokens.
+        set_default_model(self.model_router.model_for("planner"))
         
         # 4. Auto-detect base image if set to "auto" or not specified
         platform_override = None
         log_dir = os.path.join(self.workplace, "image_selector_logs")
         if base_image == "auto":
             print("[DockerAgent] Analyzing repository to select optimal base image...")
-            selector = ImageSelector(self.client, model)
+            selector = ImageSelector(
+                self.client, model, router=self.model_router,
+                prefetcher=self.image_prefetcher, catalog=self.image_catalog,
+                catalog_tie_break=catalog_tie_break,
+            )
             selected_image, language_handler, docs, platform_override = selector.select_base_image(
                 repo_path=self.workplace,
                 platform="linux",
@@ -96,6 +150,7 @@ class DockerAgent:
                 output_tokens=usage["output_tokens"],
             )
             base_image = selected_image
+            self.repo_index = selector.index
             self.language_handler = language_handler
             self.repo_docs = docs
             print(f"[DockerAgent] Selected base image: {base_image}")
@@ -103,6 +158,7 @@ class DockerAgent:
                 print(f"[DockerAgent] Platform override: {platform_override} (for ARM64 compatibility)")
             print(f"[DockerAgent] Image selection logs saved to: {log_dir}")
         else:
+            self.repo_index = RepoIndex.build(self.workplace)
             # Use specified base image with legacy detection for Python
             if base_image.startswith("python:"):
                 detected = self._detect_python_image()
@@ -117,8 +173,13 @@ class DockerAgent:
             base_image=base_image, 
             workdir="/app", 
             platform=platform_override,  # Use linux/amd64 if ARM64 issues detected
-            seed_dir=self.workplace
+            seed_dir=self.workplace,
+            prefetcher=self.image_prefetcher,
         )
+        if self.image_prefetcher:
+            self.image_prefetcher.shutdown()
+        if self.image_catalog:
+            self.base_image_capabilities = self.image_catalog.lookup(base_image, platform_override)
         self.platform_override = platform_override  # Expose for adapter to read
         
         # 6. Initialize Planner and Synthesizer
@@ -143,23 +204,24 @@ class DockerAgent:
                 with open(summary_file, 'r') as f:
                     summary = json.load(f)
                 relevant_files = summary.get("relevant_files", [])
-                config_contents = []
+                # Served from the index the selector already read.
+                files_content = {}
                 for rel_file in relevant_files:
-                    file_path = os.path.join(self.workplace, rel_file)
-                    if os.path.exists(file_path) and os.path.getsize(file_path) < 50000:  # Skip files > 50KB
-                        try:
-                            with open(file_path, 'r') as f:
-                                content = f.read()
-                            # Truncate very long files to first 200 lines
-                            lines = content.split('\n')
-                            if len(lines) > 200:
-                                content = '\n'.join(lines[:200]) + f"\n... ({len(lines) - 200} more lines truncated)"
-                            config_contents.append(f"=== {rel_file} ===\n{content}\n")
-                        except Exception as e:
-                            print(f"[DockerAgent] Warning: Could not read {rel_file}: {e}")
-                if config_contents:
-                    config_files_content = "\n".join(config_contents)
-                    print(f"[DockerAgent] Loaded {len(config_contents)} relevant config files")
+                    content = self.repo_index.read_text(rel_file)
+                    if content is None:
+                        print(f"[DockerAgent] Warning: Could not read {rel_file}")
+                        continue
+                    files_content[rel_file] = content
+                if files_content:
+                    packed = ContextPacker(
+                        self.PLANNER_CONTEXT_TOKEN_BUDGET, file_template="=== {path} ===\n{content}\n"
+                    ).pack(files_content)
+                    config_files_content = packed.text
+                    self.context_packing = packed.report()
+                    print(
+                        f"[DockerAgent] Packed {len(files_content)} relevant config files into "
+                        f"{packed.used_tokens}/{self.PLANNER_CONTEXT_TOKEN_BUDGET} tokens; {describe_dropped(packed)}"
+                    )
             except Exception as e:
                 print(f"[DockerAgent] Warning: Could not read summary.json: {e}")
         
@@ -167,131 +229,105 @@ class DockerAgent:
         combined_repo_info = repo_structure
         if config_files_content:
             combined_repo_info += "\n\n=== Relevant Configuration Files ===\n\n" + config_files_content
+        base_image_hint = self.image_catalog.setup_hint(base_image, platform_override) if self.image_catalog else ""
+        if base_image_hint:
+            combined_repo_info += "\n\n=== Base Image ===\n" + base_image_hint
         
         # Setup log directory for LLM calls (similar to image_selector_logs)
         setup_log_dir = os.path.join(self.workplace, "setup_logs")
         os.makedirs(setup_log_dir, exist_ok=True)
         
-        self.planner = Planner(self.client, model=model, language_handler=self.language_handler, repo_structure=combined_repo_info, log_dir=setup_log_dir)
+        self.planner = Planner(
+            self.model_router.bind("planner"),
+            model=self.model_router.model_for("planner"),
+            language_handler=self.language_handler,
+            repo_structure=combined_repo_info,
+            log_dir=setup_log_dir,
+            batch_actions=self.enable_batch_actions,
+            tool_calling=self.enable_tool_calling,
+            output_paging=self.observation_pager is not None,
+        )
         self.synthesizer = Synthesizer(base_image=base_image)
-        self.observation_compressor = None
         if self.enable_observation_compression:
-            self.observation_compressor = ObservationCompressor(self.client, model=model)
+            self._attach_observation_compressor(ObservationCompressor(
+                self.model_router.bind("compression"),
+                model=self.model_router.model_for("compression"),
+            ))
             self.planner.init_managed_history(self.repo_url)
         print(f"[DockerAgent] Setup logs will be saved to: {setup_log_dir}")
 
-    def _detect_python_image(self):
+    def _init_compression_state(
+        self,
+        enable_observation_compression=False,
+        context_budget_tokens=32000,
+        enable_background_compression=True,
+        enable_delta_observations=True,
+        enable_batch_compression=True,
+        enable_output_paging=True,
+    ):
         """
-        Scan project files to determine the required Python version.
-        Returns a docker image tag like 'python:3.9', or None if undetermined.
-        Priority: .python-version > pyproject.toml > setup.cfg > setup.py > CI configs > tox.ini
+        Managed-history and observation compression state, without a compressor.
+        `_attach_observation_compressor` adds one once the LLM client exists.
         """
-        wp = self.workplace
-
-        def _usable(ver_str):
-            """Only accept Python 3.6+; discard Python 2.x or very old 3.x"""
-            try:
-                parts = ver_str.split('.')
-                major, minor = int(parts[0]), int(parts[1])
-                return major == 3 and minor >= 6
-            except Exception:
-                return False
-
-        def _parse_version_spec(spec):
-            """Extract a concrete version from a specifier like '>=3.8,<3.11' or '==3.9.*'"""
-            spec = spec.strip().replace(' ', '')
-            # exact: ==3.9 or ==3.9.*
-            m = re.search(r'==\s*(\d+\.\d+)', spec)
-            if m and _usable(m.group(1)):
-                return m.group(1)
-            # lower-bound: >=3.x
-            m = re.search(r'>=\s*(\d+\.\d+)', spec)
-            if m and _usable(m.group(1)):
-                return m.group(1)
-            # ~=3.x
-            m = re.search(r'~=\s*(\d+\.\d+)', spec)
-            if m and _usable(m.group(1)):
-                return m.group(1)
-            return None
+        self.enable_observation_compression = enable_observation_compression
+        self.compression_delay = 2
+        self.compression_context_before = 1
+        self.compression_threshold_chars = 1500
+        self.compression_benefit_tokens = 300
+        # Predicts savings and gates LLM compression on context pressure.
+        self.compression_scheduler = CompressionScheduler(
+            context_budget_tokens=context_budget_tokens,
+            benefit_threshold_tokens=self.compression_benefit_tokens,
+        )
+        # LLM compression calls per step; one call covers up to max_compression_batch_size steps.
+        self.max_llm_compressions_per_step = 1
+        self.max_compression_batch_size = 4 if enable_batch_compression else 1
+        self.enable_background_compression = enable_background_compression
+        self.observation_compressor = None
+        self.background_compressor = None
+        # Repeated build/test outputs reach the planner as deltas (managed history only).
+        self.delta_encoder = (
+            ObservationDeltaEncoder() if enable_observation_compression and enable_delta_observations else None
+        )
+        # Long outputs reach the planner as head/tail views; `show_output` pages in the rest.
+        # Part of observation compression: without it the planner sees full outputs.
+        self.observation_pager = (
+            ObservationPager() if enable_observation_compression and enable_output_paging else None
+        )
+        self._max_steps = 0
+        self.agent_steps = []
+        self.compression_stats = {
+            "candidate_steps": 0,
+            "compressed_steps": 0,
+            "rule_compressed_steps": 0,
+            "cache_hits": 0,
+            "delta_encoded_steps": 0,
+            "delta_expanded_steps": 0,
+            "saved_tokens_est": 0,
+        }
 
-        # 1. .python-version (e.g. "3.9.7" or "3.9")
-        pv_file = os.path.join(wp, ".python-version")
-        if os.path.exists(pv_file):
-            with open(pv_file) as f:
-                ver = f.read().strip().split('\n')[0]
-            m = re.match(r'(\d+\.\d+)', ver)
-            if m and _usable(m.group(1)):
-                return f"python:{m.group(1)}"
-
-        # 2. pyproject.toml  requires-python
-        pp = os.path.join(wp, "pyproject.toml")
-        if os.path.exists(pp):
-            with open(pp) as f:
-                content = f.read()
-            m = re.search(r'requires-python\s*=\s*["\']([^"\']+)["\']', content)
-            if m:
-                ver = _parse_version_spec(m.group(1))
-                if ver:
-                    return f"python:{ver}"
-
-        # 3. setup.cfg  python_requires
-        sc = os.path.join(wp, "setup.cfg")
-        if os.path.exists(sc):
-            with open(sc) as f:
-                content = f.read()
-            m = re.search(r'python_requires\s*=\s*(.+)', content)
-            if m:
-                ver = _parse_version_spec(m.group(1))
-                if ver:
-                    return f"python:{ver}"
-
-        # 4. setup.py  python_requires
-        sp = os.path.join(wp, "setup.py")
-        if os.path.exists(sp):
-            with open(sp) as f:
-                content = f.read()
-            m = re.search(r'python_requires\s*=\s*["\']([^"\']+)["\']', content)
-            if m:
-                ver = _parse_version_spec(m.group(1))
-                if ver:
-                    return f"python:{ver}"
-
-        # 5. GitHub Actions workflow files
-        actions_dir = os.path.join(wp, ".github", "workflows")
-        if os.path.isdir(actions_dir):
-            for fname in os.listdir(actions_dir):
-                if not fname.endswith(('.yml', '.yaml')):
-                    continue
-                with open(os.path.join(actions_dir, fname)) as f:
-                    content = f.read()
-                # python-version: "3.x" or ["3.x", ...]
-                versions = re.findall(r'python-version["\s:]+["\[]*(3\.\d+)', content)
-                usable = [v for v in versions if _usable(v)]
-                if usable:
-                    return f"python:{sorted(usable)[0]}"  # lowest usable
-
-        # 6. .travis.yml
-        travis = os.path.join(wp, ".travis.yml")
-        if os.path.exists(travis):
-            with open(travis) as f:
-                content = f.read()
-            versions = re.findall(r'["\s-]+(3\.\d+)["\s]', content)
-            usable = [v for v in versions if _usable(v)]
-            if usable:
-                return f"python:{sorted(usable)[0]}"
-
-        # 7. tox.ini  envlist (pyXY style, Python 3.6+)
-        tox = os.path.join(wp, "tox.ini")
-        if os.path.exists(tox):
-            with open(tox) as f:
-                content = f.read()
-            versions = [(int(a), int(b)) for a, b in re.findall(r'py(\d)(\d+)', content)
-                        if int(a) == 3 and int(b) >= 6]
-            if versions:
-                major, minor = sorted(versions)[0]
-                return f"python:{major}.{minor}"
+    def _attach_observation_compressor(self, compressor):
+        self.observation_compressor = compressor
+        self.compression_scheduler.is_cached = compressor.has_cached_result
+        if self.enable_background_compression:
+            # LLM compressions overlap with the next planner call and sandbox command.
+            self.background_compressor = BackgroundCompressor(compressor)
 
-        return None
+    def _detect_python_image(self):
+        """
+        Determine the required Python version from project files.
+        Returns a docker image tag like 'python:3.9', or None if undetermined.
+        Declarations (.python-version, requires-python, python_requires, classifiers,
+        CI matrices, tox envlist) are resolved by the shared VersionSolver.
+        """
+        decision = VersionSolver(
+            self.repo_index.read_text, self.repo_index.manifest_files()
+        ).solve(
+            "python", get_language_handler("python").base_images("linux")
+        )
+        if not decision.image:
+            print(f"[Auto-detect] Python version undetermined: {decision.reason}")
+        return decision.image
 
     def _prepare_workplace(self):
         """Clones the repository to the local workplace directory."""
@@ -328,6 +364,7 @@ class DockerAgent:
     def run(self, max_steps=30, keep_container=False):
         """Runs the ReAct loop to configure the environment."""
         print(f"Starting agent for repository: {self.repo_url}")
+        self._max_steps = max_steps
         observation = None
         configuration_success = False  # 成功标志位
         run_error = None
@@ -338,6 +375,7 @@ class DockerAgent:
                 
                 # 1. Plan next step
                 if self.enable_observation_compression:
+                    self._collect_background_compressions()
                     thought, action, raw_llm_output, is_finished, usage_info = self.planner.plan(
                         repo_url=self.repo_url,
                         manage_history=False,
@@ -351,6 +389,7 @@ class DockerAgent:
                     "planner",
                     input_tokens=usage_info["input_tokens"],
                     output_tokens=usage_info["output_tokens"],
+                    estimated_input_tokens=usage_info.get("estimated_input_tokens", 0),
                 )
                 
                 print(
@@ -364,7 +403,10 @@ class DockerAgent:
                     print(raw_llm_output)
                     # Success must be backed by an actual effective test command observed at runtime.
                     if "Final Answer: Success" in raw_llm_output:
-                        if self._finalize_verification_from_agent_report(raw_llm_output):
+                        if self._finalize_verification_from_agent_report(
+                            raw_llm_output,
+                            bundle=self.planner.last_verification_bundle,
+                        ):
                             configuration_success = True
                         elif self.verified_test_command:
                             self.verification_source = "heuristic_fallback"
@@ -377,9 +419,20 @@ class DockerAgent:
                 if thought:
                     print(f"\n[Thought]\n{thought}")
 
+                # A plain `Action:` wins over an `Actions:` batch if the planner emitted both.
+                batch_actions = None if action else self.planner.last_batch_actions
+                if batch_actions:
+                    action = "\n".join(batch_actions)
+
                 if not action:
                     print("\n[Warning] No Action detected. Asking Planner to clarify.")
-                    observation = "Error: No command found. Please specify an action in 'Action: <command>' format."
+                    if self.enable_tool_calling:
+                        observation = "Error: No command found. Please call the `run_command` tool with the next command."
+                    else:
+                        observation = "Error: No command found. Please specify an action in 'Action: <command>' format."
+                    observation, stop_run = self._check_trajectory(
+                        step + 1, max_steps, "", False, observation
+                    )
                     if self.enable_observation_compression:
                         self._record_agent_step(
                             step_id=step + 1,
@@ -393,24 +446,30 @@ class DockerAgent:
                             env_revision_after=self._environment_revision,
                             planner_usage=usage_info,
                         )
+                    if stop_run:
+                        break
                     continue
 
                 print(f"\n[Action]\n{action}")
                 
-                # 2. Execute Action in Sandbox
+                # 2. Execute Action(s) in Sandbox and 3. synthesize if successful
                 env_revision_before = self._environment_revision
-                success, observation = self.sandbox.execute(action)
-                
-                print(f"\n[Observation]\n{observation if observation.strip() else '(No output)'}")
-                
-                # 3. Synthesize if successful
-                mutates_environment = False
-                if success:
-                    self.synthesizer.record_success(action)
-                    mutates_environment = self.synthesizer.command_mutates_environment(action)
-                    self._record_successful_action(step + 1, action, observation)
+                is_batch = bool(batch_actions) and len(batch_actions) > 1
+                served = self.observation_pager.serve(action) if self.observation_pager and not is_batch else None
+                if served is not None:
+                    # Answered from the stored output on the host; nothing runs in the sandbox.
+                    success, observation, mutates_environment = True, served, False
+                    print(f"\n[Observation]\n{observation}")
+                elif is_batch:
+                    success, observation, mutates_environment = self._run_batch(step + 1, batch_actions)
                 else:
-                    print("\n[System] Command failed. Sandbox rolled back to previous state.")
+                    success, observation, mutates_environment = self._run_action(step + 1, action)
+                observation, stop_run = self._check_trajectory(
+                    step + 1, max_steps, action, success, observation
+                )
+                observation_prompt = observation
+                if self.observation_pager and served is None:
+                    observation_prompt = self.observation_pager.add(step + 1, observation)
 
                 if self.enable_observation_compression:
                     self._record_agent_step(
@@ -424,7 +483,11 @@ class DockerAgent:
                         env_revision_before=env_revision_before,
                         env_revision_after=self._environment_revision,
                         planner_usage=usage_info,
+                        observation_prompt=observation_prompt,
                     )
+                observation = observation_prompt
+                if stop_run:
+                    break
 
             # 4. Final Output - 只有配置成功才生成 Dockerfile
             if configuration_success:
@@ -440,9 +503,103 @@ class DockerAgent:
             run_error = str(e)
             print(f"An error occurred during execution: {e}")
         finally:
+            if self.background_compressor:
+                # Results arriving now cannot help the planner, but their tokens were spent.
+                self._collect_background_compressions(wait=True)
+                self.background_compressor.shutdown()
             self._write_run_summary(configuration_success, run_error)
             self.sandbox.close(keep_alive=keep_container)
 
+    def _check_trajectory(self, step_id, max_steps, action, success, observation):
+        """
+        Feed one step to the trajectory monitor. Returns the (possibly annotated)
+        observation and whether the run should stop early.
+        """
+        if self.trajectory_monitor is None:
+            return observation, False
+        verdict = self.trajectory_monitor.observe(
+            step_id, action, success, observation, self._environment_revision
+        )
+        if verdict is None:
+            return observation, False
+        if verdict.kind == "warn":
+            print(f"\n[System] {verdict.reason}. Injecting corrective observation.")
+            return f"{verdict.message}\n\n{observation}", False
+
+        avg_planner_tokens = self.run_token_ledger.planner.total_tokens / max(1, step_id)
+        self.trajectory_monitor.record_savings(max_steps - step_id, avg_planner_tokens)
+        print(
+            f"\n[System] Stopping early: {verdict.reason}. "
+            f"Skipping {self.trajectory_monitor.steps_saved} step(s), "
+            f"~{self.trajectory_monitor.estimated_tokens_saved} planner tokens."
+        )
+        return observation, True
+
+    def _run_action(self, step_index, action):
+        """Execute one command with snapshot/rollback and record it. Returns (success, observation, mutates)."""
+        success, observation = self.sandbox.execute(action)
+
+        print(f"\n[Observation]\n{observation if observation.strip() else '(No output)'}")
+
+        mutates_environment = False
+        if success:
+            self.synthesizer.record_success(action)
+            mutates_environment = self.synthesizer.command_mutates_environment(action)
+            self._record_successful_action(step_index, action, observation)
+        else:
+            print("\n[System] Command failed. Sandbox rolled back to previous state.")
+        return success, observation, mutates_environment
+
+    def _run_batch(self, step_index, commands):
+        """
+        Execute a batched `Actions:` list. Read-only commands run concurrently without
+        snapshots; at most one environment-changing command is allowed and runs last
+        through the normal rollback path.
+        """
+        readonly_commands = [c for c in commands if self.sandbox.is_parallel_safe_command(c)]
+        mutating_commands = [c for c in commands if not self.sandbox.is_parallel_safe_command(c)]
+        if len(mutating_commands) > 1:
+            self.batch_stats["rejected_batches"] += 1
+            observation = (
+                "Error: A batch may contain at most one command that can modify the environment. "
+                f"These commands must be issued one per turn: {mutating_commands}"
+            )
+            print(f"\n[Observation]\n{observation}")
+            return False, observation, False
+
+        self.batch_stats["batches"] += 1
+        self.batch_stats["batched_commands"] += len(commands)
+
+        # In execution order, by position: a batch may repeat a command.
+        results = []
+        for command, (exit_code, output) in zip(
+            readonly_commands, self.sandbox.execute_readonly_batch(readonly_commands)
+        ):
+            results.append((exit_code == 0, exit_code, output))
+            if exit_code == 0:
+                self._record_successful_action(step_index, command, output)
+
+        mutates_environment = False
+        if mutating_commands:
+            command = mutating_commands[0]
+            success, output = self.sandbox.execute(command)
+            results.append((success, 0 if success else None, output))
+            if success:
+                self.synthesizer.record_success(command)
+                mutates_environment = self.synthesizer.command_mutates_environment(command)
+                self._record_successful_action(step_index, command, output)
+
+        ordered = readonly_commands + mutating_commands
+        parts = [f"[Batch] Executed {len(ordered)} command(s)."]
+        for index, (command, (success, exit_code, output)) in enumerate(zip(ordered, results), start=1):
+            status = "ok" if success else (f"exit {exit_code}" if exit_code is not None else "failed, rolled back")
+            parts.append(f"--- [{index}/{len(ordered)}] $ {command} ({status}) ---\n{output.rstrip() or '(No output)'}")
+        observation = "\n".join(parts)
+        print(f"\n[Observation]\n{observation}")
+
+        success = all(result[0] for result in results)
+        return success, observation, mutates_environment
+
     def _record_agent_step(
         self,
         step_id,
@@ -455,6 +612,7 @@ class DockerAgent:
         env_revision_before,
         env_revision_after,
         planner_usage,
+        observation_prompt=None,
     ):
         step = AgentStep(
             step_id=step_id,
@@ -469,17 +627,85 @@ class DockerAgent:
             observation_prompt=observation or "",
         )
         step.metadata = build_observation_metadata(step.observation_raw)
+        if observation_prompt is not None and observation_prompt != step.observation_raw:
+            # A head/tail view; the full text stays in observation_raw.
+            step.observation_prompt = observation_prompt
+            step.metadata["prompt_tokens_est"] = estimate_tokens(observation_prompt)
         step.token_usage.planner_input_tokens = planner_usage["input_tokens"]
         step.token_usage.planner_output_tokens = planner_usage["output_tokens"]
         self.agent_steps.append(step)
+        if self.delta_encoder:
+            self._delta_encode(step)
 
         self.planner.append_step(
             step_id=step_id,
             assistant_content=assistant_content,
             observation_content=step.observation_prompt,
         )
+        if self.delta_encoder:
+            self._expand_orphaned_deltas()
         self._maybe_compress_old_observation()
 
+    def _observation_visible(self, step_id):
+        """True when the planner sees `step_id`'s full observation and it is not being compressed."""
+        steps = [step for step in self.agent_steps if step.step_id == step_id]
+        if self.background_compressor and self.background_compressor.in_flight(step_id):
+            return False
+        return (
+            bool(steps)
+            and steps[0].observation_prompt == steps[0].observation_raw
+            and self.planner.calls_until_evicted(step_id) > 0
+        )
+
+    def _delta_encode(self, step):
+        """Send `step`'s observation as a delta if it nearly repeats a visible earlier one."""
+        delta = self.delta_encoder.encode(step.observation_raw, is_visible=self._observation_visible)
+        self.delta_encoder.add(step.step_id, step.observation_raw)
+        if delta is None:
+            return
+        if step.observation_prompt != step.observation_raw and estimate_tokens(delta.text) >= step.metadata.get(
+            "prompt_tokens_est", 0
+        ):
+            # The head/tail view is already smaller than the delta.
+            return
+        record = CompressionRecord(
+            eligible=True,
+            applied=True,
+            method="delta",
+            reason="near_duplicate",
+            reference_step_id=delta.base_step_id,
+            original_chars=len(step.observation_raw),
+            original_tokens_est=step.metadata["raw_tokens_est"],
+            reduced_chars=len(delta.text),
+            reduced_tokens_est=estimate_tokens(delta.text),
+        )
+        record.saved_tokens_est = max(0, record.original_tokens_est - record.reduced_tokens_est)
+        step.compression = record
+        step.observation_prompt = delta.text
+        self.compression_stats["delta_encoded_steps"] += 1
+        self.compression_stats["saved_tokens_est"] += record.saved_tokens_est
+        print(
+            f"[Compression] Step {step.step_id} output repeats step {delta.base_step_id} "
+            f"({delta.changed_lines}/{delta.total_lines} lines differ); sending a delta"
+        )
+
+    def _expand_orphaned_deltas(self):
+        """Restore the full text of deltas whose base step has left the planner's window."""
+        for step in self.agent_steps:
+            record = step.compression
+            if record.method != "delta" or not record.applied:
+                continue
+            if self.planner.calls_until_evicted(record.reference_step_id) > 0:
+                continue
+            if not self.planner.replace_observation(step.step_id, step.observation_raw):
+                continue
+            step.observation_prompt = step.observation_raw
+            record.applied = False
+            record.eligible = False
+            record.reason = "delta_base_evicted"
+            self.compression_stats["delta_expanded_steps"] += 1
+            self.compression_stats["saved_tokens_est"] -= record.saved_tokens_est
+
     def _maybe_compress_old_observation(self):
         if not self.enable_observation_compression or not self.observation_compressor:
             return
@@ -488,51 +714,151 @@ class DockerAgent:
         if target_idx < 0:
             return
 
-        target_step = self.agent_steps[target_idx]
-        if target_step.compression.applied:
-            return
+        # Every old, long, not yet compressed step still in the planner history is a
+        # candidate; steps the scheduler deferred earlier are reconsidered here.
+        projected_prompt_tokens = self.planner.estimate_prompt_tokens()
+        remaining_steps = max(0, self._max_steps - len(self.agent_steps))
+        # Bases of live deltas must stay readable in full.
+        delta_bases = {
+            step.compression.reference_step_id
+            for step in self.agent_steps
+            if step.compression.method == "delta" and step.compression.applied
+        }
+        batches = []
+        for index in range(target_idx + 1):
+            target_step = self.agent_steps[index]
+            if target_step.compression.applied or target_step.compression.eligible:
+                continue
+            if self.background_compressor and self.background_compressor.in_flight(target_step.step_id):
+                continue
+            if target_step.step_id in delta_bases:
+                continue
+            if len(target_step.observation_raw or "") < self.compression_threshold_chars:
+                continue
+            remaining_calls = min(remaining_steps, self.planner.calls_until_evicted(target_step.step_id))
+            if remaining_calls <= 0:
+                continue
+            context_steps = self.agent_steps[max(0, index - self.compression_context_before):index + 1 + self.compression_delay]
+            decision = self.compression_scheduler.decide(
+                target_step,
+                projected_prompt_tokens=projected_prompt_tokens,
+                remaining_calls=remaining_calls,
+                window_tokens=sum(step.metadata.get("raw_tokens_est", 0) for step in context_steps),
+            )
+            if decision.compress and decision.method == "llm":
+                # LLM targets whose windows overlap the batch's first one share its call.
+                batch = batches[-1] if batches else None
+                if (
+                    batch
+                    and len(batch) < self.max_compression_batch_size
+                    and index - batch[0][0] <= self.compression_context_before + self.compression_delay
+                ):
+                    batch.append((index, target_step, decision))
+                    continue
+                if len(batches) < self.max_llm_compressions_per_step:
+                    batches.append([(index, target_step, decision)])
+                    continue
+            if not decision.compress or decision.method == "llm":
+                target_step.compression.reason = f"deferred:{decision.reason}"
+                continue
+            saved = self._compress_step(target_step, context_steps, decision)
+            projected_prompt_tokens -= saved
 
-        if len(target_step.observation_raw or "") < self.compression_threshold_chars:
-            return
+        for batch in batches:
+            first, last = batch[0][0], batch[-1][0]
+            context_steps = self.agent_steps[max(0, first - self.compression_context_before):last + 1 + self.compression_delay]
+            self._compress_batch([step for _, step, _ in batch], context_steps, [decision for _, _, decision in batch])
 
-        self.compression_stats["candidate_steps"] += 1
-        start_idx = max(0, target_idx - self.compression_context_before)
-        context_steps = self.agent_steps[start_idx:]
+    def _compress_step(self, target_step, context_steps, decision):
+        """
+        Compress one step and apply it to the planner history; returns the tokens saved.
+        LLM compressions go to the background compressor when enabled and save nothing yet.
+        """
+        return self._compress_batch([target_step], context_steps, [decision])
 
-        reduced_result, record = self.observation_compressor.compress(
-            target_step=target_step,
-            context_steps=context_steps,
-        )
-        apply_ok, reason = should_apply_compression(
-            target_step,
-            record,
-            compress_threshold_chars=self.compression_threshold_chars,
-            benefit_threshold_tokens=self.compression_benefit_tokens,
+    def _compress_batch(self, target_steps, context_steps, decisions):
+        """
+        Compress `target_steps` (one reflection call when they need the LLM) and
+        apply the results; returns the tokens saved.
+        """
+        self.compression_stats["candidate_steps"] += len(target_steps)
+        if self.background_compressor and decisions[0].method == "llm":
+            self.background_compressor.submit_batch(target_steps, context_steps, decisions)
+            return 0
+        if len(target_steps) == 1:
+            results = [self.observation_compressor.compress(
+                target_step=target_steps[0],
+                context_steps=context_steps,
+            )]
+        else:
+            results = self.observation_compressor.compress_batch(
+                target_steps=target_steps,
+                context_steps=context_steps,
+            )
+        return sum(
+            self._apply_compression(target_step, reduced_result, record, decision)
+            for target_step, (reduced_result, record), decision in zip(target_steps, results, decisions)
         )
+
+    def _collect_background_compressions(self, wait=False):
+        """Apply background compressions that have finished (all of them with `wait`)."""
+        if not self.background_compressor:
+            return
+        for target_step, reduced_result, record, decision in self.background_compressor.collect(wait=wait):
+            if self.planner.calls_until_evicted(target_step.step_id) <= 0:
+                # The step left the planner's history window while being compressed.
+                self.background_compressor.discarded += 1
+                record.reason = "evicted_before_result"
+            self._apply_compression(target_step, reduced_result, record, decision)
+
+    def _apply_compression(self, target_step, reduced_result, record, decision):
+        shown_tokens = (target_step.metadata or {}).get("prompt_tokens_est")
+        if shown_tokens is not None and target_step.observation_prompt != target_step.observation_raw:
+            # The planner sees a head/tail view, so only what exceeds the summary is saved.
+            record.saved_tokens_est = max(0, shown_tokens - record.reduced_tokens_est)
+        self.compression_scheduler.record_outcome(decision, record)
+        if record.reason in ("evicted_before_result", "compression_failed"):
+            apply_ok, reason = False, record.reason
+        else:
+            apply_ok, reason = should_apply_compression(
+                target_step,
+                record,
+                compress_threshold_chars=self.compression_threshold_chars,
+                benefit_threshold_tokens=self.compression_benefit_tokens,
+            )
         record.applied = apply_ok
         record.reason = reason
         target_step.compression = record
         target_step.token_usage.reflect_input_tokens = record.reflect_input_tokens
         target_step.token_usage.reflect_output_tokens = record.reflect_output_tokens
 
+        # Cache hits made no reflection call, so they add zero tokens here.
         self.run_token_ledger.add(
             "reflection",
             input_tokens=record.reflect_input_tokens,
             output_tokens=record.reflect_output_tokens,
         )
+        if record.cache_hit:
+            self.compression_stats["cache_hits"] += 1
 
         if not apply_ok:
-            return
+            return 0
 
+        if self.observation_pager and self.observation_pager.has_output(target_step.step_id):
+            # Details the summary dropped can still be paged in from the stored output.
+            reduced_result = f"{reduced_result}\n{handle_hint(target_step.step_id)}"
         replaced = self.planner.replace_observation(target_step.step_id, reduced_result)
         if not replaced:
             target_step.compression.applied = False
             target_step.compression.reason = "target_step_not_in_managed_history"
-            return
+            return 0
 
         target_step.observation_prompt = reduced_result
         self.compression_stats["compressed_steps"] += 1
         self.compression_stats["saved_tokens_est"] += record.saved_tokens_est
+        if record.method == "rules":
+            self.compression_stats["rule_compressed_steps"] += 1
+        return record.saved_tokens_est
 
     def _record_successful_action(self, step_index, action, observation):
         """Track successful actions and maintain the final contiguous verification block."""
@@ -586,8 +912,10 @@ class DockerAgent:
         print(f"[Recorded Test Command] {action}")
         print(f"[Verification Block] {len(self.verified_test_commands)} command(s) in final candidate block.")
 
-    def _finalize_verification_from_agent_report(self, raw_llm_output):
-        bundle = self._extract_verification_bundle(raw_llm_output)
+    def _finalize_verification_from_agent_report(self, raw_llm_output, bundle=None):
+        # Tool-calling mode hands over the `finish` arguments directly.
+        if bundle is None:
+            bundle = self._extract_verification_bundle(raw_llm_output)
         if not bundle:
             return False
 
@@ -831,6 +1159,30 @@ class DockerAgent:
             "verification_bundle": self.verification_bundle,
             "observation_compression_enabled": self.enable_observation_compression,
             "compression_stats": self.compression_stats,
+            "compression_scheduler": (
+                self.compression_scheduler.get_summary() if self.enable_observation_compression else None
+            ),
+            "background_compression": (
+                self.background_compressor.get_summary() if self.background_compressor else None
+            ),
+            "compression_batches": (
+                self.observation_compressor.batch_stats if self.observation_compressor else None
+            ),
+            "output_paging": self.observation_pager.get_summary() if self.observation_pager else None,
+            "compression_cache": (
+                self.observation_compressor.cache.get_stats() if self.observation_compressor else None
+            ),
+            "batch_actions": self.batch_stats if self.enable_batch_actions else None,
+            "tool_calling": self.enable_tool_calling,
+            "context_packing": self.context_packing,
+            # The sandbox's prefetcher is the shared one unless prefetching is disabled.
+            "image_pull": self.sandbox.prefetcher.get_summary(),
+            "base_image_capabilities": (
+                self.base_image_capabilities.to_dict() if self.base_image_capabilities else None
+            ),
+            "trajectory_monitor": (
+                self.trajectory_monitor.get_summary() if self.trajectory_monitor else None
+            ),
             "steps": [
                 {
                     "step_id": step.step_id,
@@ -840,6 +1192,10 @@ class DockerAgent:
                     "raw_tokens_est": step.metadata.get("raw_tokens_est", 0),
                     "compressed": step.compression.applied,
                     "compression_reason": step.compression.reason,
+                    "compression_method": step.compression.method,
+                    "log_family": step.compression.log_family,
+                    "reference_step_id": step.compression.reference_step_id,
+                    "compression_cache_hit": step.compression.cache_hit,
                     "saved_tokens_est": step.compression.saved_tokens_est,
                     "reflect_input_tokens": step.compression.reflect_input_tokens,
                     "reflect_output_tokens": step.compression.reflect_output_tokens,
@@ -852,6 +1208,12 @@ class DockerAgent:
                 "reflection": self.run_token_ledger.reflection.__dict__,
                 "total": self.run_token_ledger.total.__dict__,
             },
+            "tokenizer": get_tokenizer().get_stats(),
+            "model_routes": self.model_router.get_stats(),
+            "llm_client_pool": (
+                self.client.get_stats(since=getattr(self, "_client_stats_at_start", None))
+                if hasattr(self.client, "get_stats") else None
+            ),
             "error": run_error,
         }
         try:
@@ -873,6 +1235,72 @@ if __name__ == "__main__":
         action="store_true",
         help="Enable AgentDiet-style observation compression (default: disabled)",
     )
+    parser.add_argument(
+        "--batch-actions",
+        action="store_true",
+        help="Allow the planner to batch independent read-only commands in one turn",
+    )
+    parser.add_argument(
+        "--tool-calling",
+        action="store_true",
+        help="Use native function calling (run_command/finish tools) instead of text parsing",
+    )
+    parser.add_argument(
+        "--disable-trajectory-monitor",
+        action="store_true",
+        help="Do not stop early when the agent loops or stalls",
+    )
+    parser.add_argument(
+        "--disable-image-prefetch",
+        action="store_true",
+        help="Pull the base image only when the sandbox starts",
+    )
+    parser.add_argument(
+        "--disable-image-catalog",
+        action="store_true",
+        help="Do not probe candidate base images for preinstalled tools",
+    )
+    parser.add_argument(
+        "--catalog-tie-break",
+        action="store_true",
+        help="Among equally supported versions, prefer base images already pulled on this host",
+    )
+    parser.add_argument(
+        "--synchronous-compression",
+        action="store_true",
+        help="Run LLM observation compression inline instead of overlapping it with the next step",
+    )
+    parser.add_argument(
+        "--disable-delta-observations",
+        action="store_true",
+        help="Always send repeated command outputs in full instead of as deltas",
+    )
+    parser.add_argument(
+        "--disable-batch-compression",
+        action="store_true",
+        help="Compress one old observation per LLM call instead of every eligible step in a window",
+    )
+    parser.add_argument(
+        "--disable-output-paging",
+        action="store_true",
+        help="With observation compression, send long command outputs whole instead of as head/tail views",
+    )
+    parser.add_argument(
+        "--context-budget-tokens",
+        type=int,
+        default=32000,
+        help="Planner prompt size near which LLM observation compression kicks in",
+    )
+    parser.add_argument(
+        "--route",
+        action="append",
+        default=[],
+        metavar="CALL_TYPE=MODEL[,FALLBACK...]",
+        help=(
+            "Route a call type (planner, locate_files, relevance, detect_language, "
+            "select_image, compression) to a model chain; repeatable"
+        ),
+    )
     
     args = parser.parse_args()
     
@@ -881,5 +1309,17 @@ if __name__ == "__main__":
         base_image=args.image,
         model=args.model,
         enable_observation_compression=args.enable_observation_compression,
+        model_routes=parse_route_specs(args.route),
+        enable_batch_actions=args.batch_actions,
+        enable_tool_calling=args.tool_calling,
+        enable_trajectory_monitor=not args.disable_trajectory_monitor,
+        enable_image_prefetch=not args.disable_image_prefetch,
+        enable_image_catalog=not args.disable_image_catalog,
+        catalog_tie_break=args.catalog_tie_break,
+        context_budget_tokens=args.context_budget_tokens,
+        enable_background_compression=not args.synchronous_compression,
+        enable_delta_observations=not args.disable_delta_observations,
+        enable_batch_compression=not args.disable_batch_compression,
+        enable_output_paging=not args.disable_output_paging,
     )
     agent.run(max_steps=args.steps, keep_container=args.keep_container)
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Replay recorded trajectories through each observation compression strategy.
+
+A trajectory is read from a run's `setup_logs/<n>.md` planner logs: call n's
+reply gives step n+1's thought and action, and the observation that follows
+it in call n+1's input gives its output. `agent_run_summary.json` next to
+`setup_logs/`, when present, adds each step's success flag and marks outputs
+that were already recorded as deltas. With no recorded runs, a built-in
+synthetic trajectory (install, failing tests, a custom build, re-runs) is
+replayed instead.
+
+Each strategy feeds the same steps through the agent's own managed-history
+path (`_record_agent_step`), synchronously and without a sandbox:
+
+    none   full outputs in the planner history
+    rules  rule-based log compression only
+    llm    LLM compression of every candidate, against a stub LLM
+    delta  near-duplicate outputs sent as deltas
+    all    rules + LLM + delta + head/tail paging (the agent's defaults)
+
+The stub LLM keeps the first and last lines of a result plus every line that
+mentions an error, failure, warning or version. It reports token usage
+counted with the run tokenizer, and `--llm-latency` adds a per-call delay.
+
+Reported per strategy are:
+- planner prompt tokens, summed over every planner call;
+- reflection tokens and replay time;
+- retention of the failing test names, package versions and error messages
+  found in the raw outputs.
+A fact counts as kept when the planner's final view of its step still shows
+it, or, for a delta, when the delta's base step shows it. With paging, a
+fact missing from the view is still reported as recoverable through
+`show_output`.
+
+    python -m benchmarks.compression_benchmark
+    python -m benchmarks.compression_benchmark --runs 'workplace/**/setup_logs' --json report.json
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Set, Tuple
+from xml.sax.saxutils import escape, unescape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import DockerAgent  # noqa: E402
+from src.observation_compressor import ObservationCompressor, RunTokenLedger  # noqa: E402
+from src.persistent_cache import JsonFileCache  # noqa: E402
+from src.planner import Planner  # noqa: E402
+from src.tokenizer import count_tokens  # noqa: E402
+
+STRATEGIES = ("none", "rules", "llm", "delta", "all")
+
+_HUMAN_MARKER = "================================ Human Message =================================\n\n"
+_AI_MARKER = "================================ AI Message =================================\n\n"
+_METADATA_MARKER = "================================ Metadata =================================\n\n"
+
+
+@dataclass
+class ReplayStep:
+    step_id: int
+    assistant_content: str
+    thought: str
+    action: str
+    observation: str
+    success: bool = True
+    # False when the recorded output is not the raw text (recorded as a delta).
+    observation_is_raw: bool = True
+
+
+@dataclass
+class Trajectory:
+    name: str
+    steps: List[ReplayStep]
+    # Reply to the last planner call (usually the final answer), replayed as one more call.
+    final_call: bool = True
+
+
+@dataclass
+class StrategyResult:
+    strategy: str
+    planner_calls: int = 0
+    prompt_tokens: int = 0
+    reflection_tokens: int = 0
+    seconds: float = 0.0
+    compressed_steps: int = 0
+    # category -> [kept, recoverable, total]
+    retention: Dict[str, List[int]] = field(default_factory=dict)
+
+
+# ---------------------------------------------------------------- loading ---
+
+def _split_log(text: str) -> Tuple[str, Optional[str]]:
+    """(input messages, reply) of one planner log; reply is None if the call did not finish."""
+    start = text.find(_HUMAN_MARKER)
+    body = text[start + len(_HUMAN_MARKER):] if start >= 0 else text
+    if _AI_MARKER not in body:
+        return body, None
+    prompt, reply = body.split(_AI_MARKER, 1)
+    reply = reply.split(_METADATA_MARKER, 1)[0]
+    return prompt, reply[:-2] if reply.endswith("\n\n") else reply
+
+
+def _observation_after(prompt: str, reply: str) -> Optional[str]:
+    """The observation that follows `reply` in the next call's input."""
+    marker = f"[ASSISTANT]\n{reply}\n\n"
+    index = prompt.rfind(marker)
+    if index < 0:
+        return None
+    rest = prompt[index + len(marker):]
+    if not rest.startswith("Observation: "):
+        return None
+    rest = rest[len("Observation: "):]
+    return rest[:-2] if rest.endswith("\n\n") else rest
+
+
+def load_trajectory(setup_log_dir: str) -> Optional[Trajectory]:
+    """Rebuild a trajectory from a run's planner logs (and its run summary, if any)."""
+    paths = sorted(
+        (path for path in glob.glob(os.path.join(setup_log_dir, "*.md")) if os.path.basename(path)[:-3].isdigit()),
+        key=lambda path: int(os.path.basename(path)[:-3]),
+    )
+    calls = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            calls.append(_split_log(f.read()))
+    if not calls:
+        return None
+
+    summary_steps: Dict[int, Dict[str, Any]] = {}
+    summary_path = os.path.join(os.path.dirname(os.path.abspath(setup_log_dir)), "agent_run_summary.json")
+    if os.path.exists(summary_path):
+        with open(summary_path, "r", encoding="utf-8") as f:
+            summary_steps = {entry["step_id"]: entry for entry in json.load(f).get("steps", [])}
+
+    parser = Planner(client=None)
+    steps = []
+    for index, (_, reply) in enumerate(calls[:-1]):
+        observation = _observation_after(calls[index + 1][0], reply) if reply is not None else None
+        if observation is None:
+            break
+        step_id = index + 1
+        recorded = summary_steps.get(step_id, {})
+        steps.append(ReplayStep(
+            step_id=step_id,
+            assistant_content=reply,
+            thought=parser._extract_tag(reply, "Thought") or "",
+            action=recorded.get("action") or parser._extract_tag(reply, "Action") or "",
+            observation=observation,
+            success=recorded.get("success", True),
+            observation_is_raw=recorded.get("compression_method") != "delta",
+        ))
+    return Trajectory(name=setup_log_dir, steps=steps, final_call=calls[-1][1] is not None)
+
+
+def synthetic_trajectory() -> Trajectory:
+    pip_log = "\n".join(
+        f"Collecting package{i}==1.{i}.0\n  Downloading package{i}-1.{i}.0-py3-none-any.whl (12{i % 10} kB)"
+        for i in range(80)
+    ) + "\nSuccessfully installed " + " ".join(f"package{i}-1.{i}.0" for i in range(80))
+
+    def pytest_log(failing):
+        lines = ["============================= test session starts =============================",
+                 "platform linux -- Python 3.11.8, pytest-8.1.1, pluggy-1.4.0", "collected 300 items", ""]
+        lines += [f"tests/test_module{i // 30}.py::test_case_{i} {'FAILED' if i in failing else 'PASSED'} "
+                  f"[{(i + 1) * 100 // 300:3d}%]" for i in range(300)]
+        lines += ["", "=================================== FAILURES ==================================="]
+        for i in failing:
+            lines += [f"____________________________ test_case_{i} ____________________________",
+                      f"E       AssertionError: expected 'utf-8' but got 'latin-1' in case {i}"]
+        lines += ["=========================== short test summary info ============================"]
+        lines += [f"FAILED tests/test_module{i // 30}.py::test_case_{i} - AssertionError" for i in failing]
+        lines += [f"======================= {len(failing)} failed, {300 - len(failing)} passed in 41.27s ======================="]
+        return "\n".join(lines)
+
+    build_log = "\n".join(
+        [f"[{i}/400] custom-gen: generating schema_{i}.bin from schema_{i}.idl" for i in range(400)]
+        + ["Using protoc version 3.21.12", "RuntimeError: schema_397.idl: unknown field type 'uint128'",
+           "build.sh: generation failed with 1 error"]
+    )
+    outputs = [
+        ("ls", "README.md\nrequirements.txt\nsetup.cfg\nsrc\ntests"),
+        ("pip install -r requirements.txt", pip_log),
+        ("pytest", pytest_log((17, 142, 288))),
+        ("cat setup.cfg", "[metadata]\nname = demo\n\n[options]\npython_requires = >=3.9\n"),
+        ("./build.sh", build_log),
+        ("pip install 'chardet==5.2.0'", "Successfully installed chardet-5.2.0"),
+        ("pytest", pytest_log((142,))),
+        ("pytest tests/test_module4.py", pytest_log((142,))),
+        ("sed -i 's/latin-1/utf-8/' src/codec.py", ""),
+        ("pytest", pytest_log(())),
+    ]
+    steps = [
+        ReplayStep(step_id=index, assistant_content=f"Thought: step {index}\nAction: {action}",
+                   thought=f"step {index}", action=action, observation=observation)
+        for index, (action, observation) in enumerate(outputs, start=1)
+    ]
+    return Trajectory(name="synthetic", steps=steps)
+
+
+# ------------------------------------------------------------- retention ---
+
+_FAILING_TESTS = [
+    re.compile(r"^FAILED\s+(\S+)", re.MULTILINE),
+    re.compile(r"^(\S+::\S+)\s+FAILED\b", re.MULTILINE),
+    re.compile(r"^not ok \d+ - (.+)$", re.MULTILINE),
+    re.compile(r"--- FAIL: (\S+)"),
+    re.compile(r"^rspec (\./\S+)", re.MULTILINE),
+]
+_VERSIONS = [
+    re.compile(r"\b([A-Za-z][\w.-]*)==(\d+(?:\.\d+)+)"),
+    re.compile(r"\b([A-Za-z][\w.]*(?:-[A-Za-z][\w.]*)*)-(\d+(?:\.\d+)+)(?=\s|$)", re.MULTILINE),
+    re.compile(r"\b([A-Za-z][\w-]*) (?:version )?v?(\d+\.\d+\.\d+)\b"),
+]
+_ERRORS = re.compile(r"^(?:E\s+)?((?:\w+\.)*\w*(?:Error|Exception)): (.{1,60})", re.MULTILINE)
+
+
+def extract_facts(observation: str) -> Dict[str, Set[Tuple[str, ...]]]:
+    """Facts a compressed view should keep: failing tests, package versions, error messages."""
+    failing = set()
+    for pattern in _FAILING_TESTS:
+        for match in pattern.finditer(observation):
+            # The test's own name, which survives any reformatting of its path.
+            failing.add((re.split(r"::|/|\s", match.group(1).strip())[-1] or match.group(1).strip(),))
+    versions = {
+        (match.group(1).lower(), match.group(2)) for pattern in _VERSIONS for match in pattern.finditer(observation)
+    }
+    errors = {(match.group(1), match.group(2).strip()[:40]) for match in _ERRORS.finditer(observation)}
+    return {"failing_tests": failing, "versions": versions, "errors": errors}
+
+
+def fact_visible(fact: Tuple[str, ...], text: str) -> bool:
+    lowered = text.lower()
+    return all(part.lower() in lowered for part in fact)
+
+
+# ---------------------------------------------------------------- replay ---
+
+class StubLLM:
+    """
+    Deterministic stand-in for the compression model: keeps head, tail and
+    informative lines of every target result in the request.
+    """
+    KEEP = re.compile(r"error|fail|warn|version|not ok|traceback|exception|\d+\.\d+\.\d+|\b\d+ passed|installed", re.I)
+    _TARGET = re.compile(r'<step id="(\d+)" target="true">.*?<result>\n(.*?)\n</result>', re.DOTALL)
+
+    def __init__(self, latency: float = 0.0, head: int = 3, tail: int = 3, max_kept: int = 40):
+        self.latency = latency
+        self.head, self.tail, self.max_kept = head, tail, max_kept
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def summarise(self, result: str) -> str:
+        lines = result.splitlines()
+        kept, omitted = [], 0
+        informative = 0
+        for number, line in enumerate(lines):
+            edge = number < self.head or number >= len(lines) - self.tail
+            if edge or (informative < self.max_kept and self.KEEP.search(line)):
+                informative += not edge
+                if omitted:
+                    kept.append(f"[... {omitted} lines omitted ...]")
+                    omitted = 0
+                kept.append(line)
+            else:
+                omitted += 1
+        return "\n".join(kept)
+
+    def _create(self, model, messages, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = "\n".join(message["content"] for message in messages)
+        content = "\n".join(
+            f'<step id="{step_id}"><result>\n{escape(self.summarise(unescape(result)))}\n</result></step>'
+            for step_id, result in self._TARGET.findall(messages[-1]["content"])
+        )
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                total_tokens=prompt_tokens + completion_tokens)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+class RulesOnlyCompressor(ObservationCompressor):
+    """Rule-based compression; output the rules do not recognise is left as it is."""
+
+    def compress(self, target_step, context_steps):
+        local = self._compress_without_llm(target_step)
+        if local is not None:
+            return local
+        record = self._new_record(target_step)
+        record.reason = "no_rule_for_output"
+        return target_step.observation_raw, record
+
+    def compress_batch(self, target_steps, context_steps):
+        return [self.compress(target_step, context_steps) for target_step in target_steps]
+
+
+def build_replay_agent(strategy: str, llm: StubLLM, cache_dir: str, max_steps: int) -> DockerAgent:
+    """A DockerAgent with only the history and compression state a replay touches."""
+    agent = DockerAgent.__new__(DockerAgent)
+    agent.run_token_ledger = RunTokenLedger()
+    # Without a budget to react to, every candidate the scheduler can justify is compressed.
+    agent._init_compression_state(
+        enable_observation_compression=strategy != "none",
+        context_budget_tokens=0,
+        enable_background_compression=False,
+        enable_delta_observations=strategy in ("delta", "all"),
+        enable_output_paging=strategy == "all",
+    )
+    cache = JsonFileCache("observation_compression", cache_dir=cache_dir, enabled=False)
+    if strategy == "rules":
+        agent._attach_observation_compressor(RulesOnlyCompressor(llm, "stub", cache=cache))
+    elif strategy in ("llm", "all"):
+        agent._attach_observation_compressor(
+            ObservationCompressor(llm, "stub", use_rules=strategy == "all", cache=cache)
+        )
+    agent._max_steps = max_steps
+    agent.planner = Planner(client=None, output_paging=agent.observation_pager is not None)
+    return agent
+
+
+def replay(trajectory: Trajectory, strategy: str, llm_latency: float = 0.0) -> StrategyResult:
+    llm = StubLLM(latency=llm_latency)
+    result = StrategyResult(strategy=strategy)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        agent = build_replay_agent(strategy, llm, cache_dir, max_steps=len(trajectory.steps) + 1)
+        agent.planner.init_managed_history("replay")
+        started = time.perf_counter()
+        # The agent's per-step compression messages would drown the report.
+        with contextlib.redirect_stdout(io.StringIO()):
+            for step in trajectory.steps:
+                result.prompt_tokens += agent.planner.estimate_prompt_tokens()
+                result.planner_calls += 1
+                observation_prompt = (
+                    agent.observation_pager.add(step.step_id, step.observation) if agent.observation_pager else None
+                )
+                agent._record_agent_step(
+                    step_id=step.step_id,
+                    thought=step.thought,
+                    action=step.action,
+                    assistant_content=step.assistant_content,
+                    success=step.success,
+                    observation=step.observation,
+                    mutates_environment=False,
+                    env_revision_before=0,
+                    env_revision_after=0,
+                    planner_usage={"input_tokens": 0, "output_tokens": 0},
+                    observation_prompt=observation_prompt,
+                )
+            if trajectory.final_call:
+                result.prompt_tokens += agent.planner.estimate_prompt_tokens()
+                result.planner_calls += 1
+        result.seconds = time.perf_counter() - started
+
+    result.reflection_tokens = agent.run_token_ledger.reflection.total_tokens
+    result.compressed_steps = sum(step.compression.applied for step in agent.agent_steps)
+    views = {step.step_id: step.observation_prompt for step in agent.agent_steps}
+    for replayed, step in zip(trajectory.steps, agent.agent_steps):
+        if not replayed.observation_is_raw:
+            continue
+        view = views[step.step_id]
+        if step.compression.method == "delta" and step.compression.applied:
+            view += "\n" + views.get(step.compression.reference_step_id, "")
+        for category, facts in extract_facts(step.observation_raw).items():
+            counts = result.retention.setdefault(category, [0, 0, 0])
+            for fact in facts:
+                kept = fact_visible(fact, view)
+                counts[0] += kept
+                counts[1] += kept or agent.observation_pager is not None
+                counts[2] += 1
+    return result
+
+
+def merge(results: List[StrategyResult]) -> StrategyResult:
+    total = StrategyResult(strategy=results[0].strategy)
+    for result in results:
+        total.planner_calls += result.planner_calls
+        total.prompt_tokens += result.prompt_tokens
+        total.reflection_tokens += result.reflection_tokens
+        total.seconds += result.seconds
+        total.compressed_steps += result.compressed_steps
+        for category, counts in result.retention.items():
+            merged = total.retention.setdefault(category, [0, 0, 0])
+            for index, count in enumerate(counts):
+                merged[index] += count
+    return total
+
+
+def run_benchmark(
+    trajectories: List[Trajectory],
+    strategies=STRATEGIES,
+    llm_latency: float = 0.0,
+) -> Dict[str, StrategyResult]:
+    return {
+        strategy: merge([replay(trajectory, strategy, llm_latency) for trajectory in trajectories])
+        for strategy in strategies
+    }
+
+
+def _retention_cell(counts: Optional[List[int]]) -> str:
+    if not counts or not counts[2]:
+        return "-"
+    kept, recoverable, total = counts
+    cell = f"{kept}/{total}"
+    return cell + (f" ({recoverable})" if recoverable != kept else "")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark observation compression strategies offline")
+    parser.add_argument("--runs", action="append", default=[],
+                        help="Glob of setup_logs directories to replay (repeatable)")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds added to every stub LLM call")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    patterns = args.runs or ["workplace/**/setup_logs", "outputs/**/setup_logs"]
+    directories = sorted({path for pattern in patterns for path in glob.glob(pattern, recursive=True)})
+    trajectories = [trajectory for trajectory in map(load_trajectory, directories) if trajectory and trajectory.steps]
+    if not trajectories:
+        print("[Benchmark] No recorded setup_logs found; replaying the synthetic trajectory")
+        trajectories = [synthetic_trajectory()]
+    steps = sum(len(trajectory.steps) for trajectory in trajectories)
+    print(f"[Benchmark] {len(trajectories)} trajector{'y' if len(trajectories) == 1 else 'ies'}, {steps} steps")
+
+    strategies = [name.strip() for name in args.strategies.split(",") if name.strip()]
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(unknown)} (choose from {', '.join(STRATEGIES)})")
+    results = run_benchmark(trajectories, strategies, args.llm_latency)
+
+    baseline = results["none"].prompt_tokens if "none" in results else None
+    print(f"[Benchmark] {'strategy':<8} {'prompt':>9} {'vs none':>8} {'reflect':>8} {'total':>9} {'seconds':>8} "
+          f"{'compr.':>6}  {'failing tests':>13} {'versions':>12} {'errors':>10}")
+    for name, result in results.items():
+        change = f"{(result.prompt_tokens - baseline) / baseline:+.1%}" if baseline else "-"
+        print(
+            f"[Benchmark] {name:<8} {result.prompt_tokens:>9} {change:>8} {result.reflection_tokens:>8} "
+            f"{result.prompt_tokens + result.reflection_tokens:>9} {result.seconds:>8.2f} {result.compressed_steps:>6}  "
+            f"{_retention_cell(result.retention.get('failing_tests')):>13} "
+            f"{_retention_cell(result.retention.get('versions')):>12} "
+            f"{_retention_cell(result.retention.get('errors')):>10}"
+        )
+    print("[Benchmark] retention is kept/total in the planner's final view; (n) counts facts recoverable via show_output")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({name: result.__dict__ for name, result in results.items()}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
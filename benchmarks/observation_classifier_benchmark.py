@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Compare the old per-consumer observation scans with the single-pass classifier.
+
+The legacy path is what the sandbox (`_is_informational_exit`,
+`_get_test_failure_prefix`), `build_observation_metadata` and the synthesizer
+(effective / empty test-run and help-text checks) did separately for every
+output. The classifier path answers the same questions from one
+`classify_observation` call, first cold and then from its cache. Both are run on
+recorded test logs (the `logs/*.txt` files under outputs/ by default) plus a
+few large synthetic logs, and must agree on every answer.
+
+    python -m benchmarks.observation_classifier_benchmark
+    python -m benchmarks.observation_classifier_benchmark --logs 'outputs/**/logs/*.txt' --repeats 5
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import observation_classifier  # noqa: E402
+from src.observation_classifier import classify_observation  # noqa: E402
+
+
+def legacy_normalize(observation: str) -> str:
+    normalized = re.sub(r"\x1b\[[0-9;?]*[ -/]*[@-~]", "", observation)
+    return normalized.replace("\u200b", "").replace("\ufeff", "")
+
+
+def legacy_is_informational_exit(output: str) -> bool:
+    help_indicators = ['Usage:', 'usage:', '--help', 'Options:', 'Commands:',
+                       'positional arguments:', 'optional arguments:']
+    test_failure_indicators = [
+        'failures:', 'errors:', 'FAILED', 'Failed:', 'not ok', 'Test failed', 'assertion failed',
+        'expected', 'actual', 'diff:', 'Traceback (most recent call last):', 'NameError',
+        'ImportError', 'ModuleNotFoundError', 'LoadError', 'Gem::LoadError', 'bundler: command not found',
+    ]
+    output_lower = output.lower()
+    if any(indicator.lower() in output_lower for indicator in test_failure_indicators):
+        return False
+    return any(indicator.lower() in output_lower for indicator in help_indicators)
+
+
+def legacy_failure_prefix(output: str) -> Tuple:
+    tap_fail = re.search(r'Failed:\s+([1-9]\d*)', output)
+    if tap_fail:
+        return ("tap", int(tap_fail.group(1)))
+    pytest_fail = re.search(r'(\d+) failed', output, re.IGNORECASE)
+    if pytest_fail:
+        return ("count", int(pytest_fail.group(1)))
+    if 'FAILED' in output or 'not ok' in output.lower():
+        return ("keyword",)
+    return ()
+
+
+def legacy_metadata(text: str) -> Tuple[bool, bool, bool]:
+    lower = text.lower()
+    return (
+        any(m in lower for m in ("test session starts", "collected ", "short test summary info",
+                                 " passed", " failed", " xfailed", "traceback")),
+        any(m in lower for m in ("successfully installed", "already satisfied", "already installed",
+                                 "collecting ", "installing ", "fetching ", "apt-get install",
+                                 "bundle install", "npm install")),
+        any(m in lower for m in ("error", "failed", "traceback", "exception", "no such file",
+                                 "command not found")),
+    )
+
+
+LEGACY_EMPTY_RUN_PATTERNS = [
+    r"no tests were found", r"no tests found", r"collected\s+0\s+items", r"ran\s+0\s+tests?",
+    r"\b0\s+tests?\s+ran\b", r"\[no test files\]", r"no test cases matched", r"no tests to run",
+    r"\b0\s+examples?,\s+0\s+failures?\b",
+]
+LEGACY_POSITIVE_PATTERNS = [
+    r"collected\s+[1-9]\d*\s+items", r"ran\s+[1-9]\d*\s+tests?", r"\b[1-9]\d*\s+passed\b",
+    r"\b[1-9]\d*\s+failed\b", r"\b[1-9]\d*\s+skipped\b", r"\bok\s+\([1-9]\d*\s+tests?,",
+    r"\b[1-9]\d*\s+tests?,\s+[1-9]\d*\s+ran\b", r"\[=+\]\s+running\s+[1-9]\d*\s+tests?",
+    r"test result:\s+(?:ok|failed)\.", r"\b[1-9]\d*%\s+tests\s+passed\b",
+    r"^\s*ok\s+\S+\s+\d+(?:\.\d+)?s(?:\s|$)", r"\b[1-9]\d*\s+examples?,\s+\d+\s+failures?\b",
+    r"\b[1-9]\d*\s+checks?,\s+\d+\s+ignored\b", r"start\s+\d+:",
+    r"suites:\s+\d+\s+of\s+[1-9]\d*\s+completed", r"asserts:\s+\d+\s+of\s+[1-9]\d*",
+    r"^\s*#\s*subtest:", r"^\s*not ok\b",
+]
+
+
+def legacy_synthesizer(observation: str) -> Tuple[bool, bool, bool]:
+    empty = legacy_normalize(observation).lower()
+    empty_signal = any(re.search(p, empty, re.MULTILINE) for p in LEGACY_EMPTY_RUN_PATTERNS)
+    normalized = legacy_normalize(observation)
+    effective = any(re.search(p, normalized, re.IGNORECASE | re.MULTILINE) for p in LEGACY_POSITIVE_PATTERNS)
+    help_text = legacy_normalize(observation).lower()
+    looks_like_help = any(m in help_text for m in ("usage:", "optional arguments:",
+                                                    "positional arguments:", "show this help"))
+    return effective, empty_signal, looks_like_help
+
+
+def legacy_answers(text: str) -> Tuple:
+    return (legacy_is_informational_exit(text), legacy_failure_prefix(text),
+            legacy_metadata(text), legacy_synthesizer(text))
+
+
+def classifier_answers(text: str) -> Tuple:
+    f = classify_observation(text)
+    if f.tap_failed_count is not None:
+        prefix: Tuple = ("tap", f.tap_failed_count)
+    elif f.failed_count is not None:
+        prefix = ("count", f.failed_count)
+    elif f.has_failed_keyword:
+        prefix = ("keyword",)
+    else:
+        prefix = ()
+    return (
+        not f.has_test_failure_markers and f.has_usage_markers,
+        prefix,
+        (f.has_test_markers, f.has_install_markers, f.has_error_markers),
+        (f.has_effective_test_signal, f.has_empty_test_run_signal, f.looks_like_help_text),
+    )
+
+
+def synthetic_logs() -> Dict[str, str]:
+    pytest_log = "\n".join(
+        f"tests/test_module{i // 50}.py::test_case_{i} {'FAILED' if i % 97 == 0 else 'PASSED'} [{i % 100:3d}%]"
+        for i in range(20000)
+    ) + "\n==== 207 failed, 19793 passed in 812.31s ===="
+    pip_log = "\n".join(
+        f"Collecting package{i}\n  Downloading package{i}-1.0.tar.gz (2 MB)\n"
+        f"Requirement already satisfied: dep{i} in /usr/lib/python3/site-packages"
+        for i in range(8000)
+    )
+    build_log = "\n".join(f"\x1b[32m[{i}/9000]\x1b[0m Compiling src/module_{i}.c -o build/module_{i}.o"
+                          for i in range(9000))
+    return {"synthetic pytest": pytest_log, "synthetic pip": pip_log, "synthetic build": build_log}
+
+
+def total_seconds(fn: Callable[[str], object], texts: List[str], repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the single-pass observation classifier")
+    parser.add_argument("--logs", default="outputs/**/logs/*.txt", help="Glob of recorded logs to include")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    logs = synthetic_logs()
+    for path in sorted(glob.glob(args.logs, recursive=True)):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            logs[path] = f.read()
+    texts = list(logs.values())
+
+    mismatches = [name for name, text in logs.items() if legacy_answers(text) != classifier_answers(text)]
+    for name in mismatches:
+        print(f"[Benchmark] Warning: classifier disagrees with the legacy scans on {name}")
+
+    def cold(text: str):
+        observation_classifier._cache.clear()
+        return classifier_answers(text)
+
+    legacy = total_seconds(legacy_answers, texts, args.repeats)
+    single = total_seconds(cold, texts, args.repeats)
+    classifier_answers(texts[-1])
+    cached = total_seconds(classifier_answers, texts[-1:], args.repeats) * len(texts)
+    megabytes = sum(len(text) for text in texts) / 1e6
+    print(f"[Benchmark] {len(texts)} logs, {megabytes:.1f} MB, {len(mismatches)} mismatches")
+    print(f"[Benchmark] legacy per-consumer scans : {legacy * 1000:8.1f} ms")
+    print(f"[Benchmark] single-pass classifier    : {single * 1000:8.1f} ms")
+    print(f"[Benchmark] cached feature record     : {cached * 1000:8.3f} ms (estimated, all logs)")
+    print(f"[Benchmark] speedup (cold)            : {legacy / single if single else float('inf'):8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
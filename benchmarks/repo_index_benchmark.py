@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Compare the old multi-walk repository scanning with the single-pass RepoIndex.
+
+Builds a synthetic monorepo (or scans an existing checkout) and times the work
+ImageSelector and DockerAgent used to do separately - structure walk, manifest
+walk, per-file opens - against one RepoIndex build plus cached queries.
+
+    python -m benchmarks.repo_index_benchmark --modules 200 --files-per-module 100
+    python -m benchmarks.repo_index_benchmark --repo /path/to/checkout
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.image_selector import ImageSelector  # noqa: E402
+from src.language_handlers import extension_histogram  # noqa: E402
+from src.manifest_locator import ManifestLocator, SKIP_DIRS  # noqa: E402
+from src.repo_index import RepoIndex  # noqa: E402
+
+# Relevance filtering, _read_files_content, agent prompt builder, version solver.
+READS_PER_MANIFEST = 4
+
+
+def build_synthetic_monorepo(root: str, modules: int, files_per_module: int) -> None:
+    """Java/Node-style monorepo: one manifest per module plus many sources and fixtures."""
+    with open(os.path.join(root, "pom.xml"), "w", encoding="utf-8") as f:
+        f.write("<project><properties><java.version>17</java.version></properties></project>\n")
+    with open(os.path.join(root, "README.md"), "w", encoding="utf-8") as f:
+        f.write("# synthetic monorepo\n")
+    for module in range(modules):
+        module_dir = os.path.join(root, f"module{module:04d}")
+        source_dir = os.path.join(module_dir, "src", "main", "java")
+        fixture_dir = os.path.join(module_dir, "src", "test", "fixtures")
+        os.makedirs(source_dir)
+        os.makedirs(fixture_dir)
+        with open(os.path.join(module_dir, "pom.xml"), "w", encoding="utf-8") as f:
+            f.write(f"<project><artifactId>module{module}</artifactId></project>\n" * 50)
+        for index in range(files_per_module):
+            target = source_dir if index % 2 else fixture_dir
+            name = f"File{index}.java" if index % 2 else f"case{index}.json"
+            with open(os.path.join(target, name), "w", encoding="utf-8") as f:
+                f.write("// generated\n")
+
+
+def legacy_scan(repo_path: str) -> Dict[str, str]:
+    """
+    The pre-index access pattern: structure walk, locator walk, extension histogram
+    from the structure text, and every manifest opened by relevance filtering,
+    _read_files_content, the agent's prompt builder and the version solver.
+    """
+    # ImageSelector._generate_repo_structure before the index
+    structure_lines = []
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        level = root.replace(repo_path, '').count(os.sep)
+        structure_lines.append(f"{'  ' * level}{os.path.basename(root) or os.path.basename(repo_path)}/")
+        for file in sorted(files):
+            structure_lines.append(f"{'  ' * (level + 1)}{file}")
+    structure = '\n'.join(structure_lines)
+    names = (line.strip() for line in structure.split('\n'))
+    extension_histogram(name for name in names if name and not name.endswith('/'))
+    # ManifestLocator.locate before the index: a second walk of its own
+    rel_paths = []
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        rel_root = os.path.relpath(root, repo_path)
+        for file in sorted(files):
+            rel_path = file if rel_root == "." else os.path.join(rel_root, file)
+            rel_paths.append(rel_path.replace(os.sep, "/"))
+    manifests = ManifestLocator().select(rel_paths)
+    contents = {}
+    for _ in range(READS_PER_MANIFEST):
+        for rel_path in manifests:
+            full_path = os.path.join(repo_path, rel_path)
+            os.path.getsize(full_path)
+            with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
+                contents[rel_path] = f.read()
+    return contents
+
+
+def indexed_scan(repo_path: str) -> Dict[str, str]:
+    index = RepoIndex.build(repo_path)
+    index.render_collapsed_structure(ImageSelector.STRUCTURE_TOKEN_BUDGET)
+    index.extension_histogram()
+    contents = {}
+    for _ in range(READS_PER_MANIFEST):
+        for rel_path in index.manifest_files():
+            index.size(rel_path)
+            contents[rel_path] = index.read_text(rel_path)
+    return contents
+
+
+def best_of(fn: Callable[[str], Dict[str, str]], repo_path: str, repeats: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(repo_path)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark RepoIndex against the legacy multi-walk scan")
+    parser.add_argument("--repo", help="Scan an existing checkout instead of a synthetic monorepo")
+    parser.add_argument("--modules", type=int, default=200)
+    parser.add_argument("--files-per-module", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    temp_dir = None
+    repo_path = args.repo
+    if not repo_path:
+        temp_dir = tempfile.mkdtemp(prefix="repo_index_bench_")
+        repo_path = temp_dir
+        build_synthetic_monorepo(repo_path, args.modules, args.files_per_module)
+
+    try:
+        legacy_contents = legacy_scan(repo_path)
+        if indexed_scan(repo_path) != legacy_contents:
+            print("[Benchmark] Warning: index and legacy scan returned different manifest contents")
+        file_count = len(RepoIndex.build(repo_path).files)
+        legacy = best_of(legacy_scan, repo_path, args.repeats)
+        indexed = best_of(indexed_scan, repo_path, args.repeats)
+        print(f"[Benchmark] {file_count} files, {len(legacy_contents)} manifests")
+        print(f"[Benchmark] legacy multi-walk : {legacy * 1000:8.1f} ms")
+        print(f"[Benchmark] single-pass index : {indexed * 1000:8.1f} ms")
+        print(f"[Benchmark] speedup           : {legacy / indexed if indexed else float('inf'):8.2f}x")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Per-call overhead of tokenizer-backed counting against the old len // 4 estimate.
+
+Times a cold count, a memoised repeat and the planner's incremental prompt
+estimate on synthetic install logs, test logs, code and CJK text, and prints
+how far len // 4 is from the tokenizer's count for each.
+
+    python -m benchmarks.tokenizer_benchmark
+    python -m benchmarks.tokenizer_benchmark --model gpt-4o --repeats 200
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.planner import Planner  # noqa: E402
+from src.tokenizer import get_tokenizer  # noqa: E402
+
+
+def sample_texts() -> Dict[str, str]:
+    pip_log = "\n".join(
+        f"Collecting package{i}==1.{i}.0\n"
+        f"  Downloading package{i}-1.{i}.0-py3-none-any.whl (1{i % 10}4 kB)\n"
+        f"     ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━ 1{i % 10}4.2/1{i % 10}4.2 kB 3.1 MB/s eta 0:00:00"
+        for i in range(200)
+    )
+    pytest_log = "\n".join(
+        f"tests/test_module{i // 20}.py::test_case_{i} PASSED{' ' * 20}[{i * 100 // 400:3d}%]"
+        for i in range(400)
+    )
+    code = "\n".join(
+        f"def handler_{i}(request, *args, **kwargs):\n"
+        f"    payload = json.loads(request.body or '{{}}')\n"
+        f"    return JsonResponse({{'id': {i}, 'ok': payload.get('ok', False)}})\n"
+        for i in range(150)
+    )
+    cjk = "安装依赖时出现错误，请检查网络连接并重试。" * 300
+    return {"pip log": pip_log, "pytest log": pytest_log, "code": code, "cjk text": cjk}
+
+
+def per_call_us(fn: Callable[[], object], repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) / repeats * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark tokenizer-backed token counting")
+    parser.add_argument("--model", default="qwen3-max-2026-01-23")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    tokenizer = get_tokenizer(args.model)
+    print(f"[Benchmark] tokenizer for {args.model}: {tokenizer.name}")
+    print(f"[Benchmark] {'sample':<11} {'chars':>7} {'len//4':>7} {'tokens':>7} "
+          f"{'len//4 µs':>10} {'cold µs':>9} {'memo µs':>8}")
+    for name, text in sample_texts().items():
+        legacy = per_call_us(lambda: max(1, len(text) // 4), args.repeats)
+        # Distinct texts defeat the memo on every call.
+        copies = [f"{index} {text}" for index in range(args.repeats)]
+        iterator = iter(copies)
+        cold = per_call_us(lambda: tokenizer.count(next(iterator)), args.repeats)
+        tokenizer.count(text)
+        memo = per_call_us(lambda: tokenizer.count(text), args.repeats)
+        print(f"[Benchmark] {name:<11} {len(text):>7} {len(text) // 4:>7} {tokenizer.count(text):>7} "
+              f"{legacy:>10.2f} {cold:>9.1f} {memo:>8.2f}")
+
+    # Planner prompt estimate after a 12-step history: one append per step is counted.
+    planner = Planner(client=None, model=args.model)
+    planner.init_managed_history("https://github.com/example/repo")
+    texts = list(sample_texts().values())
+    for step_id in range(1, 13):
+        planner.append_step(step_id, f"Thought: step {step_id}\nAction: make", texts[step_id % len(texts)])
+    incremental = per_call_us(planner.estimate_prompt_tokens, args.repeats)
+    full = per_call_us(
+        lambda: sum(tokenizer._count(message["content"]) for message in planner.managed_history),
+        max(1, args.repeats // 10),
+    )
+    print(f"[Benchmark] planner prompt estimate: incremental {incremental:.1f} µs, "
+          f"recount every message {full:.1f} µs ({planner.estimate_prompt_tokens()} tokens)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -31,6 +31,7 @@ import re
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Tuple
 from agent import DockerAgent
+from src.model_router import parse_route_specs
 
 
 class MultiDockerEvalAdapter:
@@ -46,7 +47,8 @@ class MultiDockerEvalAdapter:
                                base_image: str = "auto",
                                model: str = "gpt-4o",
                                max_steps: int = 30,
-                               enable_observation_compression: bool = False) -> Dict[str, Any]:
+                               enable_observation_compression: bool = False,
+                               model_routes: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
         """
         处理单个评估实例
         
@@ -55,6 +57,7 @@ class MultiDockerEvalAdapter:
             base_image: Docker 基础镜像
             model: LLM 模型
             max_steps: 最大步骤数
+            model_routes: 按调用类型（planner/relevance/compression 等）的模型路由表
             
         Returns:
             docker_res 格式的结果字典
@@ -125,6 +128,7 @@ class MultiDockerEvalAdapter:
                 workplace=workplace,
                 base_commit=base_commit,  # checkout before image selection for accurate LLM analysis
                 enable_observation_compression=enable_observation_compression,
+                model_routes=model_routes,
             )
             
             # base_commit 已在 DockerAgent.__init__ 中完成 checkout
@@ -1285,7 +1289,8 @@ exit 1
                        model: str = "gpt-4o",
                        max_steps: int = 30,
                        enable_observation_compression: bool = False,
-                       limit: Optional[int] = None) -> str:
+                       limit: Optional[int] = None,
+                       model_routes: Optional[Dict[str, List[str]]] = None) -> str:
         """
         批量处理数据集
         
@@ -1320,6 +1325,7 @@ exit 1
                 model=model,
                 max_steps=max_steps,
                 enable_observation_compression=enable_observation_compression,
+                model_routes=model_routes,
             )
             results.append(result)
         
@@ -1386,6 +1392,13 @@ def main():
         action="store_true",
         help="Enable AgentDiet-style observation compression"
     )
+    parser.add_argument(
+        "--route",
+        action="append",
+        default=[],
+        metavar="CALL_TYPE=MODEL[,FALLBACK...]",
+        help="Route a call type to a model chain (repeatable), e.g. relevance=qwen-turbo,qwen-plus"
+    )
     parser.add_argument(
         "--limit",
         type=int,
@@ -1401,7 +1414,8 @@ def main():
         model=args.model,
         max_steps=args.max_steps,
         enable_observation_compression=args.enable_observation_compression,
-        limit=args.limit
+        limit=args.limit,
+        model_routes=parse_route_specs(args.route),
     )
 
 
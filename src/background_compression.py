@@ -0,0 +1,149 @@
+"""
+Background observation compression.
+
+An LLM compression of step s-a is submitted as soon as the scheduler allows
+it and runs on a worker thread while the next planner call and sandbox
+command proceed. Finished results are collected on the agent's thread at the
+top of each step (so ledger, stats and planner history are only touched
+there) and applied if the step is still inside the planner's history window.
+
+Several steps sharing one window can be submitted together; they are
+compressed with one batched call and collected together.
+
+Timing per task is recorded so the run summary can show how much compression
+latency was hidden behind other work versus spent blocking on it.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.observation_compressor import AgentStep, CompressionRecord
+
+
+class BackgroundCompressor:
+    MAX_WORKERS = 1
+
+    def __init__(self, compressor, max_workers: Optional[int] = None):
+        self.compressor = compressor
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # step_id -> (future, target step, scheduler decision); a batch shares one future.
+        self._pending: Dict[int, Tuple[Future, AgentStep, Any]] = {}
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.failed = 0
+        self.discarded = 0
+        self.compress_seconds = 0.0
+        self.blocking_seconds = 0.0
+
+    def submit(self, target_step: AgentStep, context_steps: List[AgentStep], decision: Any = None):
+        """Start compressing `target_step`; returns immediately."""
+        self.submit_batch([target_step], context_steps, [decision])
+
+    def submit_batch(
+        self,
+        target_steps: List[AgentStep],
+        context_steps: List[AgentStep],
+        decisions: Optional[List[Any]] = None,
+    ):
+        """Start compressing `target_steps` with one call over `context_steps`; returns immediately."""
+        decisions = decisions or [None] * len(target_steps)
+        with self._lock:
+            entries = [
+                (target_step, decision)
+                for target_step, decision in zip(target_steps, decisions)
+                if target_step.step_id not in self._pending
+            ]
+            if not entries:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="compress",
+                )
+            future = self._executor.submit(self._run, [step for step, _ in entries], list(context_steps))
+            for target_step, decision in entries:
+                self._pending[target_step.step_id] = (future, target_step, decision)
+            self.tasks += 1
+        step_ids = ", ".join(str(step.step_id) for step, _ in entries)
+        print(f"[Compression] Compressing step{'s' if len(entries) > 1 else ''} {step_ids} in the background")
+
+    def in_flight(self, step_id: int) -> bool:
+        with self._lock:
+            return step_id in self._pending
+
+    def _run(self, target_steps: List[AgentStep], context_steps: List[AgentStep]):
+        started = time.monotonic()
+        try:
+            if len(target_steps) == 1:
+                results = [self.compressor.compress(target_step=target_steps[0], context_steps=context_steps)]
+            else:
+                results = self.compressor.compress_batch(target_steps=target_steps, context_steps=context_steps)
+        except Exception as e:
+            step_ids = ", ".join(str(step.step_id) for step in target_steps)
+            print(f"[Compression] Background compression of step {step_ids} failed: {e}")
+            results = [
+                (
+                    target_step.observation_raw,
+                    CompressionRecord(
+                        eligible=True,
+                        original_chars=len(target_step.observation_raw or ""),
+                        reason="compression_failed",
+                    ),
+                )
+                for target_step in target_steps
+            ]
+        by_step = {step.step_id: result for step, result in zip(target_steps, results)}
+        return by_step, time.monotonic() - started
+
+    def collect(self, wait: bool = False) -> List[Tuple[AgentStep, str, CompressionRecord, Any]]:
+        """
+        Finished compressions as (step, reduced, record, decision), in step order.
+        With `wait`, blocks until every pending compression is done.
+        """
+        with self._lock:
+            pending = sorted(self._pending.items(), key=lambda item: item[0])
+        finished = []
+        timed = set()
+        for step_id, (future, target_step, decision) in pending:
+            if not future.done():
+                if not wait:
+                    continue
+                started = time.monotonic()
+                future.result()
+                self.blocking_seconds += time.monotonic() - started
+            by_step, seconds = future.result()
+            if id(future) not in timed:
+                timed.add(id(future))
+                self.compress_seconds += seconds
+            reduced, record = by_step[step_id]
+            if record.reason == "compression_failed":
+                self.failed += 1
+            with self._lock:
+                self._pending.pop(step_id, None)
+            finished.append((target_step, reduced, record, decision))
+        return finished
+
+    def shutdown(self, wait: bool = False):
+        """Drop queued compressions; one already running finishes on its own."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if not wait:
+                cancelled = {id(future) for future, _, _ in self._pending.values() if future.cancel()}
+                self._pending = {
+                    step_id: entry for step_id, entry in self._pending.items() if id(entry[0]) not in cancelled
+                }
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def get_summary(self) -> Dict[str, Any]:
+        overlap = max(0.0, self.compress_seconds - self.blocking_seconds)
+        return {
+            "tasks": self.tasks,
+            "failed": self.failed,
+            "discarded": self.discarded,
+            "compress_seconds": round(self.compress_seconds, 2),
+            "blocking_seconds": round(self.blocking_seconds, 2),
+            "overlap_seconds": round(overlap, 2),
+            "overlap_ratio": round(overlap / self.compress_seconds, 3) if self.compress_seconds else None,
+        }
@@ -0,0 +1,143 @@
+"""
+Decides which old observations to compress, before any compression call is made.
+
+The expected saving of a step is predicted from its observation metadata and
+log family (and learned per family from realised savings during the run).
+Rule-based compression is free, so it only has to clear the benefit threshold.
+An LLM compression additionally has to be needed — the projected planner
+prompt must be near the context budget — and to pay for itself: the tokens
+saved on every remaining planner call that still carries the step must exceed
+the reflection call's own cost. An LLM compression whose result is already in
+the compression cache costs nothing and is scheduled like a rule-based one.
+Skipped steps stay candidates, so they can be compressed later when the
+pressure rises.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.log_compressors import compress_log
+from src.observation_compressor import (
+    UNIFIED_COMPRESSION_SYSTEM_PROMPT,
+    AgentStep,
+    CompressionRecord,
+    estimate_tokens,
+)
+
+
+# Prior fraction of an observation's tokens that compression removes.
+FAMILY_SAVING_RATIOS = {
+    "pip": 0.85, "apt": 0.9, "npm": 0.8, "bundle": 0.8, "cargo": 0.85,
+    "pytest": 0.75, "rspec": 0.7, "jest": 0.7, "cargo test": 0.7, "go test": 0.6,
+}
+FEATURE_SAVING_RATIOS = {"test": 0.55, "install": 0.6, "error": 0.35, "plain": 0.4}
+_SYSTEM_PROMPT_TOKENS = estimate_tokens(UNIFIED_COMPRESSION_SYSTEM_PROMPT)
+
+
+@dataclass
+class ScheduleDecision:
+    compress: bool
+    reason: str
+    method: str
+    predicted_saving: int
+    feature_key: str
+
+
+@dataclass
+class CompressionScheduler:
+    context_budget_tokens: int = 32000
+    # LLM compression starts once the projected prompt exceeds this share of the budget.
+    pressure_ratio: float = 0.5
+    benefit_threshold_tokens: int = 300
+    # Weight of each realised saving in the learned per-family ratio.
+    learning_rate: float = 0.3
+    ratios: Dict[str, float] = field(default_factory=dict)
+    outcomes: List[Tuple[str, int, int]] = field(default_factory=list)
+    skipped: Dict[str, int] = field(default_factory=dict)
+    # Whether an LLM compression of the step would be served from the cache.
+    is_cached: Optional[Callable[[AgentStep], bool]] = field(default=None, repr=False)
+    # step_id -> (feature key, method); deferred steps are re-examined every step.
+    _keys: Dict[int, Tuple[str, str]] = field(default_factory=dict, repr=False)
+
+    def feature_key(self, step: AgentStep) -> Tuple[str, str]:
+        """(feature key, "rules" | "llm") for `step`, classified once per step."""
+        if step.step_id not in self._keys:
+            self._keys[step.step_id] = self._classify(step)
+        return self._keys[step.step_id]
+
+    def _classify(self, step: AgentStep) -> Tuple[str, str]:
+        # Only output the rule compressor actually shrinks counts as free.
+        ruled = compress_log(step.action, step.observation_raw or "")
+        if ruled is not None:
+            return ruled[0], "rules"
+        metadata = step.metadata or {}
+        for feature in ("test", "install", "error"):
+            if metadata.get(f"has_{feature}_markers"):
+                return f"feature:{feature}", "llm"
+        return "feature:plain", "llm"
+
+    def predict_saving(self, step: AgentStep) -> Tuple[int, str, str]:
+        """(predicted saved tokens, method, feature key) for compressing `step`."""
+        key, method = self.feature_key(step)
+        prior = FAMILY_SAVING_RATIOS.get(key) or FEATURE_SAVING_RATIOS[key.split(":", 1)[1]]
+        ratio = self.ratios.get(key, prior)
+        raw_tokens = (step.metadata or {}).get("raw_tokens_est") or estimate_tokens(step.observation_raw)
+        saved = int(raw_tokens * ratio)
+        shown_tokens = (step.metadata or {}).get("prompt_tokens_est")
+        if shown_tokens is not None and shown_tokens < raw_tokens:
+            # A head/tail view already hides part of the output; only the rest can be saved.
+            saved = max(0, shown_tokens - (raw_tokens - saved))
+        return saved, method, key
+
+    def decide(
+        self,
+        step: AgentStep,
+        projected_prompt_tokens: int,
+        remaining_calls: int,
+        window_tokens: int,
+    ) -> ScheduleDecision:
+        predicted, method, key = self.predict_saving(step)
+        if method == "llm" and self.is_cached is not None and self.is_cached(step):
+            method = "cached"
+
+        def verdict(compress: bool, reason: str) -> ScheduleDecision:
+            if not compress:
+                self.skipped[reason] = self.skipped.get(reason, 0) + 1
+            return ScheduleDecision(compress, reason, method, predicted, key)
+
+        if predicted < self.benefit_threshold_tokens:
+            return verdict(False, "predicted_benefit_too_small")
+        if remaining_calls <= 0:
+            return verdict(False, "no_remaining_calls")
+        if method in ("rules", "cached"):
+            return verdict(True, method)
+        if projected_prompt_tokens < self.pressure_ratio * self.context_budget_tokens:
+            return verdict(False, "low_context_pressure")
+        raw_tokens = (step.metadata or {}).get("raw_tokens_est") or estimate_tokens(step.observation_raw)
+        reflect_cost = _SYSTEM_PROMPT_TOKENS + window_tokens + max(0, raw_tokens - predicted)
+        if predicted * remaining_calls <= reflect_cost:
+            return verdict(False, "not_amortised")
+        return verdict(True, "context_pressure")
+
+    def record_outcome(self, decision: ScheduleDecision, record: CompressionRecord):
+        """Learn from the realised saving of a compression the scheduler allowed."""
+        realised = record.saved_tokens_est
+        self.outcomes.append((decision.feature_key, decision.predicted_saving, realised))
+        if record.original_tokens_est:
+            observed = realised / record.original_tokens_est
+            prior = self.ratios.get(decision.feature_key)
+            self.ratios[decision.feature_key] = (
+                observed if prior is None else (1 - self.learning_rate) * prior + self.learning_rate * observed
+            )
+
+    def get_summary(self) -> Dict[str, Any]:
+        predicted = sum(p for _, p, _ in self.outcomes)
+        realised = sum(r for _, _, r in self.outcomes)
+        return {
+            "context_budget_tokens": self.context_budget_tokens,
+            "scheduled": len(self.outcomes),
+            "skipped": dict(self.skipped),
+            "predicted_saved_tokens": predicted,
+            "realised_saved_tokens": realised,
+            "realised_to_predicted": round(realised / predicted, 3) if predicted else None,
+            "learned_ratios": {key: round(value, 3) for key, value in self.ratios.items()},
+        }
@@ -0,0 +1,411 @@
+"""
+Token-budgeted packing of repository docs and configuration files.
+
+Each file is split into sections (TOML/INI tables, top-level JSON keys, pom.xml
+blocks, CI `run:` steps and version keys, Markdown headings, Makefile targets)
+and every section gets a priority: version pins first, then dependency blocks,
+then test/CI steps, then setup documentation, then everything else. Sections are
+admitted by priority until the consumer's token budget is spent; what did not
+fit is reported instead of silently cut off at a character offset.
+"""
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.tokenizer import count_tokens, truncate_to_tokens
+
+
+PRIORITY_PIN = 100
+PRIORITY_DEPENDENCIES = 80
+PRIORITY_TEST = 60
+PRIORITY_SETUP_DOCS = 40
+PRIORITY_OTHER = 20
+PRIORITY_BOILERPLATE = 5
+
+# Files whose whole content is a version pin.
+VERSION_FILES = {
+    '.python-version', '.nvmrc', '.node-version', '.ruby-version', '.java-version',
+    '.tool-versions', '.sdkmanrc', 'rust-toolchain', 'rust-toolchain.toml', 'runtime.txt',
+    'global.json', '.go-version', 'mise.toml', '.mise.toml',
+}
+# Files that are (almost) nothing but dependency declarations.
+DEPENDENCY_FILES = {
+    'setup.py', 'go.mod', 'Gemfile', 'Pipfile', 'environment.yml', 'environment.yaml',
+    'build.gradle', 'build.gradle.kts', 'settings.gradle', 'settings.gradle.kts',
+    'pubspec.yaml', 'Dockerfile', 'CMakeLists.txt', 'stack.yaml', 'mix.exs',
+}
+
+# Text anywhere in a section that marks a runtime version declaration.
+VERSION_SIGNAL = re.compile(
+    r"requires-python|python_requires|rust-version|\"engines\"|\bengines\b|"
+    r"maven\.compiler\.(source|target|release)|<java\.version>|<release>|sourceCompatibility|"
+    r"targetCompatibility|^go \d|\"php\"\s*:|^ruby ['\"]|(python|node|java|go|ruby)-version",
+    re.IGNORECASE | re.MULTILINE,
+)
+_TABLE_HEADER = re.compile(r"^\s*\[\[?([^\]]+)\]\]?\s*$")
+_DEPENDENCY_TABLE = re.compile(
+    r"dependencies|requires|build-system|^options$|^project$|^package$|poetry$|workspace|"
+    r"toolchain|extras|^metadata$|^install$|^source$|^packages$|^dev-packages$",
+    re.IGNORECASE,
+)
+_TEST_TABLE = re.compile(r"test|pytest|tox|coverage|nox", re.IGNORECASE)
+_SETUP_HEADING = re.compile(
+    r"install|setup|set up|getting started|quick ?start|requirement|prerequisite|depend|"
+    r"build|compil|test|develop|contribut|environment|docker",
+    re.IGNORECASE,
+)
+_MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+_RST_UNDERLINE = re.compile(r"^([=\-~^\"'`#*+])\1{2,}\s*$")
+_MAKE_TARGET = re.compile(r"^([A-Za-z0-9_.\-/ ]+):(?!=)")
+_MAKE_TEST_TARGET = re.compile(r"test|check|install|deps|setup|build|ci|lint", re.IGNORECASE)
+_POM_BLOCK = re.compile(
+    r"^[ \t]*<(parent|properties|dependencyManagement|dependencies|build|modules|profiles)>.*?</\1>",
+    re.DOTALL | re.MULTILINE,
+)
+_POM_PRIORITIES = {
+    'parent': PRIORITY_PIN, 'properties': PRIORITY_PIN, 'dependencies': PRIORITY_DEPENDENCIES,
+    'dependencyManagement': PRIORITY_DEPENDENCIES, 'modules': PRIORITY_DEPENDENCIES,
+    'build': PRIORITY_TEST, 'profiles': PRIORITY_OTHER,
+}
+_JSON_PRIORITIES = {
+    'engines': PRIORITY_PIN, 'packageManager': PRIORITY_PIN, 'volta': PRIORITY_PIN,
+    'config': PRIORITY_PIN, 'sdk': PRIORITY_PIN,
+    'dependencies': PRIORITY_DEPENDENCIES, 'devDependencies': PRIORITY_DEPENDENCIES,
+    'peerDependencies': PRIORITY_DEPENDENCIES, 'optionalDependencies': PRIORITY_DEPENDENCIES,
+    'require': PRIORITY_DEPENDENCIES, 'require-dev': PRIORITY_DEPENDENCIES,
+    'workspaces': PRIORITY_DEPENDENCIES, 'compilerOptions': PRIORITY_DEPENDENCIES,
+    'scripts': PRIORITY_TEST, 'jest': PRIORITY_TEST, 'autoload': PRIORITY_OTHER,
+    'name': PRIORITY_OTHER, 'type': PRIORITY_OTHER, 'main': PRIORITY_OTHER,
+}
+_CI_VERSION_KEY = re.compile(
+    r"^\s*-?\s*(python|node|java|go|ruby|php|rust|dotnet)(-version)?\s*:|^\s*-?\s*(matrix|image|container|services|toolchain|jdk|rvm|php|language)\s*:",
+    re.IGNORECASE,
+)
+_CI_RUN_KEY = re.compile(r"^(\s*)-?\s*(run|script|before_install|install|before_script|test_script|commands?)\s*:")
+
+# Files at most this large are never split; they are kept or dropped whole.
+SMALL_FILE_TOKENS = 200
+# A section that does not fit is still included (cut short) when at least this
+# much budget is left and it is at least dependency-level.
+MIN_PARTIAL_TOKENS = 150
+# Room left after a truncated section for its "... omitted" note.
+PARTIAL_NOTE_TOKENS = 20
+
+
+@dataclass
+class Section:
+    path: str
+    title: str
+    text: str
+    priority: int
+    order: int = 0
+
+    @property
+    def tokens(self) -> int:
+        return count_tokens(self.text)
+
+
+@dataclass
+class PackResult:
+    text: str
+    budget: int
+    used_tokens: int
+    included: List[Tuple[str, str]] = field(default_factory=list)
+    truncated: List[Tuple[str, str]] = field(default_factory=list)
+    dropped: List[Tuple[str, str, int]] = field(default_factory=list)
+
+    def report(self) -> Dict:
+        return {
+            "budget_tokens": self.budget,
+            "used_tokens": self.used_tokens,
+            "included_sections": len(self.included),
+            "truncated": [f"{path} {title}" for path, title in self.truncated],
+            "dropped": [
+                {"file": path, "section": title, "tokens": tokens}
+                for path, title, tokens in self.dropped
+            ],
+        }
+
+
+# ---------------------------------------------------------------------------
+# Section extraction
+# ---------------------------------------------------------------------------
+
+def _bump_for_versions(section: Section) -> Section:
+    if section.priority < PRIORITY_PIN and VERSION_SIGNAL.search(section.text):
+        section.priority = PRIORITY_PIN
+    return section
+
+
+def _split_tables(path: str, text: str) -> List[Section]:
+    """TOML / INI / cfg: one section per [table]."""
+    sections: List[Section] = []
+    title, lines = "(top)", []
+
+    def flush():
+        if any(line.strip() for line in lines):
+            name = title.strip('[]')
+            if title == "(top)" or _DEPENDENCY_TABLE.search(name):
+                priority = PRIORITY_DEPENDENCIES
+            elif _TEST_TABLE.search(name):
+                priority = PRIORITY_TEST
+            elif name.startswith(("tool.", "flake8", "isort", "mypy", "pycodestyle", "pydocstyle")):
+                priority = PRIORITY_BOILERPLATE
+            else:
+                priority = PRIORITY_OTHER
+            sections.append(Section(path, title, '\n'.join(lines).strip('\n'), priority))
+
+    for line in text.split('\n'):
+        match = _TABLE_HEADER.match(line)
+        if match:
+            flush()
+            title, lines = f"[{match.group(1).strip()}]", [line]
+        else:
+            lines.append(line)
+    flush()
+    return sections
+
+
+def _split_json(path: str, text: str) -> Optional[List[Section]]:
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    sections = []
+    for key, value in data.items():
+        rendered = f'"{key}": {json.dumps(value, indent=2, ensure_ascii=False)}'
+        sections.append(Section(path, key, rendered, _JSON_PRIORITIES.get(key, PRIORITY_BOILERPLATE)))
+    return sections
+
+
+def _split_pom(path: str, text: str) -> List[Section]:
+    sections: List[Section] = []
+    remainder_parts: List[str] = []
+    last = 0
+    for match in _POM_BLOCK.finditer(text):
+        remainder_parts.append(text[last:match.start()])
+        last = match.end()
+        tag = match.group(1)
+        sections.append(Section(path, f"<{tag}>", match.group(0), _POM_PRIORITIES[tag]))
+    remainder_parts.append(text[last:])
+    remainder = re.sub(r"\n\s*\n+", "\n", ''.join(remainder_parts)).strip()
+    if remainder:
+        sections.insert(0, Section(path, "(project)", remainder, PRIORITY_OTHER))
+    return sections
+
+
+def _split_ci(path: str, text: str) -> List[Section]:
+    """CI YAML: runtime version keys, then `run:`/`script:` steps, then the rest."""
+    lines = text.split('\n')
+    versions: List[str] = []
+    steps: List[str] = []
+    rest: List[str] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        match = _CI_RUN_KEY.match(line) or _CI_VERSION_KEY.match(line)
+        if match:
+            target = steps if _CI_RUN_KEY.match(line) else versions
+            indent = len(line) - len(line.lstrip())
+            block = [line]
+            i += 1
+            # Take the key's value block: every following line indented deeper.
+            while i < len(lines) and (not lines[i].strip() or len(lines[i]) - len(lines[i].lstrip()) > indent):
+                block.append(lines[i])
+                i += 1
+            target.append('\n'.join(block).rstrip())
+            continue
+        rest.append(line)
+        i += 1
+    sections = []
+    if versions:
+        sections.append(Section(path, "runtime versions", '\n'.join(versions), PRIORITY_PIN))
+    if steps:
+        sections.append(Section(path, "run steps", '\n'.join(steps), PRIORITY_TEST))
+    remaining = '\n'.join(line for line in rest if line.strip())
+    if remaining:
+        sections.append(Section(path, "(other keys)", remaining, PRIORITY_BOILERPLATE))
+    return sections
+
+
+def _split_markdown(path: str, text: str) -> List[Section]:
+    lines = text.split('\n')
+    sections: List[Section] = []
+    title, body = "(intro)", []
+    in_fence = False
+
+    def flush():
+        if any(line.strip() for line in body):
+            priority = PRIORITY_SETUP_DOCS if _SETUP_HEADING.search(title) else PRIORITY_OTHER
+            sections.append(Section(path, title, '\n'.join(body).strip('\n'), priority))
+
+    for idx, line in enumerate(lines):
+        if line.lstrip().startswith(("```", "~~~")):
+            in_fence = not in_fence
+        heading = None if in_fence else _MARKDOWN_HEADING.match(line)
+        next_line = lines[idx + 1] if idx + 1 < len(lines) else ""
+        if heading:
+            flush()
+            title, body = heading.group(2), [line]
+        elif not in_fence and line.strip() and _RST_UNDERLINE.match(next_line) and not _RST_UNDERLINE.match(line):
+            flush()
+            title, body = line.strip(), [line]
+        else:
+            body.append(line)
+    flush()
+    return sections
+
+
+def _split_makefile(path: str, text: str) -> List[Section]:
+    sections: List[Section] = []
+    title, body = "(variables)", []
+
+    def flush():
+        if any(line.strip() for line in body):
+            if title == "(variables)":
+                priority = PRIORITY_OTHER
+            else:
+                priority = PRIORITY_TEST if _MAKE_TEST_TARGET.search(title) else PRIORITY_BOILERPLATE
+            sections.append(Section(path, title, '\n'.join(body).strip('\n'), priority))
+
+    for line in text.split('\n'):
+        match = _MAKE_TARGET.match(line)
+        if match and not line.startswith(('\t', ' ', '.PHONY')):
+            flush()
+            title, body = f"{match.group(1).strip()}:", [line]
+        else:
+            body.append(line)
+    flush()
+    return sections
+
+
+def split_sections(path: str, text: str) -> List[Section]:
+    """Split one file into prioritised sections (in file order)."""
+    basename = os.path.basename(path)
+    lower = basename.lower()
+    ext = os.path.splitext(lower)[1]
+    if basename in VERSION_FILES:
+        sections = [Section(path, "(file)", text.strip('\n'), PRIORITY_PIN)]
+    elif ext == '.json':
+        sections = _split_json(path, text) or [Section(path, "(file)", text, PRIORITY_DEPENDENCIES)]
+    elif lower == 'pom.xml':
+        sections = _split_pom(path, text)
+    elif ext in ('.toml', '.cfg', '.ini') or basename == 'Pipfile':
+        sections = _split_tables(path, text)
+    elif ext in ('.yml', '.yaml') and ('workflows/' in path or lower.lstrip('.') in (
+            'travis.yml', 'gitlab-ci.yml', 'appveyor.yml', 'azure-pipelines.yml', 'config.yml')):
+        sections = _split_ci(path, text)
+    elif ext in ('.md', '.rst', '.markdown') or lower.startswith(('readme', 'install', 'contributing')):
+        sections = _split_markdown(path, text)
+    elif lower in ('makefile', 'gnumakefile'):
+        sections = _split_makefile(path, text)
+    elif basename in DEPENDENCY_FILES or lower.startswith('requirements') or lower.startswith('dockerfile'):
+        sections = [Section(path, "(file)", text.strip('\n'), PRIORITY_DEPENDENCIES)]
+    else:
+        sections = [Section(path, "(file)", text.strip('\n'), PRIORITY_OTHER)]
+
+    sections = [_bump_for_versions(s) for s in sections if s.text.strip()]
+    # Small files read better whole; keep them as one unit at their best priority.
+    if len(sections) > 1 and count_tokens(text) <= SMALL_FILE_TOKENS:
+        sections = [Section(path, "(file)", text.strip('\n'), max(s.priority for s in sections))]
+    for order, section in enumerate(sections):
+        section.order = order
+    return sections
+
+
+# ---------------------------------------------------------------------------
+# Packing
+# ---------------------------------------------------------------------------
+
+class ContextPacker:
+    """
+    Fill a token budget with the highest-priority sections of a set of files.
+
+    `file_ranks` breaks priority ties between files (lower rank first);
+    `file_template` renders one file's admitted sections.
+    """
+
+    def __init__(self, budget_tokens: int, file_ranks: Optional[Dict[str, int]] = None,
+                 file_template: str = "File: {path}\n```\n{content}\n```\n"):
+        self.budget_tokens = budget_tokens
+        self.file_ranks = file_ranks or {}
+        self.file_template = file_template
+
+    def _rank(self, path: str) -> int:
+        return self.file_ranks.get(os.path.basename(path), len(self.file_ranks))
+
+    def pack(self, files_content: Dict[str, str], header: str = "", footer: str = "") -> PackResult:
+        file_order = {path: i for i, path in enumerate(files_content)}
+        sections: List[Section] = []
+        for path, text in files_content.items():
+            sections.extend(split_sections(path, text or ""))
+
+        overhead = count_tokens(header) + count_tokens(footer)
+        remaining = self.budget_tokens - overhead
+        admitted: Dict[str, List[Section]] = {}
+        result = PackResult(text="", budget=self.budget_tokens, used_tokens=overhead)
+
+        ranked = sorted(
+            sections,
+            key=lambda s: (-s.priority, self._rank(s.path), file_order[s.path], s.order),
+        )
+        for section in ranked:
+            # The first section of a file also pays for the file's header line.
+            cost = section.tokens + (0 if section.path in admitted else count_tokens(
+                self.file_template.format(path=section.path, content="")))
+            if cost <= remaining:
+                admitted.setdefault(section.path, []).append(section)
+                remaining -= cost
+                result.included.append((section.path, section.title))
+                continue
+            available_tokens = remaining - (cost - section.tokens)
+            if (section.priority >= PRIORITY_DEPENDENCIES and remaining >= MIN_PARTIAL_TOKENS
+                    and available_tokens > 2 * PARTIAL_NOTE_TOKENS):
+                cut = truncate_to_tokens(section.text, available_tokens - PARTIAL_NOTE_TOKENS).rsplit('\n', 1)[0]
+                omitted = section.tokens - count_tokens(cut)
+                partial = Section(section.path, section.title,
+                                  f"{cut}\n... (~{omitted} more tokens of {section.title} omitted)",
+                                  section.priority, section.order)
+                admitted.setdefault(section.path, []).append(partial)
+                remaining -= count_tokens(partial.text) + (cost - section.tokens)
+                result.included.append((section.path, section.title))
+                result.truncated.append((section.path, section.title))
+                continue
+            result.dropped.append((section.path, section.title, section.tokens))
+
+        dropped_by_file: Dict[str, List[str]] = {}
+        for path, title, _ in result.dropped:
+            dropped_by_file.setdefault(path, []).append(title)
+
+        parts = [header] if header else []
+        for path in files_content:
+            chosen = sorted(admitted.get(path, []), key=lambda s: s.order)
+            if not chosen:
+                continue
+            content = '\n'.join(s.text for s in chosen)
+            if path in dropped_by_file:
+                content += f"\n... (omitted: {', '.join(dropped_by_file[path])})"
+            parts.append(self.file_template.format(path=path, content=content))
+        fully_dropped = [path for path in files_content if path not in admitted]
+        if fully_dropped:
+            parts.append(f"... (omitted to stay within {self.budget_tokens} tokens: {', '.join(fully_dropped)})\n")
+        if footer:
+            parts.append(footer)
+        result.text = '\n'.join(parts)
+        result.used_tokens = self.budget_tokens - remaining
+        return result
+
+
+def describe_dropped(result: PackResult, limit: int = 5) -> str:
+    """One-line summary of dropped sections for console logging."""
+    if not result.dropped:
+        return "nothing dropped"
+    names = [f"{path} {title}" for path, title, _ in result.dropped[:limit]]
+    more = len(result.dropped) - limit
+    suffix = f" and {more} more" if more > 0 else ""
+    tokens = sum(tokens for _, _, tokens in result.dropped)
+    return f"dropped {len(result.dropped)} sections (~{tokens} tokens): {', '.join(names)}{suffix}"
@@ -0,0 +1,197 @@
+"""
+Capability catalog for candidate base images.
+
+Each local image is probed once (one short-lived container runs a shell script
+that reports which setup tools and runtimes are present) and the result is
+cached on disk by image id, so a re-pulled tag is probed again while an
+unchanged one never is. Images that are not local are never pulled just to be
+probed; they keep the last probe recorded for their tag, if any. Sizes are the
+local (uncompressed) image size; registry download sizes are not fetched.
+
+The selector annotates its candidate list with this information and the planner
+is told up front which tools the base image already ships, so neither spends
+effort on images or installs it does not need.
+"""
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import docker
+
+from src.persistent_cache import JsonFileCache, content_hash
+
+
+# Bump when the probe script changes so cached capabilities are not reused.
+CATALOG_VERSION = "v1"
+
+# Tools the planner otherwise installs in its first steps.
+PROBE_TOOLS = [
+    "git", "curl", "wget", "zip", "unzip", "make", "gcc", "g++", "cmake",
+    "pkg-config", "bash", "apt-get", "apk", "yum",
+]
+# Tools most projects need during setup; their absence costs setup steps.
+ESSENTIAL_TOOLS = ["git", "curl", "zip", "unzip", "make", "gcc"]
+RUNTIME_PROBES = {
+    "python": "python3 --version || python --version",
+    "node": "node --version",
+    "java": "java -version",
+    "go": "go version",
+    "ruby": "ruby --version",
+    "php": "php --version",
+    "rust": "rustc --version",
+    "dotnet": "dotnet --version",
+    "composer": "composer --version",
+}
+_VERSION = re.compile(r"(\d+\.\d+(?:\.\d+)?)")
+
+
+def build_probe_script() -> str:
+    lines = [f'command -v {tool} >/dev/null 2>&1 && echo "tool:{tool}"' for tool in PROBE_TOOLS]
+    for name, command in RUNTIME_PROBES.items():
+        lines.append(f'out=$( ({command}) 2>&1 | head -n 1) && echo "runtime:{name}:$out"')
+    lines.append("true")
+    return "\n".join(lines)
+
+
+def parse_probe_output(output: str) -> Dict[str, object]:
+    tools: List[str] = []
+    runtimes: Dict[str, str] = {}
+    for line in output.splitlines():
+        if line.startswith("tool:"):
+            tools.append(line[len("tool:"):].strip())
+        elif line.startswith("runtime:"):
+            _, name, text = line.split(":", 2)
+            match = _VERSION.search(text)
+            if match:
+                runtimes[name] = match.group(1)
+    return {"tools": sorted(set(tools)), "runtimes": runtimes}
+
+
+@dataclass
+class ImageCapabilities:
+    image: str
+    platform: Optional[str] = None
+    local: bool = False
+    probed: bool = False
+    image_id: Optional[str] = None
+    # Uncompressed size on disk, known once the image has been local.
+    size_bytes: Optional[int] = None
+    tools: List[str] = field(default_factory=list)
+    runtimes: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def missing_tools(self) -> List[str]:
+        return [tool for tool in ESSENTIAL_TOOLS if tool not in self.tools] if self.probed else []
+
+    def describe(self) -> str:
+        """Compact one-line description for prompts."""
+        facts = ["local" if self.local else "not pulled yet"]
+        if self.size_bytes:
+            facts.append(f"{self.size_bytes / 1e6:,.0f} MB on disk")
+        if self.probed:
+            present = [tool for tool in ESSENTIAL_TOOLS if tool in self.tools]
+            if present:
+                facts.append(f"has {', '.join(present)}")
+            if self.missing_tools:
+                facts.append(f"lacks {', '.join(self.missing_tools)}")
+            if self.runtimes:
+                facts.append(", ".join(f"{name} {version}" for name, version in sorted(self.runtimes.items())))
+        return f"{self.image} ({'; '.join(facts)})"
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class ImageCatalog:
+    def __init__(self, client=None, cache: Optional[JsonFileCache] = None):
+        self._client = client
+        self.cache = cache or JsonFileCache("image_catalog")
+        self._memo: Dict[tuple, ImageCapabilities] = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = docker.from_env()
+        return self._client
+
+    def lookup(self, image: str, platform: Optional[str] = None) -> ImageCapabilities:
+        """Capabilities of `image`, probing it if it is local and not yet catalogued."""
+        memo_key = (image, platform)
+        if memo_key in self._memo:
+            return self._memo[memo_key]
+        tag_key = content_hash(CATALOG_VERSION, "tag", image, platform or "")
+        try:
+            local = self.client.images.get(image)
+        except (docker.errors.ImageNotFound, docker.errors.APIError):
+            local = None
+        except Exception as e:
+            print(f"[ImageCatalog] Docker unavailable: {e}")
+            local = None
+
+        if local is None:
+            cached = self.cache.get(tag_key)
+            capabilities = ImageCapabilities(**cached) if cached else ImageCapabilities(image, platform)
+            capabilities.local = False
+        else:
+            id_key = content_hash(CATALOG_VERSION, "id", local.id, platform or "")
+            cached = self.cache.get(id_key)
+            if cached:
+                capabilities = ImageCapabilities(**cached)
+            else:
+                capabilities = self._probe(image, platform, local)
+                if capabilities.probed:
+                    self.cache.set(id_key, capabilities.to_dict())
+                    self.cache.set(tag_key, capabilities.to_dict())
+            capabilities.local = True
+            # Non-local answers are not memoised: the image may be pulled later in the run.
+            self._memo[memo_key] = capabilities
+        return capabilities
+
+    def _probe(self, image: str, platform: Optional[str], local) -> ImageCapabilities:
+        attrs = getattr(local, "attrs", {}) or {}
+        capabilities = ImageCapabilities(
+            image, platform, local=True, image_id=local.id, size_bytes=attrs.get("Size"),
+        )
+        print(f"[ImageCatalog] Probing {image} for preinstalled tools...")
+        try:
+            # The entrypoint is replaced so images like composer:2 run the probe as-is.
+            output = self.client.containers.run(
+                image,
+                [build_probe_script()],
+                entrypoint=["sh", "-c"],
+                remove=True,
+                platform=platform,
+                network_disabled=True,
+            )
+        except Exception as e:
+            print(f"[ImageCatalog] Probe of {image} failed: {e}")
+            return capabilities
+        parsed = parse_probe_output(output.decode("utf-8", errors="replace") if isinstance(output, bytes) else output)
+        capabilities.tools = parsed["tools"]
+        capabilities.runtimes = parsed["runtimes"]
+        capabilities.probed = True
+        return capabilities
+
+    def rank(self, images: List[str], platform: Optional[str] = None) -> List[ImageCapabilities]:
+        """Cheapest first: local images, then fewer missing essentials, then smaller size."""
+        entries = [self.lookup(image, platform) for image in images]
+        return sorted(
+            entries,
+            key=lambda c: (not c.local, len(c.missing_tools), c.size_bytes or float("inf")),
+        )
+
+    def describe_candidates(self, images: List[str], platform: Optional[str] = None) -> str:
+        """Candidate list for prompts, one annotated image per line, in the given order."""
+        return "\n".join(f"- {self.lookup(image, platform).describe()}" for image in images)
+
+    def setup_hint(self, image: str, platform: Optional[str] = None) -> str:
+        """Planner context: what the chosen base image already provides."""
+        capabilities = self.lookup(image, platform)
+        if not capabilities.probed:
+            return ""
+        lines = [f"Base image: {capabilities.describe()}"]
+        if capabilities.tools:
+            lines.append(f"Already installed (do not reinstall): {', '.join(capabilities.tools)}")
+        if capabilities.missing_tools:
+            lines.append(f"Not installed: {', '.join(capabilities.missing_tools)}")
+        return "\n".join(lines)
@@ -0,0 +1,115 @@
+"""
+Background base-image pulls.
+
+The selector knows the likely base images well before the Sandbox starts (the
+solver's pick, or the preferred candidates while the select_image LLM call is
+still running), so pulls are started on a small thread pool as soon as they are
+known. Images already present locally for the requested platform are not pulled
+again. `ensure` is what the Sandbox calls: it waits for a prefetch in flight or
+pulls synchronously, and every pull is timed for the run summary.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import docker
+
+
+class ImagePrefetcher:
+    MAX_WORKERS = 2
+
+    def __init__(self, client=None, max_workers: Optional[int] = None):
+        self._client = client
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[Tuple[str, Optional[str]], Future] = {}
+        self._records: Dict[Tuple[str, Optional[str]], Dict] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = docker.from_env()
+        return self._client
+
+    def is_local(self, image: str, platform: Optional[str] = None) -> bool:
+        """True when `image` is present locally (and built for `platform`, if given)."""
+        try:
+            local = self.client.images.get(image)
+        except docker.errors.ImageNotFound:
+            return False
+        except docker.errors.APIError as e:
+            print(f"[Prefetch] Could not inspect {image}: {e}")
+            return False
+        if not platform:
+            return True
+        parts = platform.split('/')
+        attrs = getattr(local, "attrs", {}) or {}
+        if attrs.get("Os", parts[0]) != parts[0]:
+            return False
+        return len(parts) < 2 or attrs.get("Architecture", parts[1]) == parts[1]
+
+    def prefetch(self, images: List[str], platform: Optional[str] = None):
+        """Start background pulls for `images` (once each); returns immediately."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch")
+            for image in images:
+                key = (image, platform)
+                if key in self._futures or key in self._records:
+                    continue
+                print(f"[Prefetch] Pulling {image} in the background" + (f" ({platform})" if platform else ""))
+                self._futures[key] = self._executor.submit(self._pull, image, platform, "prefetch")
+
+    def ensure(self, image: str, platform: Optional[str] = None) -> Dict:
+        """Make `image` available locally, reusing a prefetch in flight. Returns its pull record."""
+        key = (image, platform)
+        with self._lock:
+            future = self._futures.get(key)
+            record = self._records.get(key)
+        if future is not None and future.cancelled():
+            future = None
+        if future is not None:
+            started = time.monotonic()
+            record = future.result()
+            record["waited_seconds"] = round(time.monotonic() - started, 2)
+        elif record is None:
+            record = self._pull(image, platform, "on_demand")
+        record["used"] = True
+        return record
+
+    def _pull(self, image: str, platform: Optional[str], source: str) -> Dict:
+        started = time.monotonic()
+        record = {"image": image, "platform": platform, "source": source, "used": False}
+        if self.is_local(image, platform):
+            record.update(status="cached", pull_seconds=0.0)
+        else:
+            try:
+                self.client.images.pull(image, platform=platform)
+                record["status"] = "pulled"
+            except Exception as e:
+                # containers.run will retry the pull and surface a real error.
+                print(f"[Prefetch] Pull of {image} failed: {e}")
+                record.update(status="failed", error=str(e))
+            record["pull_seconds"] = round(time.monotonic() - started, 2)
+            print(f"[Prefetch] {image}: {record['status']} in {record['pull_seconds']}s")
+        with self._lock:
+            self._records[(image, platform)] = record
+        return record
+
+    def shutdown(self, wait: bool = False):
+        """Drop prefetches that have not started; pulls already running finish on their own."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def get_summary(self) -> Dict:
+        with self._lock:
+            records = [dict(record) for record in self._records.values()]
+        return {
+            "images": records,
+            "pull_seconds": round(sum(r.get("pull_seconds", 0.0) for r in records), 2),
+            "unused_pulls": [r["image"] for r in records if r["status"] == "pulled" and not r["used"]],
+        }
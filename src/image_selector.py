@@ -4,6 +4,8 @@ Inspired by RepoLaunch's approach: analyze repo structure and files to select op
 """
 import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 from openai import OpenAI
 import json
@@ -14,6 +16,14 @@ from src.language_handlers import (
     detect_language,
     LANGUAGE_HANDLERS
 )
+from src.model_router import ModelRouter
+from src.persistent_cache import JsonFileCache, content_hash
+from src.manifest_locator import ManifestLocator
+from src.version_solver import VersionSolver
+from src.repo_index import RepoIndex
+from src.context_packer import ContextPacker, describe_dropped
+from src.image_prefetcher import ImagePrefetcher
+from src.image_catalog import ImageCatalog
 
 
 # Prompt for locating potentially relevant files
@@ -49,26 +59,47 @@ Example:
 
 
 # Prompt for determining if a file is relevant
-DETERMINE_RELEVANCE_PROMPT = """Given a file from the repository, determine if it is relevant for:
+# Bump when the relevance prompt changes so cached verdicts are not reused.
+RELEVANCE_PROMPT_VERSION = "batch-v1"
+
+# Bump when the selection pipeline changes so cached selections are not reused.
+SELECTION_CACHE_VERSION = "v2"
+
+# Prompt for judging the relevance of several files in one call
+DETERMINE_RELEVANCE_PROMPT = """Given the following files from the repository, determine for EACH file whether it is relevant for:
 1. Setting up a development environment
 2. Selecting an appropriate base Docker image
 3. Understanding language or runtime version requirements
 
-### File:
-{file}
+### Files:
+{files}
 
-### Reply with the following format:
-<rel>Yes</rel>
+### Reply with exactly one line per file, using the file path shown above:
+<rel file="path/to/file">Yes</rel>
 
 or
 
-<rel>No</rel>
+<rel file="path/to/file">No</rel>
 
-Choose either Yes or No.
+Choose either Yes or No for every file.
 Yes means this file IS relevant for environment setup and base image selection (e.g., it specifies language versions, dependencies, or build steps).
 No means this file is NOT relevant (e.g., pure source code, user-facing documentation, test data, or unrelated configuration).
 """
 
+# Dependencies known to ship x86-64-only binaries; seeing one forces linux/amd64.
+ARM64_INCOMPATIBLE_MARKERS = (
+    "embedded-postgres",
+    "zonky.test",
+    "embedded-mysql",
+    "wix-embedded-mysql",
+    "mariadb4j",
+    "de.flapdoodle.embed",
+)
+
+RELEVANCE_VERDICT_PATTERN = re.compile(
+    r'<rel\s+file="([^"]+)"\s*>\s*(Yes|No)\s*</rel>', re.IGNORECASE
+)
+
 
 # Prompt for detecting primary language via LLM
 DETECT_LANGUAGE_PROMPT = """Based on the following repository files, identify the PRIMARY programming language of this project.
@@ -154,13 +185,55 @@ class ImageSelector:
     
     # Size threshold for file content (256KB)
     FILE_SIZE_THRESHOLD = 128 * 1000 * 2
-    MAX_STRUCTURE_LINES = 600
-    MAX_DOCS_CHARS = 24000
-    MAX_FILE_SNIPPET_CHARS = 6000
+    # Token budget for the collapsed structure (structure.txt, locate prompt, planner prompt).
+    STRUCTURE_TOKEN_BUDGET = 4000
+    # Token budget for the packed docs shown to the detection/selection prompts.
+    DOCS_TOKEN_BUDGET = 6000
+    # Relevance checks are grouped into prompts of at most this many files / chars,
+    # and the batches run concurrently on a bounded pool.
+    RELEVANCE_BATCH_FILES = 8
+    RELEVANCE_BATCH_CHARS = 32000
+    RELEVANCE_MAX_WORKERS = 4
+    # Below this many rule-located files, fall back to the locate_files LLM call.
+    LOCATE_MIN_RULE_FILES = 3
+    # Images pulled in the background while the select_image LLM call runs.
+    PREFETCH_CANDIDATES = 2
+    # Rule-based language detection below this confidence defers to the LLM.
+    DETECTION_CONFIDENCE_THRESHOLD = 0.7
     
-    def __init__(self, client: OpenAI, model: str = "gpt-4o"):
+    def __init__(
+        self,
+        client: OpenAI,
+        model: str = "gpt-4o",
+        router: Optional[ModelRouter] = None,
+        relevance_cache: Optional[JsonFileCache] = None,
+        selection_cache: Optional[JsonFileCache] = None,
+        prefetcher: Optional[ImagePrefetcher] = None,
+        catalog: Optional[ImageCatalog] = None,
+        catalog_tie_break: bool = False,
+    ):
         self.client = client
         self.model = model
+        # Each selector call type (locate_files, relevance, detect_language,
+        # select_image) may be routed to its own model chain.
+        self.router = router or ModelRouter(client, model)
+        # Verdicts keyed by file content hash: re-analysing the same commit costs no calls.
+        self.relevance_cache = relevance_cache or JsonFileCache("relevance")
+        self.manifest_locator = ManifestLocator()
+        # Built once per analysed repository and shared with the agent afterwards.
+        self.index: Optional[RepoIndex] = None
+        # Whole selections keyed by manifest fingerprint: a hit skips every LLM call.
+        self.selection_cache = selection_cache or JsonFileCache("image_selection")
+        # When set, likely base images are pulled while the remaining LLM calls run.
+        self.prefetcher = prefetcher
+        # When set, candidates are annotated with local availability, size and preinstalled tools.
+        self.catalog = catalog
+        # Opt-in: among equally supported versions, prefer what is cheapest on this
+        # host (local, fewer missing tools). Host-dependent, so such picks are not cached.
+        self.catalog_tie_break = catalog_tie_break
+        # Report of the last docs packing (what fit the token budget, what was dropped).
+        self.docs_packing: Optional[Dict] = None
+        self._lock = threading.Lock()
         self._log_dir: Optional[str] = None
         self._log_counter: int = 0
         self.token_usage = {
@@ -179,8 +252,9 @@ class ImageSelector:
         """Write a single LLM call to {n}.md in RepoLaunch examples format."""
         if not self._log_dir:
             return
-        idx = self._log_counter
-        self._log_counter += 1
+        with self._lock:
+            idx = self._log_counter
+            self._log_counter += 1
         header = f"[{label}] " if label else ""
         content = (
             f"##### LLM INPUT ({header}call #{idx}) #####\n"
@@ -208,9 +282,10 @@ class ImageSelector:
         usage = getattr(response, "usage", None)
         if not usage:
             return
-        self.token_usage["input_tokens"] += usage.prompt_tokens
-        self.token_usage["output_tokens"] += usage.completion_tokens
-        self.token_usage["total_tokens"] += usage.total_tokens
+        with self._lock:
+            self.token_usage["input_tokens"] += usage.prompt_tokens
+            self.token_usage["output_tokens"] += usage.completion_tokens
+            self.token_usage["total_tokens"] += usage.total_tokens
 
     def get_token_usage(self) -> Dict[str, int]:
         return dict(self.token_usage)
@@ -223,8 +298,9 @@ class ImageSelector:
             available_languages=", ".join(available_languages)
         )
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = self.router.create(
+                "detect_language",
+                accept=lambda r: "<lang>" in (r.choices[0].message.content or ""),
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0
             )
@@ -245,24 +321,46 @@ class ImageSelector:
             print(f"[ImageSelector] LLM language detection failed: {e}")
         return None
 
-    def _write_summary_log(self, potential_files: List[str], relevant_files: List[str],
-                           detected_language: str, selected_image: str,
-                           detection_method: str = "unknown"):
-        """Write summary.json with key results."""
+    def _write_summary_log(self, summary: Dict):
+        """Write summary.json with key results (plus this run's call and cache counters)."""
         if not self._log_dir:
             return
-        summary = {
-            "potential_files": potential_files,
-            "relevant_files": relevant_files,
-            "detected_language": detected_language,
-            "detection_method": detection_method,
-            "selected_image": selected_image,
-            "total_llm_calls": self._log_counter,
-        }
+        summary = dict(summary)
+        summary["total_llm_calls"] = self._log_counter
+        summary["relevance_cache"] = self.relevance_cache.get_stats()
         path = os.path.join(self._log_dir, "summary.json")
         with open(path, "w", encoding="utf-8") as f:
             json.dump(summary, f, indent=2, ensure_ascii=False)
-    
+
+    def _selection_cache_key(
+        self,
+        rule_files: List[str],
+        repo_structure: str,
+        platform: str,
+        language_hint: Optional[str],
+    ) -> str:
+        """
+        Fingerprint of everything the selection depends on: located manifest contents,
+        rule-based language scores (which also follow the extension histogram),
+        candidate images, platform, hint and the routed models. When rules find too few
+        files the LLM may locate others, so the whole structure is fingerprinted too.
+        """
+        parts = [SELECTION_CACHE_VERSION, platform, language_hint or ""]
+        if not language_hint:
+            _, _, scores = self.index.language_hints()
+            parts.append(",".join(f"{name}={score:.3f}" for name, score in sorted(scores.items())))
+        for file_path in sorted(rule_files):
+            text = self.index.read_text(file_path)
+            digest = content_hash(text) if text is not None else "missing"
+            parts.append(f"{file_path}:{digest}")
+        if len(rule_files) < self.LOCATE_MIN_RULE_FILES:
+            parts.append(repo_structure)
+        for name, handler in sorted(LANGUAGE_HANDLERS.items()):
+            parts.append(f"{name}={','.join(handler.base_images(platform))}")
+        for call_type in ("locate_files", "relevance", "detect_language", "select_image"):
+            parts.append(f"{call_type}={','.join(self.router.chain_for(call_type))}")
+        return content_hash(*parts)
+
     def select_base_image(
         self, 
         repo_path: str, 
@@ -288,13 +386,29 @@ class ImageSelector:
 
         print("[ImageSelector] Analyzing repository structure...")
         
-        # Step 1: Generate repository structure
+        # Step 1: Index the repository once and render its structure
+        index = self._get_index(repo_path)
         repo_structure = self._generate_repo_structure(repo_path)
         self._write_structure_log(repo_structure)
         
-        # Step 2: Locate potentially relevant files
-        potential_files = self._locate_potential_files(repo_structure)
-        print(f"[ImageSelector] Found {len(potential_files)} potentially relevant files")
+        # Step 2: Locate potentially relevant files (catalog rules first, LLM only if they find too little)
+        rule_files = index.manifest_files()
+        cache_key = self._selection_cache_key(rule_files, repo_structure, platform, language_hint)
+        cached = self.selection_cache.get(cache_key)
+        if cached:
+            print(f"[ImageSelector] Reusing cached selection: {cached['selected_image']} ({cached['detected_language']})")
+            self._write_summary_log(dict(cached["summary"], cache_hit=True))
+            if self.prefetcher:
+                self.prefetcher.prefetch([cached["selected_image"]], cached["platform_override"])
+            return (
+                cached["selected_image"],
+                get_language_handler(cached["detected_language"]),
+                cached["docs"],
+                cached["platform_override"],
+            )
+
+        potential_files, locate_method = self._locate_files(rule_files, repo_structure)
+        print(f"[ImageSelector] Found {len(potential_files)} potentially relevant files (via {locate_method})")
         
         # Step 3: Determine relevance of each file
         relevant_files = self._filter_relevant_files(repo_path, potential_files)
@@ -306,17 +420,28 @@ class ImageSelector:
         # Step 5: Build docs content (needed for both language detection and image selection)
         docs = self._build_docs_content(files_content)
 
-        # Step 6: Detect language — LLM first, rule-based fallback
+        # Step 6: Detect language — confidence-scored rules first, LLM only when unsure
+        detection_confidence = None
         if language_hint:
             detected_language = language_hint
             detection_method = "hint"
         else:
-            detected_language = self._llm_detect_language(docs)
-            detection_method = "llm"
+            # Scored from the index's manifests and extension histogram, read once.
+            scored_language, detection_confidence, _ = index.language_hints()
+            if scored_language and detection_confidence >= self.DETECTION_CONFIDENCE_THRESHOLD:
+                detected_language = scored_language
+                detection_method = "rules"
+            else:
+                print(
+                    f"[ImageSelector] Rule-based detection unsure "
+                    f"({scored_language}, confidence {detection_confidence}); asking LLM"
+                )
+                detected_language = self._llm_detect_language(docs)
+                detection_method = "llm"
             if not detected_language:
-                # Fallback to rule-based detection
+                # Fallback to legacy structure-based rules
                 detected_language = detect_language(repo_structure, files_content)
-                detection_method = "rules"
+                detection_method = "legacy_rules"
             if not detected_language:
                 detected_language = "python"
                 detection_method = "default"
@@ -326,57 +451,97 @@ class ImageSelector:
         language_handler = get_language_handler(detected_language)
         candidate_images = language_handler.base_images(platform)
         
-        # Step 8: Use LLM to select base image
-        selected_image, platform_override = self._llm_select_base_image(
-            docs, detected_language, candidate_images
+        # Step 8: Solve declared version constraints; ask the LLM only on conflicts
+        # or when the project declares nothing usable.
+        decision = VersionSolver(index.read_text, potential_files).solve(
+            detected_language, candidate_images
         )
+        arch_override = self._detect_arch_override(docs)
+        if decision.image:
+            selected_image = decision.image
+            platform_override = arch_override
+            selection_method = "solver"
+            print(f"[ImageSelector] Version solver picked {selected_image}: {decision.reason}")
+            if self.catalog and self.catalog_tie_break and len(decision.alternatives) > 1:
+                # Equally supported versions: take the cheapest to set up (local, fewer missing tools).
+                cheapest = self.catalog.rank(decision.alternatives, platform_override)[0].image
+                if cheapest != selected_image:
+                    print(f"[ImageSelector] Preferring {cheapest} over {selected_image}: cheaper to set up")
+                    selected_image = cheapest
+                    selection_method = "solver+catalog"
+            if self.prefetcher:
+                self.prefetcher.prefetch([selected_image], platform_override)
+        else:
+            print(f"[ImageSelector] Version solver undecided ({decision.reason}); asking LLM")
+            if self.prefetcher:
+                # Overlap the pull of the most likely answers with the select_image call.
+                self.prefetcher.prefetch(
+                    VersionSolver.likely_candidates(detected_language, candidate_images, self.PREFETCH_CANDIDATES),
+                    arch_override,
+                )
+            selected_image, platform_override = self._llm_select_base_image(
+                docs, detected_language, candidate_images, arch_override
+            )
+            selection_method = "llm"
         
         print(f"[ImageSelector] Selected base image: {selected_image}")
 
-        self._write_summary_log(potential_files, relevant_files, detected_language, selected_image, detection_method)
+        summary = {
+            "potential_files": potential_files,
+            "locate_method": locate_method,
+            "relevant_files": relevant_files,
+            "detected_language": detected_language,
+            "detection_method": detection_method,
+            "detection_confidence": detection_confidence,
+            "selected_image": selected_image,
+            "selection_method": selection_method,
+            "version_constraints": decision.to_dict(),
+            "docs_packing": self.docs_packing,
+        }
+        self._write_summary_log(dict(summary, cache_hit=False))
+        if selection_method == "solver+catalog":
+            # Depends on this host's image cache; another host must decide for itself.
+            return selected_image, language_handler, docs, platform_override
+        self.selection_cache.set(cache_key, {
+            "selected_image": selected_image,
+            "detected_language": detected_language,
+            "platform_override": platform_override,
+            "docs": docs,
+            "summary": summary,
+        })
         
         return selected_image, language_handler, docs, platform_override
     
-    def _generate_repo_structure(self, repo_path: str) -> str:
-        """Generate a text representation of repository structure."""
-        structure_lines = []
-
-        # Only skip directories with no relevance to env setup
-        SKIP_DIRS = {
-            '__pycache__', 'node_modules', 'target', 'build', 'dist',
-            '.git', '.venv', 'venv', '.mypy_cache', '.pytest_cache',
-            '.tox', '.eggs', '.idea', '.vscode',
-        }
-
-        for root, dirs, files in os.walk(repo_path):
-            dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
-
-            level = root.replace(repo_path, '').count(os.sep)
-            indent = '  ' * level
-            folder_name = os.path.basename(root) or os.path.basename(repo_path)
-            structure_lines.append(f"{indent}{folder_name}/")
-
-            sub_indent = '  ' * (level + 1)
-            for file in sorted(files):
-                structure_lines.append(f"{sub_indent}{file}")
+    def _get_index(self, repo_path: str) -> RepoIndex:
+        """Return the index for `repo_path`, scanning the tree only on first use."""
+        if self.index is None or self.index.root != os.path.abspath(repo_path):
+            self.index = RepoIndex.build(repo_path, locator=self.manifest_locator)
+        return self.index
 
-        return '\n'.join(structure_lines)
+    def _generate_repo_structure(self, repo_path: str) -> str:
+        """Collapsed repository structure; manifest and CI paths are shown at any depth."""
+        return self._get_index(repo_path).render_collapsed_structure(self.STRUCTURE_TOKEN_BUDGET)
     
+    def _locate_files(self, rule_files: List[str], repo_structure: str) -> Tuple[List[str], str]:
+        """Use the manifest catalog matches; ask the LLM only when rules found too few."""
+        if len(rule_files) >= self.LOCATE_MIN_RULE_FILES:
+            return rule_files, "rules"
+
+        print(
+            f"[ImageSelector] Rules located only {len(rule_files)} file(s); "
+            "asking LLM to locate more"
+        )
+        llm_files = self._locate_potential_files(repo_structure)
+        merged = rule_files + [path for path in llm_files if path not in rule_files]
+        return merged, "rules+llm" if rule_files else "llm"
+
     def _locate_potential_files(self, repo_structure: str) -> List[str]:
         """Use LLM to identify potentially relevant files from structure."""
-        structure_lines = repo_structure.split('\n')
-        if len(structure_lines) > self.MAX_STRUCTURE_LINES:
-            truncated_structure = '\n'.join(structure_lines[:self.MAX_STRUCTURE_LINES])
-            truncated_structure += (
-                f"\n... ({len(structure_lines) - self.MAX_STRUCTURE_LINES} more lines truncated)"
-            )
-        else:
-            truncated_structure = repo_structure
-
-        prompt = LOCATE_FILES_PROMPT.format(structure=truncated_structure)
+        prompt = LOCATE_FILES_PROMPT.format(structure=repo_structure)
         
-        response = self.client.chat.completions.create(
-            model=self.model,
+        response = self.router.create(
+            "locate_files",
+            accept=lambda r: "<file>" in (r.choices[0].message.content or ""),
             messages=[{"role": "user", "content": prompt}],
             temperature=0
         )
@@ -397,70 +562,123 @@ class ImageSelector:
         return list(set(potential_files))  # Remove duplicates
     
     def _filter_relevant_files(self, repo_path: str, potential_files: List[str]) -> List[str]:
-        """Filter files by relevance using LLM."""
-        relevant_files = []
-        
+        """Filter files by relevance using batched, concurrent LLM calls and a verdict cache."""
+        index = self._get_index(repo_path)
+        candidates = []
         for file_path in potential_files:
-            full_path = os.path.join(repo_path, file_path)
-            
-            # Skip if doesn't exist or is directory
-            if not os.path.exists(full_path) or os.path.isdir(full_path):
+            # Skip if missing, a directory, or too large
+            size = index.size(file_path)
+            if size is None or size > self.FILE_SIZE_THRESHOLD:
                 continue
-            
-            # Skip if too large
-            try:
-                size = os.path.getsize(full_path)
-                if size > self.FILE_SIZE_THRESHOLD:
-                    continue
-            except OSError:
-                continue
-            
-            # Read file content
-            try:
-                with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read(self.FILE_SIZE_THRESHOLD)
-            except Exception:
+            content = index.read_text(file_path, self.FILE_SIZE_THRESHOLD)
+            if content is None:
                 continue
-            
-            # Build file info for LLM
-            file_info = f"""------ START FILE {file_path} ------
-{content}
------- END FILE {file_path} ------"""
-            
-            # Ask LLM if relevant
-            prompt = DETERMINE_RELEVANCE_PROMPT.format(file=file_info)
-            
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0
+            candidates.append((file_path, content))
+
+        verdicts: Dict[str, bool] = {}
+        pending = []
+        for file_path, content in candidates:
+            cached = self.relevance_cache.get(self._relevance_cache_key(file_path, content))
+            if cached is not None:
+                verdicts[file_path] = bool(cached.get("relevant"))
+                print(f"[ImageSelector]   {'✓' if verdicts[file_path] else '✗'} {file_path} (cached)")
+            else:
+                pending.append((file_path, content))
+
+        batches = self._make_relevance_batches(pending)
+        if batches:
+            print(
+                f"[ImageSelector] Checking relevance of {len(pending)} file(s) "
+                f"in {len(batches)} batch(es)"
+            )
+            workers = min(self.RELEVANCE_MAX_WORKERS, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for batch_verdicts in executor.map(self._check_relevance_batch, batches):
+                    verdicts.update(batch_verdicts)
+
+        return [file_path for file_path, _ in candidates if verdicts.get(file_path)]
+
+    def _relevance_cache_key(self, file_path: str, content: str) -> str:
+        return content_hash(RELEVANCE_PROMPT_VERSION, file_path, content)
+
+    def _make_relevance_batches(self, files: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+        """Group files into prompts bounded by file count and total characters."""
+        batches: List[List[Tuple[str, str]]] = []
+        current: List[Tuple[str, str]] = []
+        current_chars = 0
+        for file_path, content in files:
+            if current and (
+                len(current) >= self.RELEVANCE_BATCH_FILES
+                or current_chars + len(content) > self.RELEVANCE_BATCH_CHARS
+            ):
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append((file_path, content))
+            current_chars += len(content)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _check_relevance_batch(self, batch: List[Tuple[str, str]]) -> Dict[str, bool]:
+        """
+        Ask for per-file verdicts on one batch. Files the model leaves out are kept
+        (treated as relevant) but not cached, so a flaky answer never sticks.
+        """
+        file_infos = [
+            f"------ START FILE {file_path} ------\n{content}\n------ END FILE {file_path} ------"
+            for file_path, content in batch
+        ]
+        prompt = DETERMINE_RELEVANCE_PROMPT.format(files="\n\n".join(file_infos))
+        expected = {file_path for file_path, _ in batch}
+        label = batch[0][0] if len(batch) == 1 else f"{batch[0][0]} +{len(batch) - 1}"
+
+        try:
+            response = self.router.create(
+                "relevance",
+                accept=lambda r: expected <= set(
+                    self._parse_relevance_verdicts(r.choices[0].message.content or "")
+                ),
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0
+            )
+            self._record_usage(response)
+            result = response.choices[0].message.content or ""
+            self._write_llm_log(prompt, result, label=f"relevance:{label}")
+            parsed = self._parse_relevance_verdicts(result)
+        except Exception as e:
+            print(f"[ImageSelector] Warning: Error checking relevance of {label}: {e}")
+            parsed = {}
+
+        verdicts = {}
+        for file_path, content in batch:
+            if file_path in parsed:
+                verdicts[file_path] = parsed[file_path]
+                self.relevance_cache.set(
+                    self._relevance_cache_key(file_path, content),
+                    {"relevant": parsed[file_path]},
                 )
-                self._record_usage(response)
-                
-                result = response.choices[0].message.content
-                self._write_llm_log(prompt, result, label=f"relevance:{file_path}")
-                is_relevant = '<rel>Yes</rel>' in result
-                print(f"[ImageSelector]   {'✓' if is_relevant else '✗'} {file_path}")
-                if is_relevant:
-                    relevant_files.append(file_path)
-            except Exception as e:
-                print(f"[ImageSelector] Warning: Error checking {file_path}: {e}")
-                continue
-        
-        return relevant_files
+                print(f"[ImageSelector]   {'✓' if parsed[file_path] else '✗'} {file_path}")
+            else:
+                verdicts[file_path] = True
+                print(f"[ImageSelector]   ? {file_path} (no verdict, keeping)")
+        return verdicts
+
+    @staticmethod
+    def _parse_relevance_verdicts(text: str) -> Dict[str, bool]:
+        return {
+            match.group(1).strip(): match.group(2).lower() == "yes"
+            for match in RELEVANCE_VERDICT_PATTERN.finditer(text or "")
+        }
     
     def _read_files_content(self, repo_path: str, file_paths: List[str]) -> Dict[str, str]:
-        """Read content of relevant files."""
+        """Read content of relevant files (served from the repository index)."""
+        index = self._get_index(repo_path)
         content_dict = {}
         
         for file_path in file_paths:
-            full_path = os.path.join(repo_path, file_path)
-            try:
-                with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content_dict[file_path] = f.read(self.FILE_SIZE_THRESHOLD)
-            except Exception:
-                continue
+            content = index.read_text(file_path, self.FILE_SIZE_THRESHOLD)
+            if content is not None:
+                content_dict[file_path] = content
         
         return content_dict
     
@@ -474,61 +692,66 @@ class ImageSelector:
     ]
 
     def _build_docs_content(self, files_content: Dict[str, str]) -> str:
-        """Build combined docs content from files, version-declaration files first."""
-        # Sort: priority files first (by their rank in VERSION_PRIORITY_FILES), then the rest
-        def sort_key(file_path):
-            basename = os.path.basename(file_path)
-            try:
-                return self.VERSION_PRIORITY_FILES.index(basename)
-            except ValueError:
-                return len(self.VERSION_PRIORITY_FILES)
-
-        sorted_files = sorted(files_content.keys(), key=sort_key)
-
-        docs_parts = ["------ BEGIN RELEVANT FILES ------\n"]
-        current_size = len(docs_parts[0])
-        for file_path in sorted_files:
-            content = files_content[file_path][:self.MAX_FILE_SNIPPET_CHARS]
-            if len(files_content[file_path]) > self.MAX_FILE_SNIPPET_CHARS:
-                content += f"\n... ({len(files_content[file_path]) - self.MAX_FILE_SNIPPET_CHARS} more characters truncated)"
-
-            block = f"File: {file_path}\n```\n{content}\n```\n"
-            if current_size + len(block) > self.MAX_DOCS_CHARS:
-                docs_parts.append(
-                    f"... additional relevant files truncated to stay within {self.MAX_DOCS_CHARS} characters ...\n"
-                )
-                break
-            docs_parts.append(block)
-            current_size += len(block)
-        
-        docs_parts.append("------ END RELEVANT FILES ------")
-        return '\n'.join(docs_parts)
+        """Pack the highest-signal sections of the files into DOCS_TOKEN_BUDGET tokens."""
+        packer = ContextPacker(
+            self.DOCS_TOKEN_BUDGET,
+            file_ranks={name: rank for rank, name in enumerate(self.VERSION_PRIORITY_FILES)},
+        )
+        packed = packer.pack(
+            files_content,
+            header="------ BEGIN RELEVANT FILES ------\n",
+            footer="------ END RELEVANT FILES ------",
+        )
+        self.docs_packing = packed.report()
+        print(
+            f"[ImageSelector] Packed docs into {packed.used_tokens}/{self.DOCS_TOKEN_BUDGET} tokens; "
+            f"{describe_dropped(packed)}"
+        )
+        return packed.text
     
+    def _detect_arch_override(self, docs: str) -> Optional[str]:
+        """Rule-based counterpart of the LLM's <arch_note>: known test deps without ARM64 binaries."""
+        docs_lower = docs.lower()
+        for marker in ARM64_INCOMPATIBLE_MARKERS:
+            if marker in docs_lower:
+                print(f"[ImageSelector] Found '{marker}' (no ARM64 binaries); suggesting platform override: linux/amd64")
+                return "linux/amd64"
+        return None
+
     def _llm_select_base_image(
         self, 
         docs: str, 
         language: str, 
-        candidate_images: List[str]
+        candidate_images: List[str],
+        platform: Optional[str] = None,
     ) -> Tuple[str, Optional[str]]:
         """
         Use LLM to select the best base image from candidates.
         
         Returns:
             Tuple of (selected_image, platform_override)
-            platform_override is "linux/amd64" if ARM64 compatibility issues detected, else None
+            platform_override is "linux/amd64" if the LLM or the rule-based `platform`
+            detection found ARM64 compatibility issues, else None
         """
+        if self.catalog:
+            candidate_block = self.catalog.describe_candidates(candidate_images, platform) + (
+                "\nWhen several candidates satisfy the version constraints, prefer one that is "
+                "already local and ships the tools the project needs (fewer setup steps)."
+            )
+        else:
+            candidate_block = candidate_images
         prompt = SELECT_BASE_IMAGE_PROMPT.format(
             docs=docs,
             language=language,
-            candidate_images=candidate_images
+            candidate_images=candidate_block
         )
         
         max_retries = 5
         messages = [{"role": "user", "content": prompt}]
         
         for attempt in range(max_retries):
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = self.router.create(
+                "select_image",
                 messages=messages,
                 temperature=0
             )
@@ -556,7 +779,7 @@ class ImageSelector:
                         if 'arm64' in arch_note.lower() or 'amd64' in arch_note.lower():
                             platform_override = "linux/amd64"
                             print(f"[ImageSelector] Suggesting platform override: {platform_override}")
-                    return selected_image, platform_override
+                    return selected_image, platform_override or platform
                 else:
                     # Image not in candidates, ask again
                     messages.append({"role": "assistant", "content": content})
@@ -575,4 +798,4 @@ class ImageSelector:
         
         # Fallback: return first candidate if all retries failed
         print("[ImageSelector] Warning: Could not get valid selection, using fallback")
-        return candidate_images[len(candidate_images) // 2], None  # Middle option
+        return candidate_images[len(candidate_images) // 2], platform  # Middle option
@@ -2,8 +2,10 @@
 Language-specific handlers for base image selection and environment setup.
 Supports: Python, JavaScript, TypeScript, Rust, Go, Java, C#, C, C++, Ruby, PHP, Swift, Kotlin, Scala, R, Julia, Dart, Elixir, Haskell, Lua, Perl, Zig
 """
+import fnmatch
+import os
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
 class LanguageHandler(ABC):
@@ -34,6 +36,15 @@ class LanguageHandler(ABC):
         """
         pass
     
+    def manifest_files(self) -> List[str]:
+        """
+        Return file patterns that declare dependencies or versions for this language.
+
+        Plain patterns match a file name anywhere in the tree, patterns with a '/'
+        match the relative path, and a leading '/' restricts the match to the root.
+        """
+        return []
+    
     @abstractmethod
     def get_setup_instructions(self) -> str:
         """Get language-specific setup instructions for the agent."""
@@ -54,6 +65,15 @@ class PythonHandler(LanguageHandler):
         else:
             return [f"python:3.{v}-windowsservercore-ltsc2022" for v in range(9, 15)]
     
+    def manifest_files(self) -> List[str]:
+        """Return Python manifest and version file patterns."""
+        return [
+            'requirements*.txt', 'requirements/*.txt', 'setup.py', 'setup.cfg',
+            'pyproject.toml', 'Pipfile', 'environment.yml', 'environment.yaml',
+            'conda.yml', '.python-version', 'tox.ini', 'pytest.ini',
+            'noxfile.py',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect Python project by file extensions and config files."""
         # Strong indicators - Python-specific configuration files
@@ -112,6 +132,13 @@ class JavaScriptHandler(LanguageHandler):
         else:
             return ["karinali20011210/windows_server:ltsc2025_nvm"]
     
+    def manifest_files(self) -> List[str]:
+        """Return Node.js manifest and version file patterns."""
+        return [
+            'package.json', '.nvmrc', '.node-version', '.npmrc',
+            'pnpm-workspace.yaml', 'lerna.json',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect Node.js project by package.json and .js files, but not TypeScript."""
         nodejs_indicators = [
@@ -148,6 +175,10 @@ class TypeScriptHandler(JavaScriptHandler):
     def language(self) -> str:
         return "typescript"
     
+    def manifest_files(self) -> List[str]:
+        """Return Node.js manifests plus TypeScript compiler configuration."""
+        return super().manifest_files() + ['tsconfig.json']
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect TypeScript project by tsconfig.json and .ts files."""
         ts_indicators = ['tsconfig.json', 'tsconfig.build.json']
@@ -178,6 +209,12 @@ class RustHandler(LanguageHandler):
         else:
             return [f"karinali20011210/rust-windows:1.{v}" for v in [70, 75, 80, 85, 90]]
     
+    def manifest_files(self) -> List[str]:
+        """Return Rust manifest and version file patterns."""
+        return [
+            'Cargo.toml', 'rust-toolchain', 'rust-toolchain.toml', '.cargo/config.toml',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect Rust project by Cargo.toml."""
         rust_indicators = ['cargo.toml', 'cargo.lock', 'rust-toolchain', 'rust-toolchain.toml']
@@ -220,6 +257,12 @@ class GoHandler(LanguageHandler):
                                                   "24.0-windowsservercore",
                                                   "25.0-windowsservercore"]]
     
+    def manifest_files(self) -> List[str]:
+        """Return Go manifest and version file patterns."""
+        return [
+            'go.mod', 'go.work', '.go-version',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect Go project by go.mod."""
         go_indicators = ['go.mod', 'go.sum', 'gopkg.toml', 'gopkg.lock']
@@ -258,6 +301,14 @@ class JavaHandler(LanguageHandler):
         else:
             return [f"eclipse-temurin:{v}-jdk-windowsservercore-ltsc2022" for v in ["11", "17", "21"]]
     
+    def manifest_files(self) -> List[str]:
+        """Return Java manifest and version file patterns."""
+        return [
+            'pom.xml', 'build.gradle', 'build.gradle.kts', 'settings.gradle',
+            'settings.gradle.kts', 'gradle.properties', '.java-version', '.sdkmanrc',
+            'gradle/wrapper/gradle-wrapper.properties', '.mvn/wrapper/maven-wrapper.properties',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect Java project by pom.xml or build.gradle."""
         java_indicators = ['pom.xml', 'build.gradle', 'build.gradle.kts', 'gradle.properties']
@@ -302,6 +353,13 @@ class CSharpHandler(LanguageHandler):
                 "8.0-windowsservercore-ltsc2019",
             ]]
     
+    def manifest_files(self) -> List[str]:
+        """Return .NET manifest and version file patterns."""
+        return [
+            '*.csproj', '*.sln', 'global.json', 'Directory.Build.props',
+            'NuGet.config',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect C# project by .csproj or .sln files."""
         cs_indicators = ['.csproj', '.sln', '.fsproj', '.vbproj']
@@ -348,6 +406,13 @@ class CppHandler(LanguageHandler):
                 "mcr.microsoft.com/windows/servercore:ltsc2022",
             ]
     
+    def manifest_files(self) -> List[str]:
+        """Return C/C++ manifest and version file patterns."""
+        return [
+            'CMakeLists.txt', 'meson.build', 'conanfile.txt', 'conanfile.py',
+            'vcpkg.json', 'configure.ac',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect C++ project by CMakeLists.txt, .cpp, or Makefile."""
         cpp_indicators = ['cmakelists.txt', 'conanfile.txt', 'conanfile.py', 'meson.build', 'xmake.lua']
@@ -417,6 +482,12 @@ class RubyHandler(LanguageHandler):
         else:
             return [f"ruby:{v}" for v in ["3.2", "3.3"]]
     
+    def manifest_files(self) -> List[str]:
+        """Return Ruby manifest and version file patterns."""
+        return [
+            'Gemfile', '*.gemspec', '.ruby-version', 'Rakefile',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect Ruby project by Gemfile."""
         ruby_indicators = ['gemfile', 'gemfile.lock', '.ruby-version', 'rakefile']
@@ -465,6 +536,12 @@ class PHPHandler(LanguageHandler):
         else:
             return [f"php:{v}" for v in ["8.4", "8.3", "8.2", "8.1"]]
     
+    def manifest_files(self) -> List[str]:
+        """Return PHP manifest and version file patterns."""
+        return [
+            'composer.json', 'phpunit.xml', 'phpunit.xml.dist', '.php-version',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect PHP project by composer.json. Distinguish from JS by .php extension."""
         structure_lower = repo_structure.lower()
@@ -509,6 +586,13 @@ class KotlinHandler(LanguageHandler):
         else:
             return [f"eclipse-temurin:{v}-jdk-windowsservercore-ltsc2022" for v in ["11", "17", "21"]]
     
+    def manifest_files(self) -> List[str]:
+        """Return Kotlin manifest and version file patterns."""
+        return [
+            'build.gradle.kts', 'build.gradle', 'settings.gradle.kts', 'settings.gradle',
+            'gradle.properties', 'pom.xml',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect Kotlin project by .kt files or Kotlin-specific Gradle DSL."""
         kotlin_indicators = ['build.gradle.kts', 'settings.gradle.kts']
@@ -548,6 +632,12 @@ class ScalaHandler(LanguageHandler):
         else:
             return [f"eclipse-temurin:{v}-jdk-windowsservercore-ltsc2022" for v in ["11", "17", "21"]]
     
+    def manifest_files(self) -> List[str]:
+        """Return Scala manifest and version file patterns."""
+        return [
+            'build.sbt', 'project/build.properties', 'project/plugins.sbt', '.scalafmt.conf',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect Scala project by build.sbt."""
         scala_indicators = ['build.sbt', 'project/build.properties', 'project/plugins.sbt']
@@ -586,6 +676,12 @@ class RHandler(LanguageHandler):
         else:
             return ["r-base:4.3.0"]
     
+    def manifest_files(self) -> List[str]:
+        """Return R manifest and version file patterns."""
+        return [
+            'DESCRIPTION', 'renv.lock', '.Rversion',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect R project by DESCRIPTION or .R files."""
         r_indicators = ['description', 'namespace', 'renv.lock', '.rprofile']
@@ -624,6 +720,12 @@ class DartHandler(LanguageHandler):
         else:
             return ["dart:latest"]
     
+    def manifest_files(self) -> List[str]:
+        """Return Dart manifest and version file patterns."""
+        return [
+            'pubspec.yaml',
+        ]
+    
     def detect_language(self, repo_structure: str, files_content: Dict[str, str]) -> bool:
         """Detect Dart/Flutter project by pubspec.yaml."""
         dart_indicators = ['pubspec.yaml', 'pubspec.lock', '.dart_tool']
@@ -705,3 +807,123 @@ def detect_language(repo_structure: str, files_content: Dict[str, str]) -> Optio
             return lang
     
     return detected_languages[0]
+
+
+# Confidence-scored detection: manifest weights (root-level files count fully,
+# nested ones half) and source extensions per language. Scoring only sees files
+# the ManifestLocator found, so every pattern must be in the manifest catalog.
+LANGUAGE_SIGNALS: Dict[str, Dict] = {
+    "python": {
+        "manifests": {"pyproject.toml": 4, "setup.py": 4, "setup.cfg": 3, "requirements*.txt": 3,
+                      "Pipfile": 3, "environment.yml": 2, ".python-version": 3, "tox.ini": 1},
+        "extensions": [".py", ".pyx"],
+    },
+    "javascript": {
+        "manifests": {"package.json": 3, ".nvmrc": 2},
+        "extensions": [".js", ".jsx", ".mjs", ".cjs"],
+    },
+    "typescript": {"manifests": {"tsconfig.json": 4}, "extensions": [".ts", ".tsx"]},
+    "rust": {"manifests": {"Cargo.toml": 5, "rust-toolchain.toml": 2, "rust-toolchain": 2}, "extensions": [".rs"]},
+    "go": {"manifests": {"go.mod": 5, "go.work": 2}, "extensions": [".go"]},
+    "java": {"manifests": {"pom.xml": 4, "build.gradle": 3, "settings.gradle": 1}, "extensions": [".java"]},
+    "kotlin": {"manifests": {"build.gradle.kts": 3, "settings.gradle.kts": 1}, "extensions": [".kt", ".kts"]},
+    "scala": {"manifests": {"build.sbt": 5}, "extensions": [".scala", ".sc"]},
+    "c#": {"manifests": {"*.csproj": 5, "*.sln": 4, "global.json": 1}, "extensions": [".cs"]},
+    "c++": {
+        "manifests": {"CMakeLists.txt": 2, "conanfile.txt": 3, "vcpkg.json": 3, "meson.build": 2},
+        "extensions": [".cpp", ".cc", ".cxx", ".hpp", ".hh"],
+    },
+    "c": {"manifests": {"configure.ac": 2, "CMakeLists.txt": 1}, "extensions": [".c", ".h"]},
+    "ruby": {"manifests": {"Gemfile": 4, "*.gemspec": 4, ".ruby-version": 2}, "extensions": [".rb"]},
+    "php": {"manifests": {"composer.json": 5}, "extensions": [".php"]},
+    "r": {"manifests": {"DESCRIPTION": 2, "renv.lock": 3}, "extensions": [".r", ".rmd"]},
+    "dart": {"manifests": {"pubspec.yaml": 5}, "extensions": [".dart"]},
+}
+
+# Weight of the source-extension share (0..1) relative to manifest weights.
+EXTENSION_SHARE_WEIGHT = 6.0
+# Scores below this are too little evidence to be confident about.
+MIN_DETECTION_EVIDENCE = 4.0
+# Source-file count at which the extension share counts fully.
+MIN_SOURCE_FILES = 10
+
+
+def extension_histogram(file_names: Iterable[str]) -> Dict[str, int]:
+    """Count lower-cased file extensions."""
+    histogram: Dict[str, int] = {}
+    for name in file_names:
+        # Same rule as os.path.splitext: leading dots do not start an extension.
+        dot = name.rfind('.')
+        if dot > 0 and name[:dot].strip('.'):
+            ext = name[dot:].lower()
+            histogram[ext] = histogram.get(ext, 0) + 1
+    return histogram
+
+
+def _file_text(files_content: Dict[str, str], basename: str) -> str:
+    return "\n".join(
+        content for path, content in files_content.items()
+        if os.path.basename(path) == basename
+    )
+
+
+def score_languages(
+    file_paths: Iterable[str],
+    files_content: Dict[str, str],
+    extensions: Dict[str, int],
+) -> Dict[str, float]:
+    """
+    Score every language from manifests, the extension histogram and
+    mixed-language rules (a pyo3/maturin crate is a Python package, a
+    napi-rs/neon crate is a Node package, tsconfig.json makes it TypeScript).
+    """
+    paths = [path.replace(os.sep, '/') for path in file_paths]
+    scores: Dict[str, float] = {}
+    source_total = sum(
+        extensions.get(ext, 0) for signals in LANGUAGE_SIGNALS.values() for ext in signals["extensions"]
+    )
+    for language, signals in LANGUAGE_SIGNALS.items():
+        score = 0.0
+        for pattern, weight in signals["manifests"].items():
+            depths = [path.count('/') for path in paths if fnmatch.fnmatch(path.rsplit('/', 1)[-1], pattern)]
+            if depths:
+                score += weight if min(depths) == 0 else weight / 2
+        if source_total:
+            share = sum(extensions.get(ext, 0) for ext in signals["extensions"]) / source_total
+            # A handful of source files is weak evidence however lopsided the share.
+            score += EXTENSION_SHARE_WEIGHT * share * min(1.0, source_total / MIN_SOURCE_FILES)
+        scores[language] = score
+
+    cargo = _file_text(files_content, "Cargo.toml").lower()
+    pyproject = _file_text(files_content, "pyproject.toml").lower()
+    package_json = _file_text(files_content, "package.json").lower()
+    if scores["python"] and ("pyo3" in cargo or "maturin" in pyproject):
+        scores["python"] += scores["rust"]
+        scores["rust"] *= 0.25
+    node = "typescript" if scores["typescript"] >= 4 else "javascript"
+    if scores["javascript"] and ("napi" in cargo or "neon" in cargo or "@napi-rs" in package_json):
+        scores[node] += scores["rust"]
+        scores["rust"] *= 0.25
+    if any(path == "tsconfig.json" for path in paths):
+        scores["typescript"] += scores["javascript"]
+        scores["javascript"] *= 0.25
+    return scores
+
+
+def detect_language_with_confidence(
+    file_paths: Iterable[str],
+    files_content: Dict[str, str],
+    extensions: Dict[str, int],
+) -> Tuple[Optional[str], float, Dict[str, float]]:
+    """
+    Return (language, confidence, scores). Confidence is the winner's share of the
+    top two scores, scaled down when the winner has little absolute evidence.
+    """
+    scores = score_languages(file_paths, files_content, extensions)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    top_language, top = ranked[0]
+    if top <= 0:
+        return None, 0.0, scores
+    second = ranked[1][1] if len(ranked) > 1 else 0.0
+    confidence = top / (top + second) * min(1.0, top / MIN_DETECTION_EVIDENCE)
+    return top_language, round(confidence, 3), scores
@@ -0,0 +1,330 @@
+"""
+Process-wide LLM client pool.
+
+Every DockerAgent used to build its own OpenAI client with no retry or rate
+limiting. The pool wraps a single client (so HTTP keep-alive connections are
+reused across Planner, ImageSelector and ObservationCompressor) and adds a
+token-bucket limiter, jittered exponential backoff and AIMD concurrency control.
+"""
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import openai
+from openai import OpenAI
+
+from src.tokenizer import count_tokens
+
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _is_rate_limit_error(exc: Exception) -> bool:
+    return isinstance(exc, openai.RateLimitError) or getattr(exc, "status_code", None) == 429
+
+
+def _is_retryable_error(exc: Exception) -> bool:
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return getattr(exc, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_request_tokens(kwargs: dict[str, Any]) -> int:
+    """Rough prompt + completion size used to reserve tokens before the call."""
+    total = 0
+    for message in kwargs.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            total += count_tokens(content)
+    return total + int(kwargs.get("max_tokens") or 0)
+
+
+class RateLimiter:
+    """Token bucket over requests-per-minute and tokens-per-minute."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._request_allowance = float(requests_per_minute or 0)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._last_refill = clock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = max(0.0, now - self._last_refill)
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute / 60.0,
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute / 60.0,
+            )
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request and `tokens` tokens are available. Returns seconds waited."""
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return 0.0
+
+        # A single request larger than the whole bucket would otherwise wait forever.
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                wait_for = 0.0
+                if self.requests_per_minute and self._request_allowance < 1:
+                    wait_for = max(
+                        wait_for,
+                        (1 - self._request_allowance) * 60.0 / self.requests_per_minute,
+                    )
+                if self.tokens_per_minute and self._token_allowance < tokens:
+                    wait_for = max(
+                        wait_for,
+                        (tokens - self._token_allowance) * 60.0 / self.tokens_per_minute,
+                    )
+                if wait_for <= 0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return waited
+            self._sleep(wait_for)
+            waited += wait_for
+
+    def reconcile(self, reserved_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the real usage of a call is known."""
+        if not self.tokens_per_minute:
+            return
+        with self._lock:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + reserved_tokens - actual_tokens,
+            )
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on in-flight calls: grow by ~1 per window of successes, halve on throttling."""
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease_factor: float = 0.5,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False):
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            if throttled:
+                self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+class _Completions:
+    def __init__(self, pool: "LLMClientPool"):
+        self._pool = pool
+
+    def create(self, **kwargs):
+        return self._pool.create_chat_completion(**kwargs)
+
+
+class _Chat:
+    def __init__(self, pool: "LLMClientPool"):
+        self.completions = _Completions(pool)
+
+
+class LLMClientPool:
+    """
+    Drop-in replacement for an OpenAI client exposing `chat.completions.create`.
+
+    All calls go through the shared rate limiter and concurrency limiter and are
+    retried with jittered exponential backoff on 429/5xx/connection errors.
+    """
+
+    def __init__(
+        self,
+        client,
+        rate_limiter: Optional[RateLimiter] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.client = client
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.concurrency_limiter = concurrency_limiter or AdaptiveConcurrencyLimiter()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failures": 0,
+            "rate_limit_wait_seconds": 0.0,
+            "backoff_seconds": 0.0,
+        }
+        self.chat = _Chat(self)
+
+    def _bump(self, key: str, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _backoff_delay(self, attempt: int, exc: Exception) -> float:
+        retry_after = _retry_after_seconds(exc)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        # Full jitter: uniform over [0, base * 2^attempt], capped.
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def create_chat_completion(self, **kwargs):
+        reserved_tokens = estimate_request_tokens(kwargs)
+        attempt = 0
+        while True:
+            waited = self.rate_limiter.acquire(reserved_tokens)
+            if waited:
+                self._bump("rate_limit_wait_seconds", waited)
+
+            self.concurrency_limiter.acquire()
+            try:
+                response = self.client.chat.completions.create(**kwargs)
+            except Exception as exc:
+                throttled = _is_rate_limit_error(exc)
+                self.concurrency_limiter.release(throttled=throttled)
+                if throttled:
+                    self._bump("rate_limited")
+                if not _is_retryable_error(exc) or attempt >= self.max_retries:
+                    self._bump("failures")
+                    raise
+                delay = self._backoff_delay(attempt, exc)
+                print(
+                    f"[LLMClientPool] {type(exc).__name__} on attempt {attempt + 1}; "
+                    f"retrying in {delay:.1f}s"
+                )
+                self._bump("retries")
+                self._bump("backoff_seconds", delay)
+                self._sleep(delay)
+                attempt += 1
+                continue
+
+            self.concurrency_limiter.release(throttled=False)
+            self._bump("calls")
+            usage = getattr(response, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None) is not None:
+                self.rate_limiter.reconcile(reserved_tokens, usage.total_tokens)
+            return response
+
+    def get_stats(self, since: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+        """
+        Cumulative counters, or the change since an earlier get_stats() snapshot.
+
+        The pool is shared across runs in the process, so a run reports
+        get_stats(since=<snapshot taken when it started>).
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        if since is not None:
+            stats = {key: value - since.get(key, 0) for key, value in stats.items()}
+        stats["concurrency_limit"] = round(self.concurrency_limiter.limit, 2)
+        stats["rate_limit_wait_seconds"] = round(stats["rate_limit_wait_seconds"], 3)
+        stats["backoff_seconds"] = round(stats["backoff_seconds"], 3)
+        return stats
+
+
+_shared_pools: Dict[Tuple[Optional[str], Optional[str]], LLMClientPool] = {}
+_shared_pool_lock = threading.Lock()
+
+
+def _int_env(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        print(f"[LLMClientPool] Ignoring non-integer {name}={value!r}")
+        return None
+
+
+def get_shared_client_pool(api_key: Optional[str] = None, base_url: Optional[str] = None) -> LLMClientPool:
+    """
+    Return the process-wide pool for (api_key, base_url), creating it on first use.
+
+    Agents with the same credentials and endpoint share one pool; a different
+    key or base URL gets its own client and limiters.
+
+    Limits come from LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE and
+    LLM_MAX_CONCURRENCY; unset means unlimited rate / default concurrency.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_API_BASE") or None
+    key = (api_key, base_url)
+    with _shared_pool_lock:
+        pool = _shared_pools.get(key)
+        if pool is None:
+            # Retries are handled by the pool so that they respect the shared limiter.
+            client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+            max_concurrency = _int_env("LLM_MAX_CONCURRENCY") or 8
+            pool = LLMClientPool(
+                client,
+                rate_limiter=RateLimiter(
+                    requests_per_minute=_int_env("LLM_REQUESTS_PER_MINUTE"),
+                    tokens_per_minute=_int_env("LLM_TOKENS_PER_MINUTE"),
+                ),
+                concurrency_limiter=AdaptiveConcurrencyLimiter(
+                    initial_limit=max(1, max_concurrency // 2),
+                    max_limit=max_concurrency,
+                ),
+            )
+            _shared_pools[key] = pool
+        return pool
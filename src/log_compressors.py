@@ -0,0 +1,304 @@
+"""
+Deterministic compressors for stereotyped command output.
+
+Install logs (pip, apt, npm/yarn/pnpm, bundler, cargo) are reduced to the summary
+described in doc/trajectory_reduction_notes.md: package manager, installed and
+already-present packages with versions, warnings and the first real error with
+its context. Test logs (pytest, rspec, jest, cargo test, go test) keep their
+skeleton — header, platform, collected counts, failures, short summary and the
+final tally — with runs of passing lines replaced by one placeholder.
+
+Nothing here calls an LLM; unrecognised output returns None so the caller can
+fall back to the LLM compressor.
+"""
+import re
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+
+
+# Lines of context kept after the first real error.
+ERROR_CONTEXT_LINES = 12
+# Warnings kept per summary (deduplicated, in order of appearance).
+MAX_WARNINGS = 8
+# Upper bound on skeleton lines kept from a test log.
+MAX_SKELETON_LINES = 200
+# Rule output must save at least this fraction, otherwise it is not worth using.
+MIN_SAVING_RATIO = 0.3
+
+
+def _lines(text: str) -> List[str]:
+    # Progress bars redraw with carriage returns; keep only the final state of each line.
+    return [line.rsplit('\r', 1)[-1].rstrip() for line in text.split('\n')]
+
+
+def _unique(items: List[str], limit: Optional[int] = None) -> List[str]:
+    seen, out = set(), []
+    for item in items:
+        if item and item not in seen:
+            seen.add(item)
+            out.append(item)
+    return out[:limit] if limit else out
+
+
+# Notices the agent itself adds to an observation (test-failure and loop warnings).
+_SYSTEM_LINE = re.compile(r"^\[SYSTEM\]")
+
+
+def _first_error(lines: List[str], pattern: Pattern, context: int = ERROR_CONTEXT_LINES) -> List[str]:
+    for index, line in enumerate(lines):
+        if pattern.search(line):
+            block = lines[max(0, index - 2):index + context + 1]
+            return [l for l in block if l.strip()]
+    return []
+
+
+def _package_list(title: str, packages: List[str]) -> List[str]:
+    # One compact line however long the install: every name and version survives.
+    packages = _unique(packages)
+    if not packages:
+        return []
+    return [f"{title} ({len(packages)}): {', '.join(packages)}"]
+
+
+def _notices(lines: List[str]) -> List[str]:
+    return _unique([line for line in lines if _SYSTEM_LINE.match(line)])
+
+
+def _summary(family: str, sections: List[Tuple[str, List[str]]], tail: List[str],
+             error: List[str], warnings: List[str], notices: List[str]) -> str:
+    out = list(notices) + [f"[{family} summary]"]
+    for title, packages in sections:
+        out += _package_list(title, packages)
+    if warnings:
+        out.append("Warnings:")
+        out += [f"- {w}" for w in _unique(warnings, MAX_WARNINGS)]
+    if error:
+        out.append("First error:")
+        out += error
+    out += _unique(tail)
+    return '\n'.join(out)
+
+
+# ---------------------------------------------------------------------------
+# Install logs
+# ---------------------------------------------------------------------------
+
+_PIP_INSTALLED = re.compile(r"^Successfully installed (.+)$")
+_PIP_SATISFIED = re.compile(r"^Requirement already satisfied: ([^\s<>=!~;\[]+).*?(?:\(([^()\s]+)\))?$")
+_PIP_ERROR = re.compile(r"^ERROR:|error: subprocess-exited-with-error|^\s*error: |Traceback \(most recent call last\)")
+
+
+def compress_pip(text: str) -> str:
+    lines = _lines(text)
+    installed: List[str] = []
+    satisfied: List[str] = []
+    for line in lines:
+        match = _PIP_INSTALLED.match(line.strip())
+        if match:
+            for token in match.group(1).split():
+                name, _, version = token.rpartition('-')
+                installed.append(f"{name}=={version}" if name else token)
+            continue
+        match = _PIP_SATISFIED.match(line.strip())
+        if match:
+            satisfied.append(f"{match.group(1)}=={match.group(2)}" if match.group(2) else match.group(1))
+    warnings = [l.strip() for l in lines if l.strip().startswith(("WARNING:", "DEPRECATION:"))]
+    return _summary(
+        "pip install",
+        [("Successfully installed", installed), ("Already satisfied", satisfied)],
+        [], _first_error(lines, _PIP_ERROR), warnings, _notices(lines),
+    )
+
+
+_APT_SETUP = re.compile(r"^Setting up (\S+) \(([^)]+)\)")
+_APT_NEWEST = re.compile(r"^(\S+) is already the newest version \(([^)]+)\)")
+_APT_COUNTS = re.compile(r"^\d+ upgraded, \d+ newly installed")
+_APT_ERROR = re.compile(r"^E: |^dpkg: error|^Errors were encountered")
+
+
+def compress_apt(text: str) -> str:
+    lines = _lines(text)
+    installed = [f"{m.group(1)}={m.group(2)}" for m in map(_APT_SETUP.match, lines) if m]
+    newest = [f"{m.group(1)}={m.group(2)}" for m in map(_APT_NEWEST.match, lines) if m]
+    warnings = [l for l in lines if l.startswith("W: ")]
+    tail = [l for l in lines if _APT_COUNTS.match(l)]
+    return _summary(
+        "apt",
+        [("Installed", installed), ("Already newest", newest)],
+        tail, _first_error(lines, _APT_ERROR), warnings, _notices(lines),
+    )
+
+
+_NPM_TAIL = re.compile(r"^(added|removed|changed|up to date|audited|found) .*|^\d+ vulnerabilit|^Done in |"
+                       r"^Packages: |^Progress: resolved .* done|^dependencies:|^devDependencies:")
+_NPM_ERROR = re.compile(r"^npm ERR!|^npm error|^error |ERR_PNPM_|^\s*gyp ERR!")
+_NPM_WARN = re.compile(r"^(npm WARN|npm warn|warning |WARN )")
+_NPM_DIRECT = re.compile(r"^\+ (\S+) (\S+)$")
+
+
+def compress_npm(text: str) -> str:
+    lines = _lines(text)
+    direct = [f"{m.group(1)}@{m.group(2)}" for m in map(_NPM_DIRECT.match, lines) if m]
+    warnings = [l.strip() for l in lines if _NPM_WARN.match(l.strip())]
+    tail = [l.strip() for l in lines if _NPM_TAIL.match(l.strip())]
+    return _summary(
+        "npm", [("Direct dependencies", direct)], tail,
+        _first_error(lines, _NPM_ERROR), warnings, _notices(lines),
+    )
+
+
+_BUNDLE_INSTALLING = re.compile(r"^Installing (\S+) ([\d][^\s]*)")
+_BUNDLE_USING = re.compile(r"^Using (\S+) ([\d][^\s]*)")
+_BUNDLE_TAIL = re.compile(r"^Bundle complete!|^Bundled gems are installed|^Successfully installed|^\d+ gems? installed")
+_BUNDLE_ERROR = re.compile(r"An error occurred while installing|Gem::Ext::BuildError|^Could not find|"
+                           r"^Bundler could not find|^ERROR: |Your bundle is locked")
+
+
+def compress_bundle(text: str) -> str:
+    lines = _lines(text)
+    installing = [f"{m.group(1)} {m.group(2)}" for m in map(_BUNDLE_INSTALLING.match, lines) if m]
+    using = [f"{m.group(1)} {m.group(2)}" for m in map(_BUNDLE_USING.match, lines) if m]
+    warnings = [l for l in lines if l.startswith(("Warning:", "WARNING:", "[DEPRECATED]"))]
+    tail = [l for l in lines if _BUNDLE_TAIL.match(l)]
+    return _summary(
+        "bundle install", [("Installed", installing), ("Already present (Using)", using)],
+        tail, _first_error(lines, _BUNDLE_ERROR), warnings, _notices(lines),
+    )
+
+
+_CARGO_COMPILING = re.compile(r"^\s*Compiling (\S+) v(\S+)")
+_CARGO_TAIL = re.compile(r"^\s*(Finished|Installed|Installing|error: could not compile)")
+_CARGO_ERROR = re.compile(r"^error(\[E\d+\])?:")
+
+
+def compress_cargo(text: str) -> str:
+    lines = _lines(text)
+    compiled = [f"{m.group(1)} v{m.group(2)}" for m in map(_CARGO_COMPILING.match, lines) if m]
+    warnings = [l.strip() for l in lines if l.startswith("warning:") and "generated" not in l]
+    tail = [l.strip() for l in lines if _CARGO_TAIL.match(l)]
+    return _summary(
+        "cargo build", [("Compiled", compiled)], tail,
+        _first_error(lines, _CARGO_ERROR), warnings, _notices(lines),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Test logs: keep the skeleton, replace passing runs with a placeholder
+# ---------------------------------------------------------------------------
+
+# Lines that start a block worth keeping with the next few lines (failure details).
+_TEST_BLOCKS: Dict[str, Pattern] = {
+    "pytest": re.compile(r"^_{3,} .+ _{3,}$|^E\s|^>\s"),
+    "rspec": re.compile(r"^\s+\d+\) |Failure/Error:"),
+    "jest": re.compile(r"^\s*● "),
+    "cargo test": re.compile(r"^---- .+ stdout ----|panicked at"),
+    "go test": re.compile(r"^--- FAIL|^panic:"),
+}
+_TEST_KEEP: Dict[str, Pattern] = {
+    "pytest": re.compile(
+        r"test session starts|^platform |^rootdir|^configfile|^plugins|^cachedir|^collect|"
+        r"short test summary info|^(FAILED|ERROR|XFAIL|XPASS)\b|::\S* (FAILED|ERROR)|"
+        r"^=+ (FAILURES|ERRORS|warnings summary) =+|^\S+\.py:\d+: |^=+ .*\b(passed|failed|error|errors|"
+        r"skipped|xfailed|deselected|no tests ran)\b.* in [\d.]+s"
+    ),
+    "rspec": re.compile(
+        r"^Failures:|^Failed examples:|^rspec \./|^\d+ examples?, \d+ failures?|^Finished in|"
+        r"Randomized with seed|^\s+(expected|got|# \./)"
+    ),
+    "jest": re.compile(
+        r"^\s*FAIL |^Tests:|^Test Suites:|^Snapshots:|^Time:|^Ran all test suites|"
+        r"^\s+(Expected|Received)|^\s+at .*\.(test|spec)\.[jt]sx?:\d+"
+    ),
+    "cargo test": re.compile(r"^running \d+ tests?|^test .* FAILED$|^failures:|^test result:|^error|^\s+\S+::\S+$"),
+    "go test": re.compile(r"^--- FAIL|^FAIL|^ok\s|^\s+\S+_test\.go:\d+:|^panic:|^exit status"),
+}
+# Lines of detail kept after each block start.
+_TEST_BLOCK_LINES = 6
+
+
+def compress_test_log(family: str, text: str) -> str:
+    lines = _lines(text)
+    keep_pattern = _TEST_KEEP[family]
+    block_pattern = _TEST_BLOCKS[family]
+    keep = [False] * len(lines)
+    for index, line in enumerate(lines):
+        if keep_pattern.search(line) or _SYSTEM_LINE.match(line):
+            keep[index] = True
+        if block_pattern.search(line):
+            for offset in range(_TEST_BLOCK_LINES + 1):
+                if index + offset < len(lines):
+                    keep[index + offset] = True
+
+    out: List[str] = []
+    omitted = 0
+    kept = 0
+    for line, flag in zip(lines, keep):
+        if flag and kept < MAX_SKELETON_LINES:
+            if omitted:
+                out.append(f"... ({omitted} lines omitted)")
+                omitted = 0
+            out.append(line)
+            kept += 1
+        elif line.strip():
+            omitted += 1
+    if omitted:
+        out.append(f"... ({omitted} lines omitted)")
+    return '\n'.join(out)
+
+
+# ---------------------------------------------------------------------------
+# Detection
+# ---------------------------------------------------------------------------
+
+# (family, command pattern, output pattern); the first match wins, test runners first
+# because an install-and-test command is best summarised as a test run.
+_FAMILY_RULES: List[Tuple[str, Pattern, Pattern]] = [
+    ("pytest", re.compile(r"\bpytest\b|-m pytest\b"),
+     re.compile(r"=+ test session starts =+|^=+ .*\b(passed|failed)\b.* in [\d.]+s", re.M)),
+    ("rspec", re.compile(r"\brspec\b"), re.compile(r"^\d+ examples?, \d+ failures?", re.M)),
+    ("jest", re.compile(r"\bjest\b|\bvitest\b"), re.compile(r"^Test Suites: .*total", re.M)),
+    ("cargo test", re.compile(r"\bcargo (test|nextest)\b"), re.compile(r"^test result: ", re.M)),
+    ("go test", re.compile(r"\bgo test\b"), re.compile(r"^(ok|FAIL)\s+\S+\s+[\d.]+s$", re.M)),
+    ("pip", re.compile(r"\bpip3?\b.*\binstall\b|\buv pip install\b"),
+     re.compile(r"^(Successfully installed |Requirement already satisfied: |Collecting \S)", re.M)),
+    ("apt", re.compile(r"\bapt(-get)?\b.*\binstall\b"),
+     re.compile(r"^(Reading package lists|Setting up \S+ \(|\d+ upgraded, \d+ newly installed)", re.M)),
+    ("npm", re.compile(r"\b(npm|yarn|pnpm)\b.*\b(install|ci|add|i)\b"),
+     re.compile(r"^(added \d+ packages?|npm ERR!|npm WARN|Packages: \+\d+)", re.M)),
+    ("bundle", re.compile(r"\bbundle(\s+install)?\b|\bgem install\b"),
+     re.compile(r"^(Fetching gem metadata|Bundle complete!|Installing \S+ \d)", re.M)),
+    ("cargo", re.compile(r"\bcargo (build|install|fetch|check)\b"),
+     re.compile(r"^\s+Compiling \S+ v\d", re.M)),
+]
+
+_COMPRESSORS: Dict[str, Callable[[str], str]] = {
+    "pip": compress_pip,
+    "apt": compress_apt,
+    "npm": compress_npm,
+    "bundle": compress_bundle,
+    "cargo": compress_cargo,
+}
+
+
+def detect_log_family(command: str, text: str) -> Optional[str]:
+    """Name of the log family `text` belongs to, or None when it is not recognised."""
+    command = command or ""
+    for family, command_pattern, output_pattern in _FAMILY_RULES:
+        if output_pattern.search(text or ""):
+            return family
+    # Output markers can be missing from a failed run; the command still identifies it.
+    for family, command_pattern, _ in _FAMILY_RULES:
+        if command_pattern.search(command):
+            return family
+    return None
+
+
+def compress_log(command: str, text: str) -> Optional[Tuple[str, str]]:
+    """(family, compressed text), or None when the output is unrecognised or barely shrinks."""
+    family = detect_log_family(command, text)
+    if family is None:
+        return None
+    compressed = _COMPRESSORS[family](text) if family in _COMPRESSORS else compress_test_log(family, text)
+    # A bare header means the parser found nothing it knows how to keep.
+    if '\n' not in compressed or len(compressed) > len(text) * (1 - MIN_SAVING_RATIO):
+        return None
+    return family, compressed
@@ -0,0 +1,96 @@
+"""
+Rule-based locator for environment-relevant files.
+
+The catalog is the union of every `LanguageHandler.manifest_files()` plus
+language-independent files (CI configuration, README, Dockerfile, version
+managers). The paths of RepoIndex's single walk are matched against it, so the
+common case needs no LLM call to find `requirements.txt`, `pom.xml` or
+`.github/workflows/*.yml`.
+"""
+import fnmatch
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.language_handlers import LANGUAGE_HANDLERS
+
+
+# Directories with no relevance to environment setup
+SKIP_DIRS = {
+    '__pycache__', 'node_modules', 'target', 'build', 'dist',
+    '.git', '.venv', 'venv', '.mypy_cache', '.pytest_cache',
+    '.tox', '.eggs', '.idea', '.vscode',
+}
+
+GENERIC_MANIFEST_PATTERNS = [
+    # CI/CD configuration
+    '.github/workflows/*.yml', '.github/workflows/*.yaml', '/.travis.yml',
+    '/.circleci/config.yml', '/appveyor.yml', '/.gitlab-ci.yml', '/azure-pipelines.yml',
+    # Documentation at the root only; nested READMEs are rarely about setup
+    '/README', '/README.*', '/readme.*', '/INSTALL', '/INSTALL.*', '/CONTRIBUTING.*',
+    # Container and build entry points
+    '/Dockerfile', '/Dockerfile.*', '/docker-compose.yml', '/docker-compose.yaml', '/Makefile',
+    # Version managers
+    '.tool-versions', '/.sdkmanrc', '/mise.toml', '/.mise.toml',
+]
+
+
+def build_manifest_catalog(extra_patterns: Optional[Iterable[str]] = None) -> List[str]:
+    """Ordered, de-duplicated pattern list from all language handlers plus generic files."""
+    catalog: List[str] = []
+    for pattern in GENERIC_MANIFEST_PATTERNS:
+        if pattern not in catalog:
+            catalog.append(pattern)
+    for handler in LANGUAGE_HANDLERS.values():
+        for pattern in handler.manifest_files():
+            if pattern not in catalog:
+                catalog.append(pattern)
+    for pattern in extra_patterns or []:
+        if pattern not in catalog:
+            catalog.append(pattern)
+    return catalog
+
+
+class ManifestLocator:
+    # Cap on located files; shallow paths win so sub-module manifests come after root ones.
+    MAX_FILES = 60
+
+    def __init__(self, catalog: Optional[List[str]] = None, max_files: Optional[int] = None):
+        self.catalog = catalog or build_manifest_catalog()
+        self.max_files = max_files or self.MAX_FILES
+        # The catalog is matched once per file in the tree, so compile it into two
+        # alternations instead of calling fnmatch per pattern.
+        basename_patterns = [p for p in self.catalog if '/' not in p]
+        path_patterns = []
+        for pattern in self.catalog:
+            if pattern.startswith('/'):
+                path_patterns.append(fnmatch.translate(pattern[1:]))
+            elif '/' in pattern:
+                path_patterns += [fnmatch.translate(pattern), fnmatch.translate(f"*/{pattern}")]
+        self._basename_regex = re.compile('|'.join(fnmatch.translate(p) for p in basename_patterns) or '(?!)')
+        self._path_regex = re.compile('|'.join(path_patterns) or '(?!)')
+        # Only basenames that can end a path pattern need the full-path regex.
+        path_tails = [p.rsplit('/', 1)[-1] for p in self.catalog if '/' in p]
+        self._path_tail_regex = re.compile('|'.join(fnmatch.translate(p) for p in path_tails) or '(?!)')
+        # Basenames repeat heavily in large trees; cache (matches, needs path check) per name.
+        self._basename_verdicts: Dict[str, Tuple[bool, bool]] = {}
+
+    def _matches(self, rel_path: str) -> bool:
+        basename = rel_path.rsplit('/', 1)[-1]
+        verdict = self._basename_verdicts.get(basename)
+        if verdict is None:
+            verdict = (
+                bool(self._basename_regex.match(basename)),
+                bool(self._path_tail_regex.match(basename)),
+            )
+            self._basename_verdicts[basename] = verdict
+        matched, check_path = verdict
+        return matched or (check_path and bool(self._path_regex.match(rel_path)))
+
+    def select(self, rel_paths: Iterable[str]) -> List[str]:
+        """Filter relative '/'-separated paths to catalog matches, shallowest first, capped."""
+        matches = [rel_path for rel_path in rel_paths if self._matches(rel_path)]
+        matches.sort(key=lambda path: (path.count('/'), path))
+        if len(matches) > self.max_files:
+            print(f"[ManifestLocator] {len(matches)} matches; keeping the {self.max_files} shallowest")
+            matches = matches[:self.max_files]
+        return matches
@@ -0,0 +1,169 @@
+"""
+Per-call-type model routing.
+
+Cheap classification calls (file relevance, language detection, observation
+compression) do not need the planner's model. The router maps each call type to
+an ordered model chain: the first model is tried first, and later models are
+escalated to when a call raises or returns output the caller cannot use.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+
+CALL_TYPES = (
+    "planner",
+    "locate_files",
+    "relevance",
+    "detect_language",
+    "select_image",
+    "compression",
+)
+
+
+def parse_route_specs(specs: Optional[List[str]]) -> Dict[str, List[str]]:
+    """Parse CLI specs such as `relevance=qwen-turbo,qwen-plus` into a routing table."""
+    routes: Dict[str, List[str]] = {}
+    for spec in specs or []:
+        if "=" not in spec:
+            raise ValueError(f"Invalid route '{spec}'. Expected CALL_TYPE=MODEL[,FALLBACK...]")
+        call_type, models = spec.split("=", 1)
+        call_type = call_type.strip()
+        if call_type not in CALL_TYPES:
+            raise ValueError(f"Unknown call type '{call_type}'. Available: {list(CALL_TYPES)}")
+        chain = [model.strip() for model in models.split(",") if model.strip()]
+        if not chain:
+            raise ValueError(f"Route '{spec}' does not name any model")
+        routes[call_type] = chain
+    return routes
+
+
+class _RoutedCompletions:
+    def __init__(self, router: "ModelRouter", call_type: str):
+        self._router = router
+        self._call_type = call_type
+
+    def create(self, **kwargs):
+        # The route decides which model serves the call.
+        kwargs.pop("model", None)
+        return self._router.create(self._call_type, **kwargs)
+
+
+class _RoutedChat:
+    def __init__(self, router: "ModelRouter", call_type: str):
+        self.completions = _RoutedCompletions(router, call_type)
+
+
+class RoutedClient:
+    """Client-shaped view of one route, for components that call `chat.completions.create`."""
+
+    def __init__(self, router: "ModelRouter", call_type: str):
+        self.call_type = call_type
+        self.chat = _RoutedChat(router, call_type)
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        client,
+        default_model: str,
+        routes: Optional[Dict[str, Union[str, List[str]]]] = None,
+    ):
+        self.client = client
+        self.default_model = default_model
+        self.routes: Dict[str, List[str]] = {}
+        for call_type, chain in (routes or {}).items():
+            if call_type not in CALL_TYPES:
+                raise ValueError(f"Unknown call type '{call_type}'. Available: {list(CALL_TYPES)}")
+            self.routes[call_type] = [chain] if isinstance(chain, str) else list(chain)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def chain_for(self, call_type: str) -> List[str]:
+        return self.routes.get(call_type) or [self.default_model]
+
+    def model_for(self, call_type: str) -> str:
+        return self.chain_for(call_type)[0]
+
+    def bind(self, call_type: str) -> RoutedClient:
+        return RoutedClient(self, call_type)
+
+    def create(
+        self,
+        call_type: str,
+        accept: Optional[Callable[[Any], bool]] = None,
+        **kwargs,
+    ):
+        """
+        Run a chat completion for `call_type`, escalating along the model chain.
+
+        `accept` may reject a response (e.g. missing the expected tag); the last
+        model's response is returned regardless so callers keep their own fallbacks.
+        """
+        chain = self.chain_for(call_type)
+        for index, model in enumerate(chain):
+            is_last = index == len(chain) - 1
+            started = time.monotonic()
+            try:
+                response = self.client.chat.completions.create(model=model, **kwargs)
+            except Exception as exc:
+                self._record(call_type, model, time.monotonic() - started, None, failed=True)
+                if is_last:
+                    raise
+                self._bump(call_type, "escalations")
+                print(f"[ModelRouter] {call_type}: {model} failed ({exc}); escalating to {chain[index + 1]}")
+                continue
+
+            self._record(call_type, model, time.monotonic() - started, response)
+            if accept is not None and not is_last and not accept(response):
+                print(f"[ModelRouter] {call_type}: {model} output rejected; escalating to {chain[index + 1]}")
+                self._bump(call_type, "escalations")
+                continue
+            return response
+
+    def _route_stats(self, call_type: str) -> Dict[str, Any]:
+        return self._stats.setdefault(
+            call_type,
+            {
+                "calls": 0,
+                "failures": 0,
+                "escalations": 0,
+                "latency_seconds": 0.0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "models": {},
+            },
+        )
+
+    def _bump(self, call_type: str, key: str):
+        with self._lock:
+            self._route_stats(call_type)[key] += 1
+
+    def _record(self, call_type: str, model: str, latency: float, response, failed: bool = False):
+        usage = getattr(response, "usage", None)
+        with self._lock:
+            stats = self._route_stats(call_type)
+            stats["calls"] += 1
+            stats["latency_seconds"] += latency
+            stats["models"][model] = stats["models"].get(model, 0) + 1
+            if failed:
+                stats["failures"] += 1
+            if usage is not None:
+                stats["input_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+                stats["output_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            report = {}
+            for call_type in CALL_TYPES:
+                stats = self._stats.get(call_type)
+                entry = {"chain": self.chain_for(call_type)}
+                if stats:
+                    entry.update(stats)
+                    entry["models"] = dict(stats["models"])
+                    entry["latency_seconds"] = round(stats["latency_seconds"], 3)
+                    entry["avg_latency_seconds"] = (
+                        round(stats["latency_seconds"] / stats["calls"], 3) if stats["calls"] else 0.0
+                    )
+                report[call_type] = entry
+            return report
@@ -0,0 +1,172 @@
+"""
+Single-pass classification of command output.
+
+The sandbox, the observation metadata and the synthesizer all ask questions
+about the same output (is it a help screen, did tests run, how many failed,
+does it look like an install log). `classify_observation` answers all of them
+at once: the text is normalised (ANSI codes and zero-width characters removed)
+and lowercased once, every distinct marker is looked up once with the
+features it implies recorded in a bitmask (markers whose features are all
+already known are skipped), and each regex family is a few precompiled
+patterns that stop at the first hit. The resulting `ObservationFeatures` record is cached for recent
+outputs, so later consumers of the same output do not scan it again.
+"""
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+TEST_MARKERS = 1 << 0
+INSTALL_MARKERS = 1 << 1
+ERROR_MARKERS = 1 << 2
+HELP_TEXT = 1 << 3
+USAGE_MARKERS = 1 << 4
+TEST_FAILURE_MARKERS = 1 << 5
+
+# Lowercase substrings per feature.
+FEATURE_MARKERS: Dict[int, Tuple[str, ...]] = {
+    TEST_MARKERS: (
+        "test session starts", "collected ", "short test summary info",
+        " passed", " failed", " xfailed", "traceback",
+    ),
+    INSTALL_MARKERS: (
+        "successfully installed", "already satisfied", "already installed", "collecting ",
+        "installing ", "fetching ", "apt-get install", "bundle install", "npm install",
+    ),
+    ERROR_MARKERS: ("error", "failed", "traceback", "exception", "no such file", "command not found"),
+    # Usage screens that must not count as test execution.
+    HELP_TEXT: ("usage:", "optional arguments:", "positional arguments:", "show this help"),
+    # Broader help/usage indicators for informational (exit 1/2) exits.
+    USAGE_MARKERS: (
+        "usage:", "--help", "options:", "commands:", "positional arguments:", "optional arguments:",
+    ),
+    # Output that rules out an informational exit.
+    TEST_FAILURE_MARKERS: (
+        "failures:", "errors:", "failed", "failed:", "not ok", "test failed", "assertion failed",
+        "expected", "actual", "diff:", "traceback (most recent call last):", "nameerror",
+        "importerror", "modulenotfounderror", "loaderror", "gem::loaderror",
+        "bundler: command not found",
+    ),
+}
+
+
+def _build_marker_table() -> List[Tuple[str, int]]:
+    masks: Dict[str, int] = {}
+    for feature, markers in FEATURE_MARKERS.items():
+        for marker in markers:
+            masks[marker] = masks.get(marker, 0) | feature
+    return list(masks.items())
+
+
+_MARKER_TABLE = _build_marker_table()
+
+# Each family is a short list of compiled patterns matched against lowercased
+# text. Patterns are written to start with a literal or a character class so the
+# regex engine can skip ahead quickly: `x(?<!\wx)` is `\bx` with the boundary
+# checked after the first character, and the count patterns share one number
+# prefix instead of scanning every digit once per pattern.
+_EFFECTIVE_TEST_SIGNALS = [re.compile(p, re.MULTILINE) for p in (
+    r"collected\s+[1-9]\d*\s+items",
+    r"ran\s+[1-9]\d*\s+tests?",
+    r"test result:\s+(?:ok|failed)\.",
+    r"\[=+\]\s+running\s+[1-9]\d*\s+tests?",
+    r"start\s+\d+:",
+    r"suites:\s+\d+\s+of\s+[1-9]\d*\s+completed",
+    r"asserts:\s+\d+\s+of\s+[1-9]\d*",
+    r"ok(?<!\wok)\s+\([1-9]\d*\s+tests?,",
+    # "12 passed", "3 tests, 3 ran", "5 examples, 0 failures", "4 checks, 0 ignored", "100% tests passed"
+    r"[1-9](?<!\w[1-9])\d*(?:\s+(?:passed\b|failed\b|skipped\b|tests?,\s+[1-9]\d*\s+ran\b"
+    r"|examples?,\s+\d+\s+failures?\b|checks?,\s+\d+\s+ignored\b)|%\s+tests\s+passed\b)",
+    # go test "ok  pkg 0.01s", TAP subtests and failures
+    r"^\s*(?:ok\s+\S+\s+\d+(?:\.\d+)?s(?:\s|$)|#\s*subtest:|not ok\b)",
+)]
+_EMPTY_TEST_RUN_SIGNALS = [re.compile(p, re.MULTILINE) for p in (
+    r"no tests were found",
+    r"no tests found",
+    r"collected\s+0\s+items",
+    r"ran\s+0\s+tests?",
+    r"\[no test files\]",
+    r"no test cases matched",
+    r"no tests to run",
+    # "0 tests ran", "0 examples, 0 failures"
+    r"0(?<!\w0)\s+(?:tests?\s+ran\b|examples?,\s+0\s+failures?\b)",
+)]
+_FAILED_COUNT = re.compile(r"(\d+) failed")
+# Matched against the normalised, case-preserved text (TAP / run_all "Failed: N").
+_TAP_FAILED_COUNT = re.compile(r"Failed:\s+([1-9]\d*)")
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[ -/]*[@-~]")
+
+CACHE_MAX_ENTRIES = 64
+
+
+@dataclass(frozen=True)
+class ObservationFeatures:
+    raw_chars: int
+    has_test_markers: bool
+    has_install_markers: bool
+    has_error_markers: bool
+    looks_like_help_text: bool
+    has_usage_markers: bool
+    has_test_failure_markers: bool
+    # "FAILED" (case-sensitive) or "not ok" anywhere in the output.
+    has_failed_keyword: bool
+    tap_failed_count: Optional[int]
+    failed_count: Optional[int]
+    has_effective_test_signal: bool
+    has_empty_test_run_signal: bool
+
+
+def normalize_observation_text(observation: str) -> str:
+    """Strip ANSI control codes and zero-width formatting artifacts before pattern matching."""
+    normalized = _ANSI_ESCAPE.sub("", observation) if "\x1b" in observation else observation
+    return normalized.replace("\u200b", "").replace("\ufeff", "")
+
+
+def _classify(observation: str) -> ObservationFeatures:
+    normalized = normalize_observation_text(observation)
+    lower = normalized.lower()
+
+    found = 0
+    for marker, mask in _MARKER_TABLE:
+        if mask & ~found and marker in lower:
+            found |= mask
+
+    tap_failed = _TAP_FAILED_COUNT.search(normalized) if "failed:" in lower else None
+    failed = _FAILED_COUNT.search(lower) if " failed" in lower else None
+    return ObservationFeatures(
+        raw_chars=len(observation),
+        has_test_markers=bool(found & TEST_MARKERS),
+        has_install_markers=bool(found & INSTALL_MARKERS),
+        has_error_markers=bool(found & ERROR_MARKERS),
+        looks_like_help_text=bool(found & HELP_TEXT),
+        has_usage_markers=bool(found & USAGE_MARKERS),
+        has_test_failure_markers=bool(found & TEST_FAILURE_MARKERS),
+        has_failed_keyword="FAILED" in normalized or "not ok" in lower,
+        tap_failed_count=int(tap_failed.group(1)) if tap_failed else None,
+        failed_count=int(failed.group(1)) if failed else None,
+        has_effective_test_signal=any(pattern.search(lower) for pattern in _EFFECTIVE_TEST_SIGNALS),
+        has_empty_test_run_signal=any(pattern.search(lower) for pattern in _EMPTY_TEST_RUN_SIGNALS),
+    )
+
+
+_cache: "OrderedDict[Tuple[int, int], ObservationFeatures]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def classify_observation(observation: Optional[str]) -> ObservationFeatures:
+    """Features of `observation`, computed once per distinct recent output."""
+    observation = observation or ""
+    key = (hash(observation), len(observation))
+    with _cache_lock:
+        features = _cache.get(key)
+        if features is not None:
+            _cache.move_to_end(key)
+            return features
+    features = _classify(observation)
+    with _cache_lock:
+        _cache[key] = features
+        if len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return features
@@ -1,8 +1,13 @@
 import re
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import Any, Dict, Iterable, Optional, Union
 from xml.sax.saxutils import escape, unescape
 
+from src.log_compressors import compress_log
+from src.observation_classifier import classify_observation
+from src.persistent_cache import JsonFileCache, content_hash
+from src.tokenizer import count_tokens
+
 
 UNIFIED_COMPRESSION_SYSTEM_PROMPT = """You are a trajectory compression module for an environment-setup coding agent.
 
@@ -96,55 +101,37 @@ Return only the rewritten TARGET step.
 """
 
 
+BATCH_COMPRESSION_USER_PROMPT = """You are given a sliding window of agent steps in XML.
+Several steps are marked as TARGET steps. Compress EACH TARGET step independently by rewriting ONLY its <result> block, following the rules above for every one of them. Steps that are not targets are context only.
+
+TARGET_STEP_IDS: {target_step_ids}
+
+Window context:
+{serialized_window}
+
+Return only the rewritten TARGET steps, each as its own <step id="..."> element with its original id, in the same order.
+"""
+
+# Part of every compression cache key, so editing a prompt invalidates old results.
+COMPRESSION_PROMPT_VERSION = content_hash(
+    UNIFIED_COMPRESSION_SYSTEM_PROMPT, UNIFIED_COMPRESSION_USER_PROMPT, BATCH_COMPRESSION_USER_PROMPT,
+)[:12]
+
+
 def estimate_tokens(text: str) -> int:
-    if not text:
-        return 0
-    return max(1, len(text) // 4)
+    """Tokens of `text` under the run's default model tokenizer (see src.tokenizer)."""
+    return count_tokens(text)
 
 
 def build_observation_metadata(observation_raw: str) -> dict[str, Any]:
     text = observation_raw or ""
-    lower = text.lower()
+    features = classify_observation(text)
     return {
         "raw_chars": len(text),
         "raw_tokens_est": estimate_tokens(text),
-        "has_test_markers": any(
-            marker in lower
-            for marker in (
-                "test session starts",
-                "collected ",
-                "short test summary info",
-                " passed",
-                " failed",
-                " xfailed",
-                "traceback",
-            )
-        ),
-        "has_install_markers": any(
-            marker in lower
-            for marker in (
-                "successfully installed",
-                "already satisfied",
-                "already installed",
-                "collecting ",
-                "installing ",
-                "fetching ",
-                "apt-get install",
-                "bundle install",
-                "npm install",
-            )
-        ),
-        "has_error_markers": any(
-            marker in lower
-            for marker in (
-                "error",
-                "failed",
-                "traceback",
-                "exception",
-                "no such file",
-                "command not found",
-            )
-        ),
+        "has_test_markers": features.has_test_markers,
+        "has_install_markers": features.has_install_markers,
+        "has_error_markers": features.has_error_markers,
     }
 
 
@@ -154,6 +141,15 @@ class CompressionRecord:
     applied: bool = False
     model: Optional[str] = None
     reason: Optional[str] = None
+    # "rules" (deterministic log compressor, no LLM call), "llm", or "delta"
+    # (near-duplicate of reference_step_id's output, sent as a line delta)
+    method: Optional[str] = None
+    log_family: Optional[str] = None
+    reference_step_id: Optional[int] = None
+    # The LLM result came from the compression cache; no reflection call was made.
+    cache_hit: bool = False
+    # Steps rewritten by the same reflection call (0 when no call was made).
+    batch_size: int = 0
 
     original_chars: int = 0
     reduced_chars: int = 0
@@ -203,6 +199,8 @@ class TokenBucket:
     input_tokens: int = 0
     output_tokens: int = 0
     total_tokens: int = 0
+    # Local tokenizer count of the same inputs, to see how far estimates drift.
+    estimated_input_tokens: int = 0
 
 
 @dataclass
@@ -212,8 +210,10 @@ class RunTokenLedger:
     reflection: TokenBucket = field(default_factory=TokenBucket)
     total: TokenBucket = field(default_factory=TokenBucket)
 
-    def add(self, bucket_name: str, input_tokens: int, output_tokens: int):
+    def add(self, bucket_name: str, input_tokens: int, output_tokens: int, estimated_input_tokens: int = 0):
         bucket = getattr(self, bucket_name)
+        bucket.estimated_input_tokens += estimated_input_tokens
+        self.total.estimated_input_tokens += estimated_input_tokens
         bucket.input_tokens += input_tokens
         bucket.output_tokens += output_tokens
         bucket.total_tokens += input_tokens + output_tokens
@@ -237,11 +237,12 @@ def serialize_step_for_reflection(step: AgentStep, target: bool = False) -> str:
     )
 
 
-def serialize_window_for_reflection(steps: list[AgentStep], target_step_id: int) -> str:
+def serialize_window_for_reflection(steps: list[AgentStep], target_step_id: Union[int, Iterable[int]]) -> str:
+    target_ids = {target_step_id} if isinstance(target_step_id, int) else set(target_step_id)
     parts = ["<trajectory>"]
     for step in steps:
         parts.append(
-            serialize_step_for_reflection(step, target=(step.step_id == target_step_id))
+            serialize_step_for_reflection(step, target=(step.step_id in target_ids))
         )
     parts.append("</trajectory>")
     return "\n".join(parts)
@@ -254,22 +255,78 @@ def extract_result_block_from_rewritten_step(content: str) -> Optional[str]:
     return unescape(match.group(1).strip())
 
 
+_REWRITTEN_STEP = re.compile(r'<step\s+id="(\d+)"[^>]*>(.*?)</step>', re.DOTALL)
+
+
+def extract_result_blocks_from_rewritten_steps(content: str) -> dict[int, str]:
+    """
+    step id -> rewritten result for every well-formed step in a batch response.
+    A step with no result, more than one result, or one that appears twice is left out.
+    """
+    results: dict[int, str] = {}
+    seen: set[int] = set()
+    for match in _REWRITTEN_STEP.finditer(content):
+        step_id = int(match.group(1))
+        body = match.group(2)
+        duplicate = step_id in seen
+        seen.add(step_id)
+        if duplicate or body.count("<result>") != 1:
+            results.pop(step_id, None)
+            continue
+        result = extract_result_block_from_rewritten_step(body)
+        if result is not None:
+            results[step_id] = result
+    return results
+
+
+def _split_tokens(total: int, weights: list[int]) -> list[int]:
+    """Split `total` in proportion to `weights`; the shares add up to `total`."""
+    shares = [total * weight // sum(weights) for weight in weights]
+    shares[-1] += total - sum(shares)
+    return shares
+
+
 class ObservationCompressor:
-    def __init__(self, client, model: str):
+    def __init__(self, client, model: str, use_rules: bool = True, cache: Optional[JsonFileCache] = None):
         self.client = client
         self.model = model
+        # Recognised install/test logs are compressed by rules; the LLM only sees the rest.
+        self.use_rules = use_rules
+        # LLM results keyed by prompt version and raw output, shared across runs.
+        self.cache = cache or JsonFileCache("observation_compression")
+        # key -> cache entry (None for a miss), so repeated lookups skip the disk.
+        self._entries: Dict[str, Optional[dict]] = {}
+        self.batch_stats = {"calls": 0, "steps": 0, "fallbacks": 0}
+
+    @staticmethod
+    def cache_key(target_step: AgentStep) -> str:
+        """
+        The prompt asks for a rewrite of the target's own result that invents
+        nothing, so the key is the raw output alone; the window steps only
+        give context and are not part of it.
+        """
+        return content_hash(COMPRESSION_PROMPT_VERSION, target_step.observation_raw or "")
+
+    def cached_entry(self, target_step: AgentStep) -> Optional[dict]:
+        key = self.cache_key(target_step)
+        if key not in self._entries:
+            entry = self.cache.get(key)
+            self._entries[key] = entry if isinstance(entry, dict) and "result" in entry else None
+        return self._entries[key]
+
+    def has_cached_result(self, target_step: AgentStep) -> bool:
+        return self.cached_entry(target_step) is not None
 
     def compress(
         self,
         target_step: AgentStep,
         context_steps: list[AgentStep],
     ) -> tuple[str, CompressionRecord]:
-        record = CompressionRecord(
-            eligible=True,
-            model=self.model,
-            original_chars=len(target_step.observation_raw or ""),
-            original_tokens_est=estimate_tokens(target_step.observation_raw or ""),
-        )
+        local = self._compress_without_llm(target_step)
+        if local is not None:
+            return local
+        record = self._new_record(target_step)
+        record.method = "llm"
 
         serialized_window = serialize_window_for_reflection(
             context_steps,
@@ -297,16 +354,121 @@ class ObservationCompressor:
             record.reason = "failed_to_parse_rewritten_result"
             return target_step.observation_raw, record
 
+        record.batch_size = 1
         record.reflect_input_tokens = response.usage.prompt_tokens
         record.reflect_output_tokens = response.usage.completion_tokens
         record.reflect_total_tokens = response.usage.total_tokens
 
+        self._store(target_step, reduced_result)
+        self._finish_record(record, reduced_result)
+        return reduced_result, record
+
+    def compress_batch(
+        self,
+        target_steps: list[AgentStep],
+        context_steps: list[AgentStep],
+    ) -> list[tuple[str, CompressionRecord]]:
+        """
+        Compress every step of `target_steps` (all inside `context_steps`) with
+        one reflection call over the shared window. Each returned <result> is
+        validated on its own; steps whose result is missing or malformed are
+        retried with a single-step call. Results are in `target_steps` order.
+        """
+        results: dict[int, tuple[str, CompressionRecord]] = {}
+        llm_targets = []
+        for target_step in target_steps:
+            local = self._compress_without_llm(target_step)
+            if local is not None:
+                results[target_step.step_id] = local
+            else:
+                llm_targets.append(target_step)
+
+        if len(llm_targets) == 1:
+            results[llm_targets[0].step_id] = self.compress(llm_targets[0], context_steps)
+        elif llm_targets:
+            target_ids = [step.step_id for step in llm_targets]
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": UNIFIED_COMPRESSION_SYSTEM_PROMPT},
+                    {
+                        "role": "user",
+                        "content": BATCH_COMPRESSION_USER_PROMPT.format(
+                            target_step_ids=", ".join(str(step_id) for step_id in target_ids),
+                            serialized_window=serialize_window_for_reflection(context_steps, target_ids),
+                        ),
+                    },
+                ],
+                temperature=0,
+            )
+            parsed = extract_result_blocks_from_rewritten_steps(response.choices[0].message.content or "")
+            self.batch_stats["calls"] += 1
+            self.batch_stats["steps"] += len(llm_targets)
+
+            # The call's tokens are shared by its targets in proportion to their size.
+            weights = [max(1, estimate_tokens(step.observation_raw or "")) for step in llm_targets]
+            input_shares = _split_tokens(response.usage.prompt_tokens, weights)
+            output_shares = _split_tokens(response.usage.completion_tokens, weights)
+            for target_step, input_share, output_share in zip(llm_targets, input_shares, output_shares):
+                reduced_result = parsed.get(target_step.step_id)
+                if reduced_result is None:
+                    self.batch_stats["fallbacks"] += 1
+                    print(f"[Compression] Batch result for step {target_step.step_id} did not parse; "
+                          f"compressing it on its own")
+                    reduced_result, record = self.compress(target_step, context_steps)
+                else:
+                    record = self._new_record(target_step)
+                    record.method = "llm"
+                    record.batch_size = len(llm_targets)
+                    self._store(target_step, reduced_result)
+                    self._finish_record(record, reduced_result)
+                record.reflect_input_tokens += input_share
+                record.reflect_output_tokens += output_share
+                record.reflect_total_tokens += input_share + output_share
+                results[target_step.step_id] = (reduced_result, record)
+        return [results[step.step_id] for step in target_steps]
+
+    def _new_record(self, target_step: AgentStep) -> CompressionRecord:
+        return CompressionRecord(
+            eligible=True,
+            model=self.model,
+            original_chars=len(target_step.observation_raw or ""),
+            original_tokens_est=estimate_tokens(target_step.observation_raw or ""),
+        )
+
+    def _compress_without_llm(self, target_step: AgentStep) -> Optional[tuple[str, CompressionRecord]]:
+        """Rule-based or cached compression of `target_step`, or None if it needs the LLM."""
+        record = self._new_record(target_step)
+        ruled = compress_log(target_step.action, target_step.observation_raw or "") if self.use_rules else None
+        if ruled is not None:
+            record.method = "rules"
+            record.model = None
+            record.log_family, reduced_result = ruled
+            self._finish_record(record, reduced_result)
+            return reduced_result, record
+
+        cached = self.cached_entry(target_step)
+        if cached is not None:
+            record.method = "llm"
+            record.cache_hit = True
+            record.model = cached.get("model") or self.model
+            self._finish_record(record, cached["result"])
+            return cached["result"], record
+        return None
+
+    def _store(self, target_step: AgentStep, reduced_result: str):
+        key = self.cache_key(target_step)
+        entry = {"result": reduced_result, "model": self.model}
+        self.cache.set(key, entry)
+        self._entries[key] = entry
+
+    @staticmethod
+    def _finish_record(record: CompressionRecord, reduced_result: str):
         record.reduced_chars = len(reduced_result)
         record.reduced_tokens_est = estimate_tokens(reduced_result)
         record.saved_tokens_est = max(
             0, record.original_tokens_est - record.reduced_tokens_est
         )
-        return reduced_result, record
 
 
 def should_apply_compression(
@@ -0,0 +1,132 @@
+"""
+Near-duplicate observation detection and delta encoding.
+
+Agents re-run the same build or test command many times; the outputs differ
+only in a few failing tests or timings. Every observation is fingerprinted as a
+multiset of hashed k-line shingles (durations, sizes, percentages, clock times
+and addresses masked, so they do not break matches). When a new observation is
+close enough to an earlier one the planner can still see, the planner gets a
+line delta against it ("same as step 7 except: ...") instead of the full text.
+The raw text stays in `AgentStep.observation_raw`.
+"""
+import difflib
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.tokenizer import count_tokens
+
+
+# Values that change between otherwise identical runs.
+_VOLATILE = re.compile(
+    r"0x[0-9a-fA-F]+|\d+:\d\d(?::\d\d)?(?:\.\d+)?|\d+(?:\.\d+)?\s?(?:ms|s|sec|seconds|kB|KB|MB|GB|B/s|%)\b|\d+\.\d+"
+)
+
+
+@dataclass
+class ObservationDelta:
+    base_step_id: int
+    similarity: float
+    changed_lines: int
+    total_lines: int
+    text: str
+
+
+def shingle_signature(text: str, shingle_lines: int = 3) -> Counter:
+    """Counts of the hashes of every run of `shingle_lines` consecutive normalised lines."""
+    lines = [_VOLATILE.sub("#", line.strip()) for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    if len(lines) < shingle_lines:
+        return Counter([hash(tuple(lines))]) if lines else Counter()
+    return Counter(hash(tuple(lines[i:i + shingle_lines])) for i in range(len(lines) - shingle_lines + 1))
+
+
+def jaccard(a: Counter, b: Counter) -> float:
+    """Weighted Jaccard similarity, so repeated lines count as often as they occur."""
+    if not a or not b:
+        return 0.0
+    intersection = sum((a & b).values())
+    return intersection / (sum(a.values()) + sum(b.values()) - intersection)
+
+
+def render_delta(base_step_id: int, base_lines: List[str], lines: List[str]) -> Tuple[str, int]:
+    """Line delta of `lines` against `base_lines`; returns (text, changed line count)."""
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    hunks: List[str] = []
+    changed = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        changed += max(i2 - i1, j2 - j1)
+        hunks.append(f"@@ step {base_step_id} lines {i1 + 1}-{i2} -> lines {j1 + 1}-{j2} @@")
+        hunks.extend(f"- {line}" for line in base_lines[i1:i2])
+        hunks.extend(f"+ {line}" for line in lines[j1:j2])
+    if not hunks:
+        return f"[Identical to the output of step {base_step_id}]", 0
+    header = (
+        f"[Same as the output of step {base_step_id} except for {changed} of {len(lines)} lines; "
+        f"'-' lines are from step {base_step_id}, '+' lines replace them]"
+    )
+    return "\n".join([header] + hunks), changed
+
+
+class ObservationDeltaEncoder:
+    # Weighted Jaccard similarity of shingles needed to treat two outputs as near-duplicates.
+    SIMILARITY_THRESHOLD = 0.8
+    # The delta is only used when it is at most this fraction of the full text.
+    MAX_DELTA_RATIO = 0.5
+    MIN_CHARS = 1000
+    # Only the most recent observations are compared against.
+    MAX_CANDIDATES = 8
+
+    def __init__(
+        self,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+        max_delta_ratio: float = MAX_DELTA_RATIO,
+        min_chars: int = MIN_CHARS,
+        shingle_lines: int = 3,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_delta_ratio = max_delta_ratio
+        self.min_chars = min_chars
+        self.shingle_lines = shingle_lines
+        # step_id -> (signature, raw lines), oldest first
+        self._observations: Dict[int, Tuple[Counter, List[str]]] = {}
+
+    def add(self, step_id: int, text: str):
+        """Remember `text` as a possible base for later observations."""
+        if len(text or "") < self.min_chars:
+            return
+        self._observations[step_id] = (shingle_signature(text, self.shingle_lines), text.splitlines())
+        while len(self._observations) > self.MAX_CANDIDATES:
+            self._observations.pop(next(iter(self._observations)))
+
+    def encode(
+        self,
+        text: str,
+        is_visible: Callable[[int], bool] = lambda step_id: True,
+    ) -> Optional[ObservationDelta]:
+        """
+        Delta of `text` against the most similar earlier observation for which
+        `is_visible` holds (the planner still sees it in full), or None.
+        """
+        if len(text or "") < self.min_chars or not self._observations:
+            return None
+        signature = shingle_signature(text, self.shingle_lines)
+        best: Optional[Tuple[float, int]] = None
+        for step_id, (base_signature, _) in self._observations.items():
+            similarity = jaccard(signature, base_signature)
+            # Later steps win ties: they stay in the planner's window longer.
+            if similarity >= self.similarity_threshold and (best is None or similarity >= best[0]):
+                if is_visible(step_id):
+                    best = (similarity, step_id)
+        if best is None:
+            return None
+
+        similarity, base_step_id = best
+        lines = text.splitlines()
+        delta_text, changed = render_delta(base_step_id, self._observations[base_step_id][1], lines)
+        if count_tokens(delta_text) > self.max_delta_ratio * count_tokens(text):
+            return None
+        return ObservationDelta(base_step_id, round(similarity, 3), changed, len(lines), delta_text)
@@ -0,0 +1,169 @@
+"""
+Head/tail views of long command outputs, with the rest paged in on demand.
+
+A long output reaches the planner as its first and last lines plus a handle
+naming the step ("show_output 7 ..."). The full text stays on the host, and
+the planner action `show_output <step> <start>-<end>` or
+`show_output <step> grep [-i] <pattern>` is answered from it directly: no
+sandbox exec and no re-run of the command. Compressed observations carry the
+same handle, so details a summary dropped can still be looked up.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+from src.tokenizer import count_tokens, truncate_to_tokens
+
+
+SHOW_OUTPUT_COMMAND = "show_output"
+_SHOW_OUTPUT = re.compile(r"^\s*show_output\s+(\d+)(?:\s+(.*?))?\s*$", re.DOTALL)
+_LINE_RANGE = re.compile(r"^(\d+)?\s*-\s*(\d+)?$|^(\d+)$")
+
+
+def _usage(step_id: int) -> str:
+    return f"`{SHOW_OUTPUT_COMMAND} {step_id} <start>-<end>` or `{SHOW_OUTPUT_COMMAND} {step_id} grep <pattern>`"
+
+
+def handle_hint(step_id: int) -> str:
+    """Note appended to a compressed observation whose full text is stored."""
+    return f"[Full output of step {step_id} is stored: {_usage(step_id)} shows parts of it without re-running the command]"
+
+
+class ObservationPager:
+    HEAD_LINES = 60
+    TAIL_LINES = 60
+    # Outputs within this many tokens reach the planner whole.
+    MAX_VIEW_TOKENS = 3000
+    # Longest answer to one show_output request.
+    MAX_SERVED_LINES = 200
+    MAX_SERVED_TOKENS = 2500
+
+    def __init__(
+        self,
+        head_lines: int = HEAD_LINES,
+        tail_lines: int = TAIL_LINES,
+        max_view_tokens: int = MAX_VIEW_TOKENS,
+    ):
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+        self.max_view_tokens = max_view_tokens
+        # step_id -> full output lines
+        self._outputs: Dict[int, List[str]] = {}
+        self.truncated_steps = 0
+        self.omitted_tokens_est = 0
+        self.requests = 0
+        self.failed_requests = 0
+        self.served_tokens_est = 0
+
+    def add(self, step_id: int, text: str) -> str:
+        """Store `text` as step `step_id`'s output; returns what the planner should see."""
+        text = text or ""
+        self._outputs[step_id] = text.splitlines()
+        tokens = count_tokens(text)
+        if tokens <= self.max_view_tokens:
+            return text
+        view = self._head_tail(step_id, text)
+        if len(view) >= len(text):
+            return text
+        self.truncated_steps += 1
+        self.omitted_tokens_est += max(0, tokens - count_tokens(view))
+        return view
+
+    def _head_tail(self, step_id: int, text: str) -> str:
+        lines = self._outputs[step_id]
+        half = self.max_view_tokens // 2
+        if len(lines) > self.head_lines + self.tail_lines:
+            head = "\n".join(lines[:self.head_lines])
+            tail = "\n".join(lines[-self.tail_lines:])
+            omitted = f"{len(lines) - self.head_lines - self.tail_lines} lines ({self.head_lines + 1}-{len(lines) - self.tail_lines})"
+        else:
+            head, tail, omitted = text, text, None
+        # Few, very long lines (minified JSON, progress bars) are cut by tokens instead.
+        head_tokens, tail_tokens = count_tokens(head), count_tokens(tail)
+        if head_tokens > half or tail_tokens > half:
+            head = truncate_to_tokens(head, half)
+            if tail_tokens > half:
+                tail = tail[-(len(tail) * half // tail_tokens):]
+            omitted = f"{len(text) - len(head) - len(tail)} characters"
+        return f"{head}\n[... {omitted} omitted; {_usage(step_id)} shows them without re-running the command ...]\n{tail}"
+
+    def has_output(self, step_id: int) -> bool:
+        return step_id in self._outputs
+
+    def serve(self, action: str) -> Optional[str]:
+        """
+        The answer to a `show_output` action, or None if `action` is not one.
+        Malformed requests get an error message rather than None, so they are
+        never sent to the sandbox.
+        """
+        match = _SHOW_OUTPUT.match(action or "")
+        if not match:
+            return None
+        self.requests += 1
+        step_id, request = int(match.group(1)), (match.group(2) or "").strip()
+        lines = self._outputs.get(step_id)
+        if lines is None:
+            self.failed_requests += 1
+            known = ", ".join(str(known_id) for known_id in sorted(self._outputs)) or "none"
+            return f"Error: No stored output for step {step_id}. Stored steps: {known}."
+
+        if request == "grep" or request.startswith("grep "):
+            pattern = request[len("grep"):].strip()
+            selected = self._grep(lines, pattern)
+            if isinstance(selected, str):
+                self.failed_requests += 1
+                return selected
+            header = f"[show_output {step_id}: {len(selected)} of {len(lines)} lines match {pattern!r}]"
+        else:
+            bounds = self._line_range(request, len(lines))
+            if bounds is None:
+                self.failed_requests += 1
+                return f"Error: Usage: {_usage(step_id)} (1-based line numbers; the output has {len(lines)} lines)."
+            start, end = bounds
+            selected = [(number, lines[number - 1]) for number in range(start, end + 1)]
+            header = f"[show_output {step_id}: lines {start}-{end} of {len(lines)}]"
+
+        shown = selected[:self.MAX_SERVED_LINES]
+        body = "\n".join(f"{number:>6}| {line}" for number, line in shown)
+        clipped = truncate_to_tokens(body, self.MAX_SERVED_TOKENS)
+        if len(shown) < len(selected) or len(clipped) < len(body):
+            clipped += "\n[... clipped; narrow the range or the pattern to see the rest ...]"
+        self.served_tokens_est += count_tokens(clipped)
+        return f"{header}\n{clipped}" if clipped else f"{header}\n(no lines)"
+
+    @staticmethod
+    def _line_range(request: str, line_count: int) -> Optional[tuple]:
+        match = _LINE_RANGE.match(request)
+        if not match or line_count == 0:
+            return None
+        if match.group(3):
+            start = end = int(match.group(3))
+        else:
+            start = int(match.group(1) or 1)
+            end = int(match.group(2) or line_count)
+        start, end = max(1, start), min(line_count, end)
+        return (start, end) if start <= end else None
+
+    @staticmethod
+    def _grep(lines: List[str], request: str):
+        flags = 0
+        if request.startswith("-i ") or request == "-i":
+            flags, request = re.IGNORECASE, request[2:].strip()
+        if len(request) >= 2 and request[0] == request[-1] and request[0] in "'\"":
+            request = request[1:-1]
+        if not request:
+            return "Error: `grep` needs a pattern, e.g. `show_output 7 grep FAILED`."
+        try:
+            pattern = re.compile(request, flags)
+        except re.error:
+            pattern = re.compile(re.escape(request), flags)
+        return [(number, line) for number, line in enumerate(lines, start=1) if pattern.search(line)]
+
+    def get_summary(self) -> Dict[str, Any]:
+        return {
+            "stored_steps": len(self._outputs),
+            "truncated_steps": self.truncated_steps,
+            "omitted_tokens_est": self.omitted_tokens_est,
+            "show_output_requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "served_tokens_est": self.served_tokens_est,
+        }
@@ -0,0 +1,82 @@
+"""
+Small on-disk JSON cache shared across runs.
+
+Entries live under `<cache_dir>/<namespace>/<key[:2]>/<key>.json`. The cache
+directory defaults to ~/.cache/docker_agent and can be moved with
+DOCKER_AGENT_CACHE_DIR; set DOCKER_AGENT_DISABLE_CACHE=1 to bypass it.
+Failures to read or write are reported and otherwise ignored, so a broken cache
+never breaks a run.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Optional
+
+
+def default_cache_dir() -> str:
+    return os.getenv("DOCKER_AGENT_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "docker_agent"
+    )
+
+
+def content_hash(*parts: str) -> str:
+    """Stable sha256 over the given parts (NUL separated)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8", errors="replace"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class JsonFileCache:
+    def __init__(self, namespace: str, cache_dir: Optional[str] = None, enabled: Optional[bool] = None):
+        self.namespace = namespace
+        self.root = os.path.join(cache_dir or default_cache_dir(), namespace)
+        if enabled is None:
+            enabled = os.getenv("DOCKER_AGENT_DISABLE_CACHE", "").lower() not in ("1", "true", "yes")
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            value = None
+        except (OSError, ValueError) as e:
+            print(f"[Cache] Warning: Could not read {path}: {e}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so concurrent readers never see a partial entry.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[Cache] Warning: Could not write {path}: {e}")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses}
@@ -1,15 +1,67 @@
 import re
 import os
+import json
 from typing import Optional
 from src.language_handlers import LanguageHandler
+from src.tokenizer import get_tokenizer
+
+
+PLANNER_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "run_command",
+            "description": "Run one bash command inside the Docker container (working directory /app).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "command": {"type": "string", "description": "The exact bash command to execute."},
+                },
+                "required": ["command"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "finish",
+            "description": (
+                "Declare that the environment is configured and the project's tests pass. "
+                "Arguments form the Verification Bundle."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "runtime_preparation_commands": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Previously successful ephemeral runtime commands to re-run before tests ([] if none).",
+                    },
+                    "test_commands": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Previously successful commands whose output proved the environment works.",
+                    },
+                },
+                "required": ["runtime_preparation_commands", "test_commands"],
+            },
+        },
+    },
+]
 
 
 class Planner:
     MAX_HISTORY_MESSAGES = 24
 
-    def __init__(self, client, model="gpt-4o", language_handler: Optional[LanguageHandler] = None, repo_structure: str = "", log_dir: str = None):
+    def __init__(self, client, model="gpt-4o", language_handler: Optional[LanguageHandler] = None, repo_structure: str = "", log_dir: str = None, batch_actions: bool = False, tool_calling: bool = False, output_paging: bool = False):
         self.client = client
         self.model = model
+        self.tokenizer = get_tokenizer(model)
+        self.batch_actions = batch_actions
+        self.tool_calling = tool_calling
+        self.last_batch_actions = None
+        self.last_verification_bundle = None
+        self.last_tool_action = None
         self.history = []
         self.managed_history = []
         self.managed_history_meta = []
@@ -31,6 +83,44 @@ class Planner:
         structure_section = ""
         if repo_structure:
             structure_section = f"Repository Structure:\n```\n{repo_structure}\n```\n\n"
+
+        batch_section = ""
+        action_rule = "- Only output ONE Thought and ONE Action at a time.\n"
+        if self.batch_actions:
+            batch_section = (
+                "Batched Inspection:\n"
+                "- When you need several INDEPENDENT read-only inspections (e.g. `cat package.json`, `cat README.md`, `ls tests`), "
+                "you may request them together in one turn instead of one per turn:\n"
+                "  Thought: <your reasoning>\n"
+                "  Actions: [\"cat package.json\", \"cat README.md\", \"ls tests\"]\n"
+                "- `Actions:` must be a JSON list of strings. The commands run together and you receive one combined Observation.\n"
+                "- At most ONE command in a batch may modify the environment (install, build, edit files, run tests); it runs last. "
+                "Prefer issuing such commands alone with `Action:`.\n\n"
+            )
+            action_rule = "- Only output ONE Thought and either ONE Action or ONE `Actions:` list at a time.\n"
+
+        paging_section = ""
+        if output_paging:
+            paging_section = (
+                "Long Outputs:\n"
+                "- Long outputs are shown as their first and last lines with a note like `[... 812 lines (61-872) omitted; ...]`, "
+                "and older outputs may be summarised. The full output of every step is kept.\n"
+                "- To read part of step N's full output WITHOUT re-running the command, use one of:\n"
+                "  Action: show_output N 120-180\n"
+                "  Action: show_output N grep <regex>\n"
+                "  (`grep -i <regex>` ignores case; matching lines are shown with their line numbers.)\n"
+                "- `show_output` is answered instantly from the stored output. Prefer it over re-running a command just to see "
+                "more of its output, and issue it alone with `Action:`.\n\n"
+            )
+
+        tool_section = ""
+        if self.tool_calling:
+            tool_section = (
+                "Tool Calling Mode (overrides the text format above):\n"
+                "- Write your reasoning as plain message text, then call the `run_command` tool with the bash command instead of writing `Action:`.\n"
+                "- To declare success, call the `finish` tool with `runtime_preparation_commands` and `test_commands` instead of writing "
+                "`Verification Bundle:` and `Final Answer: Success`. All success rules above still apply to its arguments.\n\n"
+            )
         
         self.system_prompt = (
             "You are an expert environment configuration agent. Your task is to set up a Docker "
@@ -84,8 +174,11 @@ class Planner:
             "- FORBIDDEN commands: `docker build`, `docker run`, `docker-compose`, `systemctl`, `service`, `dockerd`, `sudo`\n"
             "- If the repository contains a Dockerfile, DO NOT try to build it. Instead, analyze it to understand dependencies and install them directly using package managers (pip, apt, npm, cargo, go, mvn, gem, etc.).\n"
             "- Use ONLY: package managers (pip/uv/apt/yum/npm/yarn/cargo/go/mvn/gradle/gem/bundle/etc.), language runtimes (python/node/go/rust/java/ruby/etc.), and the project's own entry points.\n\n"
+            + batch_section
+            + paging_section
+            + tool_section +
             "IMPORTANT:\n"
-            "- Only output ONE Thought and ONE Action at a time.\n"
+            + action_rule +
             "- Stop immediately after the Action."
         )
 
@@ -115,18 +208,34 @@ class Planner:
 
         # 3. Construct the message list for the API call
         messages = [{"role": "system", "content": self.system_prompt}] + message_history
+        if manage_history:
+            estimated_input_tokens = self.tokenizer.count_many(message["content"] for message in messages)
+        else:
+            estimated_input_tokens = self.estimate_prompt_tokens()
 
         # Log the LLM call input if logging is enabled
         self._log_llm_call("input", messages)
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0,
-            stop=["Observation:"]
-        )
-
-        content = response.choices[0].message.content
+        self.last_batch_actions = None
+        self.last_verification_bundle = None
+        self.last_tool_action = None
+        if self.tool_calling:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0,
+                tools=PLANNER_TOOLS,
+                tool_choice="auto",
+            )
+            content = self._render_tool_calls(response.choices[0].message)
+        else:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0,
+                stop=["Observation:"]
+            )
+            content = response.choices[0].message.content
         
         # Log the LLM call output
         self._log_llm_call("output", {
@@ -146,16 +255,80 @@ class Planner:
         # 5. 提取 token 使用量
         usage = response.usage
         usage_info = self._extract_usage(usage)
+        usage_info["estimated_input_tokens"] = estimated_input_tokens
 
         thought = self._extract_tag(content, "Thought")
-        action = self._extract_tag(content, "Action")
+        # A native tool call carries the command verbatim; re-parsing the rendered
+        # text would cut multi-line commands (heredocs) at their first "key:" line.
+        if self.last_tool_action is not None:
+            action = self.last_tool_action
+        else:
+            action = self._extract_tag(content, "Action")
         is_finished = "Final Answer:" in content
+        if self.batch_actions and self.last_batch_actions is None:
+            self.last_batch_actions = self.extract_batch_actions(content)
 
         return thought, action, content, is_finished, usage_info
 
+    def _render_tool_calls(self, message):
+        """
+        Translate native tool calls back into the ReAct text form kept in history,
+        so history trimming and observation compression work unchanged. Structured
+        results are exposed via `last_tool_action` / `last_batch_actions` /
+        `last_verification_bundle`.
+        """
+        text = (message.content or "").strip()
+        thought = self._extract_tag(text, "Thought") or text
+        commands = []
+        finish_arguments = None
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            function = getattr(tool_call, "function", None)
+            if function is None:
+                continue
+            try:
+                arguments = json.loads(function.arguments or "{}")
+            except json.JSONDecodeError:
+                print(f"[Planner] Ignoring tool call with malformed arguments: {function.arguments!r}")
+                continue
+            if not isinstance(arguments, dict):
+                continue
+            if function.name == "run_command" and str(arguments.get("command") or "").strip():
+                commands.append(str(arguments["command"]).strip())
+            elif function.name == "finish":
+                finish_arguments = arguments
+
+        # No usable tool call: fall back to parsing the free-form text.
+        if finish_arguments is None and not commands:
+            return text
+
+        rendered = f"Thought: {thought}\n" if thought else ""
+        if finish_arguments is not None:
+            self.last_verification_bundle = finish_arguments
+            return (
+                rendered
+                + "Verification Bundle:\n"
+                + json.dumps(finish_arguments, ensure_ascii=False)
+                + "\nFinal Answer: Success"
+            )
+        if len(commands) > 1 and self.batch_actions:
+            self.last_batch_actions = commands
+            return rendered + "Actions: " + json.dumps(commands, ensure_ascii=False)
+        self.last_tool_action = commands[0]
+        if len(commands) > 1:
+            # Batching is off: only the first command runs. Say so in the history so
+            # the model re-issues the rest instead of assuming they were executed.
+            print(f"[Planner] Batch actions disabled; running only the first of {len(commands)} run_command calls")
+            rendered += (
+                f"Note: {len(commands) - 1} additional run_command call(s) were not executed; "
+                "issue one command per step.\n"
+            )
+        return rendered + f"Action: {commands[0]}"
+
     def init_managed_history(self, repo_url):
         self.managed_history = [{"role": "user", "content": f"Repository URL: {repo_url}"}]
-        self.managed_history_meta = [{"step_id": None, "kind": "seed"}]
+        self.managed_history_meta = [
+            {"step_id": None, "kind": "seed", "tokens": self.tokenizer.count(self.managed_history[0]["content"])}
+        ]
         self.managed_step_to_history_index = {}
 
     def append_step(self, step_id, assistant_content, observation_content):
@@ -164,13 +337,19 @@ class Planner:
 
         assistant_index = len(self.managed_history)
         self.managed_history.append({"role": "assistant", "content": assistant_content})
-        self.managed_history_meta.append({"step_id": step_id, "kind": "assistant"})
+        self.managed_history_meta.append(
+            {"step_id": step_id, "kind": "assistant", "tokens": self.tokenizer.count(assistant_content)}
+        )
 
         observation_index = len(self.managed_history)
         self.managed_history.append(
             {"role": "user", "content": f"Observation: {observation_content}"}
         )
-        self.managed_history_meta.append({"step_id": step_id, "kind": "observation"})
+        self.managed_history_meta.append({
+            "step_id": step_id,
+            "kind": "observation",
+            "tokens": self.tokenizer.count(self.managed_history[observation_index]["content"]),
+        })
 
         self.managed_step_to_history_index[step_id] = {
             "assistant": assistant_index,
@@ -178,6 +357,27 @@ class Planner:
         }
         self._trim_managed_history()
 
+    def estimate_prompt_tokens(self):
+        """Size of the next managed-history prompt, system prompt included, from per-message counts."""
+        total = self.tokenizer.count(self.system_prompt)
+        for message, meta in zip(self.managed_history, self.managed_history_meta):
+            tokens = meta.get("tokens")
+            if tokens is None:
+                tokens = meta["tokens"] = self.tokenizer.count(message["content"])
+            total += tokens
+        return total
+
+    def calls_until_evicted(self, step_id):
+        """Planner calls that will still carry `step_id`'s observation before trimming drops it."""
+        indices = self.managed_step_to_history_index.get(step_id)
+        if not indices or indices.get("observation") is None:
+            return 0
+        distance_from_end = len(self.managed_history) - indices["observation"]
+        if distance_from_end > self.MAX_HISTORY_MESSAGES - 1:
+            return 0
+        # Every later step appends two messages (assistant + observation).
+        return (self.MAX_HISTORY_MESSAGES - 1 - distance_from_end) // 2 + 1
+
     def replace_observation(self, step_id, observation_content):
         indices = self.managed_step_to_history_index.get(step_id)
         if not indices:
@@ -188,6 +388,9 @@ class Planner:
         self.managed_history[observation_index]["content"] = (
             f"Observation: {observation_content}"
         )
+        self.managed_history_meta[observation_index]["tokens"] = self.tokenizer.count(
+            self.managed_history[observation_index]["content"]
+        )
         return True
     
     def _log_llm_call(self, call_type, data):
@@ -264,6 +467,28 @@ class Planner:
             "total_tokens": usage.total_tokens,
         }
 
+    def extract_batch_actions(self, text):
+        """Parse an `Actions:` list. Returns a list of commands, or None if absent/unparseable."""
+        raw = self._extract_tag(text or "", "Actions")
+        if not raw:
+            return None
+        raw = re.sub(r"^json\s*", "", raw)
+
+        commands = None
+        try:
+            parsed = json.loads(raw)
+            if isinstance(parsed, list):
+                commands = [str(item) for item in parsed]
+        except json.JSONDecodeError:
+            # Tolerate one-command-per-line lists such as "1. cat a" or "- cat a".
+            commands = [
+                re.sub(r"^(?:\d+[.)]|[-*])\s*", "", line.strip()).strip("`").strip()
+                for line in raw.splitlines()
+            ]
+
+        commands = [command.strip() for command in commands or [] if command and command.strip()]
+        return commands or None
+
     def _extract_tag(self, text, tag):
         pattern = rf"{tag}:\s*(.*?)(?=\n\w+:|$)"
         match = re.search(pattern, text, re.DOTALL)
@@ -0,0 +1,279 @@
+"""
+Single-pass repository index.
+
+One iterative `os.scandir` walk records every file's path; sizes and contents
+are fetched lazily, once, and cached (large files through `mmap`), so the
+image selector, version solver and agent query the same index instead of
+re-walking the tree and re-opening files.
+"""
+import mmap
+import os
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.language_handlers import detect_language_with_confidence, extension_histogram
+from src.manifest_locator import ManifestLocator, SKIP_DIRS
+from src.tokenizer import count_tokens, truncate_to_tokens
+
+
+class RepoIndex:
+    # Files above this size are read through mmap instead of a buffered read.
+    MMAP_THRESHOLD = 64 * 1024
+    # Never read more than this from one file (matches ImageSelector.FILE_SIZE_THRESHOLD).
+    MAX_READ_BYTES = 128 * 1000 * 2
+    # Directories whose files all share one extension collapse at any depth above this many files.
+    COLLAPSE_MIN_FILES = 20
+    # Collapsed rendering, from most to least detail: (directory depth shown
+    # expanded, files listed per directory before grouping by extension).
+    # The first level that fits the token budget is used.
+    STRUCTURE_DETAIL_LEVELS = [(None, 40), (8, 20), (5, 12), (4, 6), (3, 3), (2, 0), (1, 0), (0, 0)]
+
+    def __init__(self, root: str, listing: Dict[str, Tuple[List[str], List[str]]],
+                 locator: Optional[ManifestLocator] = None):
+        self.root = root
+        # rel_dir -> (sub-directory rel paths, file names), each sorted; "" is the root.
+        self._listing = listing
+        # Relative, '/'-separated paths in os.walk order.
+        self.files: List[str] = []
+        self.dirs: List[str] = []
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            subdirs, names = listing.get(rel_dir, ([], []))
+            prefix = f"{rel_dir}/" if rel_dir else ""
+            self.files.extend(prefix + name for name in names)
+            self.dirs.extend(subdirs)
+            stack.extend(reversed(subdirs))
+        self._known = set(self.files)
+        self._sizes: Dict[str, Optional[int]] = {}
+        self._locator = locator or ManifestLocator()
+        self._manifest_files: Optional[List[str]] = None
+        self._histogram: Optional[Dict[str, int]] = None
+        self._language_hints: Optional[Tuple[Optional[str], float, Dict[str, float]]] = None
+        self._subtree_counts: Optional[Dict[str, Counter]] = None
+        self._contents: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, repo_path: str, locator: Optional[ManifestLocator] = None) -> "RepoIndex":
+        """Scan `repo_path` once. Directory symlinks are not followed, like `os.walk`."""
+        root = os.path.abspath(repo_path)
+        listing: Dict[str, Tuple[List[str], List[str]]] = {}
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            subdirs: List[str] = []
+            names: List[str] = []
+            try:
+                with os.scandir(os.path.join(root, rel_dir) if rel_dir else root) as iterator:
+                    for entry in iterator:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.name not in SKIP_DIRS:
+                                    subdirs.append(f"{rel_dir}/{entry.name}" if rel_dir else entry.name)
+                            elif entry.is_file():
+                                names.append(entry.name)
+                        except OSError:
+                            continue
+            except OSError:
+                pass
+            subdirs.sort()
+            names.sort()
+            listing[rel_dir] = (subdirs, names)
+            stack.extend(subdirs)
+        return cls(root, listing, locator)
+
+    # ------------------------------------------------------------------ queries
+
+    def paths(self) -> List[str]:
+        return list(self.files)
+
+    def size(self, rel_path: str) -> Optional[int]:
+        """File size in bytes (stat'ed on first request), or None for unknown paths."""
+        rel_path = self._normalize(rel_path)
+        if rel_path not in self._known:
+            return None
+        if rel_path not in self._sizes:
+            try:
+                self._sizes[rel_path] = os.stat(os.path.join(self.root, rel_path)).st_size
+            except OSError:
+                self._sizes[rel_path] = None
+        return self._sizes[rel_path]
+
+    @staticmethod
+    def _normalize(rel_path: str) -> str:
+        rel_path = rel_path.replace(os.sep, '/')
+        return rel_path[2:] if rel_path.startswith('./') else rel_path
+
+    def extension_histogram(self) -> Dict[str, int]:
+        if self._histogram is None:
+            self._histogram = extension_histogram(
+                name for _, names in self._listing.values() for name in names
+            )
+        return self._histogram
+
+    def manifest_files(self) -> List[str]:
+        if self._manifest_files is None:
+            self._manifest_files = self._locator.select(self.paths())
+        return list(self._manifest_files)
+
+    def read_text(self, rel_path: str, max_bytes: Optional[int] = None) -> Optional[str]:
+        """
+        Return (up to `max_bytes` of) a file's text, reading it at most once.
+        Unknown paths return None, so callers can use this as a `read_text` callable.
+        """
+        rel_path = self._normalize(rel_path)
+        if rel_path not in self._known:
+            return None
+        with self._lock:
+            content = self._contents.get(rel_path)
+        if content is None:
+            content = self._read(rel_path)
+            if content is None:
+                return None
+            with self._lock:
+                self._contents[rel_path] = content
+        return content if max_bytes is None else content[:max_bytes]
+
+    def _read(self, rel_path: str) -> Optional[str]:
+        size = self.size(rel_path)
+        if size is None:
+            return None
+        limit = min(size, self.MAX_READ_BYTES)
+        try:
+            with open(os.path.join(self.root, rel_path), 'rb') as f:
+                if size > self.MMAP_THRESHOLD:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        data = mapped[:limit]
+                else:
+                    data = f.read(limit)
+        except (OSError, ValueError):
+            return None
+        return data.decode('utf-8', errors='ignore')
+
+    def manifest_contents(self) -> Dict[str, str]:
+        contents = {}
+        for rel_path in self.manifest_files():
+            text = self.read_text(rel_path)
+            if text is not None:
+                contents[rel_path] = text
+        return contents
+
+    def language_hints(self) -> Tuple[Optional[str], float, Dict[str, float]]:
+        """(language, confidence, scores) from manifests and the extension histogram."""
+        if self._language_hints is None:
+            self._language_hints = detect_language_with_confidence(
+                self.manifest_files(), self.manifest_contents(), self.extension_histogram()
+            )
+        return self._language_hints
+
+    def _subtree_extensions(self) -> Dict[str, Counter]:
+        """rel_dir -> extension counts of every file below it (computed bottom-up, once)."""
+        if self._subtree_counts is None:
+            counts: Dict[str, Counter] = {}
+            for rel_dir in reversed([""] + self.dirs):
+                subdirs, names = self._listing.get(rel_dir, ([], []))
+                counter = Counter(_extension_label(name) for name in names)
+                for subdir in subdirs:
+                    counter.update(counts.get(subdir, Counter()))
+                counts[rel_dir] = counter
+            self._subtree_counts = counts
+        return self._subtree_counts
+
+    def render_collapsed_structure(self, budget_tokens: int, keep: Optional[List[str]] = None) -> str:
+        """
+        Structure tree bounded by `budget_tokens`.
+
+        Directories past the expansion depth collapse to one line such as
+        `fixtures/ (1,243 *.json)`, large directories list only their first files
+        plus per-extension counts, and the `keep` paths (manifest and CI files by
+        default) are always shown with their parent directories, at any depth.
+        """
+        keep_paths = set(self.manifest_files() if keep is None else keep)
+        keep_dirs: Set[str] = set()
+        for path in keep_paths:
+            parts = path.split('/')[:-1]
+            for i in range(1, len(parts) + 1):
+                keep_dirs.add('/'.join(parts[:i]))
+
+        text = ""
+        for expand_depth, list_limit in self.STRUCTURE_DETAIL_LEVELS:
+            text = self._render_collapsed(expand_depth, list_limit, keep_paths, keep_dirs)
+            if count_tokens(text) <= budget_tokens:
+                return text
+        # Even the coarsest level is too large: cut it, keeping whole lines.
+        cut = truncate_to_tokens(text, budget_tokens).rsplit('\n', 1)[0]
+        return f"{cut}\n... (structure truncated to {budget_tokens} tokens)"
+
+    def _render_collapsed(self, expand_depth: Optional[int], list_limit: int,
+                          keep_paths: Set[str], keep_dirs: Set[str]) -> str:
+        counts = self._subtree_extensions()
+        name = os.path.basename(self.root.rstrip(os.sep)) or self.root
+        lines: List[str] = []
+        stack = [("", 0)]
+        while stack:
+            rel_dir, level = stack.pop()
+            dir_name = rel_dir.rsplit('/', 1)[-1] if rel_dir else name
+            # Chains of directories holding nothing but one sub-directory share a line.
+            while rel_dir:
+                subdirs, names = self._listing.get(rel_dir, ([], []))
+                if names or len(subdirs) != 1:
+                    break
+                rel_dir = subdirs[0]
+                dir_name += '/' + rel_dir.rsplit('/', 1)[-1]
+            expanded = expand_depth is None or level < expand_depth
+            kept = not rel_dir or rel_dir in keep_dirs
+            subtree = counts[rel_dir]
+            homogeneous = len(subtree) == 1 and sum(subtree.values()) > self.COLLAPSE_MIN_FILES
+            if not kept and (not expanded or homogeneous):
+                lines.append(f"{'  ' * level}{dir_name}/ ({_describe_counts(subtree)})")
+                continue
+            lines.append(f"{'  ' * level}{dir_name}/")
+            subdirs, names = self._listing.get(rel_dir, ([], []))
+            indent = '  ' * (level + 1)
+            prefix = f"{rel_dir}/" if rel_dir else ""
+            if expanded:
+                shown = names[:list_limit]
+                hidden = names[list_limit:]
+            else:
+                # A collapsed directory on the way to a kept file shows only that path.
+                shown, hidden = [], names
+            lines.extend(indent + file_name for file_name in shown)
+            lines.extend(indent + file_name for file_name in hidden if prefix + file_name in keep_paths)
+            rest = Counter(_extension_label(file_name) for file_name in hidden
+                           if prefix + file_name not in keep_paths)
+            if rest:
+                lines.append(f"{indent}... ({_describe_counts(rest)})")
+            if expanded:
+                children = subdirs
+            else:
+                children = [subdir for subdir in subdirs if subdir in keep_dirs]
+                others = Counter()
+                other_dirs = 0
+                for subdir in subdirs:
+                    if subdir not in keep_dirs:
+                        others.update(counts[subdir])
+                        other_dirs += 1
+                if other_dirs:
+                    lines.append(f"{indent}... ({other_dirs:,} more dirs: {_describe_counts(others)})")
+            stack.extend((subdir, level + 1) for subdir in reversed(children))
+        return '\n'.join(lines)
+
+
+def _extension_label(file_name: str) -> str:
+    dot = file_name.rfind('.')
+    return f"*{file_name[dot:]}" if dot > 0 else "other"
+
+
+def _describe_counts(counter: Counter, limit: int = 3) -> str:
+    """`1,243 *.json` or `120 *.py, 30 *.json, 2 other, +4 types` for a file-type counter."""
+    total = sum(counter.values())
+    if not total:
+        return "empty"
+    common = counter.most_common(limit)
+    if len(counter) == 1:
+        return f"{total:,} {common[0][0]}"
+    described = ', '.join(f"{count:,} {label}" for label, count in common)
+    extra = len(counter) - len(common)
+    return f"{total:,} files: {described}" + (f", +{extra} types" if extra else "")
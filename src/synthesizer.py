@@ -1,5 +1,7 @@
 import re
 
+from src.observation_classifier import classify_observation
+
 
 class Synthesizer:
     def __init__(self, base_image="python:3.10", workdir="/app"):
@@ -439,73 +441,20 @@ class Synthesizer:
         """Detect successful commands that clearly did not run any tests."""
         if not observation:
             return False
-
-        normalized = self._normalize_observation_text(observation).lower()
-        empty_run_patterns = [
-            r"no tests were found",
-            r"no tests found",
-            r"collected\s+0\s+items",
-            r"ran\s+0\s+tests?",
-            r"\b0\s+tests?\s+ran\b",
-            r"\[no test files\]",
-            r"no test cases matched",
-            r"no tests to run",
-            r"\b0\s+examples?,\s+0\s+failures?\b",
-        ]
-        return any(re.search(pattern, normalized, re.MULTILINE) for pattern in empty_run_patterns)
+        return classify_observation(observation).has_empty_test_run_signal
 
     def _observation_has_effective_test_signal(self, observation):
         """Detect observation text that strongly suggests real tests were executed."""
         if not observation:
             return False
-
-        normalized_observation = self._normalize_observation_text(observation)
-        positive_patterns = [
-            r"collected\s+[1-9]\d*\s+items",
-            r"ran\s+[1-9]\d*\s+tests?",
-            r"\b[1-9]\d*\s+passed\b",
-            r"\b[1-9]\d*\s+failed\b",
-            r"\b[1-9]\d*\s+skipped\b",
-            r"\bok\s+\([1-9]\d*\s+tests?,",
-            r"\b[1-9]\d*\s+tests?,\s+[1-9]\d*\s+ran\b",
-            r"\[=+\]\s+running\s+[1-9]\d*\s+tests?",
-            r"test result:\s+(?:ok|failed)\.",
-            r"\b[1-9]\d*%\s+tests\s+passed\b",
-            r"^\s*ok\s+\S+\s+\d+(?:\.\d+)?s(?:\s|$)",
-            r"\b[1-9]\d*\s+examples?,\s+\d+\s+failures?\b",
-            r"\b[1-9]\d*\s+checks?,\s+\d+\s+ignored\b",
-            r"start\s+\d+:",
-            r"suites:\s+\d+\s+of\s+[1-9]\d*\s+completed",
-            r"asserts:\s+\d+\s+of\s+[1-9]\d*",
-            r"^\s*#\s*subtest:",
-            r"^\s*not ok\b",
-        ]
-        return any(
-            re.search(pattern, normalized_observation, re.IGNORECASE | re.MULTILINE)
-            for pattern in positive_patterns
-        )
+        return classify_observation(observation).has_effective_test_signal
 
     def _observation_looks_like_help_text(self, observation):
         """Exclude `--help` or usage screens from being treated as test execution."""
         if not observation:
             return False
+        return classify_observation(observation).looks_like_help_text
 
-        normalized = self._normalize_observation_text(observation).lower()
-        help_markers = [
-            "usage:",
-            "optional arguments:",
-            "positional arguments:",
-            "show this help",
-        ]
-        return any(marker in normalized for marker in help_markers)
-
-    def _normalize_observation_text(self, observation):
-        """Strip ANSI control codes and zero-width formatting artifacts before pattern matching."""
-        normalized = re.sub(r"\x1b\[[0-9;?]*[ -/]*[@-~]", "", observation)
-        normalized = normalized.replace("\u200b", "")
-        normalized = normalized.replace("\ufeff", "")
-        return normalized
-    
     def _is_setup_command(self, command):
         """判断指令是否是环境配置相关的 setup/build 命令"""
         setup_keywords = [
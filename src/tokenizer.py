@@ -0,0 +1,195 @@
+"""
+Token counting for prompt budgets, compression records and the run ledger.
+
+`get_tokenizer(model)` returns a shared counter for the model's vocabulary:
+a tiktoken encoding when tiktoken is installed (looked up by model prefix,
+cl100k_base for vocabularies tiktoken does not ship, such as Qwen or
+DeepSeek), otherwise a heuristic that mimics BPE pre-tokenisation. Either is
+far closer than len // 4 for logs, code and CJK text.
+
+Counters are created once per encoding and memoise counts of recent long
+strings (LRU, keyed by hash and length so large logs are not kept alive).
+The planner keeps per-message counts and only counts messages it appends or
+rewrites, so the prompt size is maintained incrementally.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional; the heuristic counter is used instead
+    tiktoken = None
+
+
+MEMO_MAX_ENTRIES = 4096
+# Shorter strings are cheaper to count than to look up.
+MEMO_MIN_CHARS = 64
+
+# Longest matching prefix wins; provider prefixes ("openai/") are stripped first.
+MODEL_ENCODINGS: List[Tuple[str, str]] = [
+    ("gpt-4o", "o200k_base"),
+    ("gpt-4.1", "o200k_base"),
+    ("gpt-4.5", "o200k_base"),
+    ("gpt-5", "o200k_base"),
+    ("o1", "o200k_base"),
+    ("o3", "o200k_base"),
+    ("o4", "o200k_base"),
+    ("gpt-4", "cl100k_base"),
+    ("gpt-3.5", "cl100k_base"),
+]
+# Closest tiktoken vocabulary for other BPE models (Qwen, DeepSeek, ...).
+DEFAULT_ENCODING = "cl100k_base"
+
+# Approximates BPE pre-tokenisation: a word absorbs one leading space and long
+# words split every 8 letters, digits group by 3, punctuation runs merge up to
+# 4, each CJK character is a token and other non-ASCII text costs about one
+# token per 2 characters.
+_HEURISTIC_PIECES = re.compile(
+    r" ?[A-Za-z]{1,8}"
+    r"| ?[0-9]{1,3}"
+    r"|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]"
+    r"|[^\x00-\x7f]{1,2}"
+    r"| ?[^\sA-Za-z0-9\x80-\U0010ffff]{1,4}"
+    r"|\s+"
+)
+
+
+class TokenCounter:
+    name = "base"
+
+    def __init__(self, memo_size: int = MEMO_MAX_ENTRIES):
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+    def count(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        if len(text) < MEMO_MIN_CHARS:
+            return self._count(text)
+        # str caches its hash, so repeated lookups of the same string are O(1).
+        key = (hash(text), len(text))
+        with self._lock:
+            cached = self._memo.get(key)
+            if cached is not None:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+                return cached
+        tokens = self._count(text)
+        with self._lock:
+            self.memo_misses += 1
+            self._memo[key] = tokens
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return tokens
+
+    def count_many(self, texts: Iterable[Optional[str]]) -> int:
+        return sum(self.count(text) for text in texts)
+
+    def truncate(self, text: str, budget_tokens: int) -> str:
+        """Longest prefix of `text` within `budget_tokens`, found by rescaling the cut."""
+        tokens = self.count(text)
+        if tokens <= budget_tokens:
+            return text
+        if budget_tokens <= 0:
+            return ""
+        chars = len(text) * budget_tokens // tokens
+        for _ in range(8):
+            tokens = self.count(text[:chars])
+            if tokens <= budget_tokens:
+                break
+            chars = chars * budget_tokens // tokens - 1
+        return text[:max(0, chars)]
+
+    def _count(self, text: str) -> int:
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, object]:
+        return {"tokenizer": self.name, "memo_hits": self.memo_hits, "memo_misses": self.memo_misses}
+
+
+class HeuristicCounter(TokenCounter):
+    name = "heuristic"
+
+    def _count(self, text: str) -> int:
+        # subn counts matches without materialising them.
+        return max(1, _HEURISTIC_PIECES.subn("", text)[1])
+
+
+class TiktokenCounter(TokenCounter):
+    def __init__(self, encoding_name: str, memo_size: int = MEMO_MAX_ENTRIES):
+        super().__init__(memo_size)
+        self.name = f"tiktoken:{encoding_name}"
+        self._encoding = tiktoken.get_encoding(encoding_name)
+
+    def _count(self, text: str) -> int:
+        # Special-token text in logs is counted as ordinary text, never rejected.
+        return len(self._encoding.encode_ordinary(text))
+
+
+_factories: List[Tuple[str, Callable[[], TokenCounter]]] = []
+_counters: Dict[str, TokenCounter] = {}
+_registry_lock = threading.Lock()
+_default_model: Optional[str] = None
+
+
+def register_tokenizer(model_prefix: str, factory: Callable[[], TokenCounter]):
+    """Use `factory` for models starting with `model_prefix` (checked before the built-ins)."""
+    with _registry_lock:
+        _factories.append((model_prefix, factory))
+        _counters.pop(f"custom:{model_prefix}", None)
+
+
+def set_default_model(model: Optional[str]):
+    """Model whose tokenizer `count_tokens` uses when no model is given."""
+    global _default_model
+    _default_model = model
+
+
+def encoding_for_model(model: Optional[str]) -> str:
+    name = (model or "").rsplit("/", 1)[-1].lower()
+    matches = [(prefix, encoding) for prefix, encoding in MODEL_ENCODINGS if name.startswith(prefix)]
+    return max(matches, key=lambda match: len(match[0]))[1] if matches else DEFAULT_ENCODING
+
+
+def get_tokenizer(model: Optional[str] = None) -> TokenCounter:
+    """Shared counter for `model` (the default model when omitted)."""
+    model = model if model is not None else _default_model
+    name = (model or "").rsplit("/", 1)[-1].lower()
+    with _registry_lock:
+        custom = [(prefix, factory) for prefix, factory in _factories if name.startswith(prefix.lower())]
+        if custom:
+            prefix, factory = max(custom, key=lambda entry: len(entry[0]))
+            key = f"custom:{prefix}"
+            if key not in _counters:
+                _counters[key] = factory()
+            return _counters[key]
+
+        key = encoding_for_model(model) if tiktoken is not None else "heuristic"
+        if key not in _counters:
+            _counters[key] = _build_counter(key)
+        return _counters[key]
+
+
+def _build_counter(encoding_name: str) -> TokenCounter:
+    if encoding_name == "heuristic":
+        return HeuristicCounter()
+    try:
+        return TiktokenCounter(encoding_name)
+    except Exception as e:
+        # tiktoken downloads vocabularies on first use; offline runs fall back.
+        print(f"[Tokenizer] Could not load {encoding_name} ({e}); using the heuristic counter")
+        return HeuristicCounter()
+
+
+def count_tokens(text: Optional[str], model: Optional[str] = None) -> int:
+    return get_tokenizer(model).count(text)
+
+
+def truncate_to_tokens(text: str, budget_tokens: int, model: Optional[str] = None) -> str:
+    return get_tokenizer(model).truncate(text, budget_tokens)
+
@@ -0,0 +1,184 @@
+"""
+Loop and stall detection for the ReAct run loop.
+
+The planner sometimes re-issues the same failing command or alternates between
+two approaches until `max_steps` is exhausted. The monitor watches
+(command, success, observation signature) triples and the environment revision,
+first injects a corrective [SYSTEM] observation and, if the pattern persists,
+asks the agent to stop early.
+"""
+import hashlib
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+_VOLATILE_PATTERNS = [
+    re.compile(r"0x[0-9a-fA-F]+"),
+    re.compile(r"\b[0-9a-f]{7,40}\b"),
+    re.compile(r"\d+(\.\d+)?"),
+]
+
+
+def observation_signature(observation: str, tail_chars: int = 2000) -> str:
+    """Hash of the observation tail with numbers, hashes and whitespace normalised away."""
+    text = (observation or "")[-tail_chars:]
+    for pattern in _VOLATILE_PATTERNS:
+        text = pattern.sub("#", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha1(text.encode("utf-8", errors="replace")).hexdigest()[:12]
+
+
+@dataclass
+class TrajectoryEvent:
+    step_id: int
+    kind: str
+    reason: str
+    action: str
+
+
+@dataclass
+class TrajectoryVerdict:
+    kind: str  # "warn" or "terminate"
+    reason: str
+    message: str = ""
+
+
+@dataclass
+class _Entry:
+    step_id: int
+    key: Tuple[str, bool, str]
+    success: bool
+    env_revision: int
+
+
+@dataclass
+class TrajectoryMonitor:
+    repeat_threshold: int = 3
+    repeat_window: int = 6
+    alternation_length: int = 4
+    stall_window: int = 10
+    # Steps the planner gets to change course after a warning before it can be terminated.
+    grace_steps: int = 2
+    _entries: Deque[_Entry] = field(default_factory=deque, init=False, repr=False)
+    events: List[TrajectoryEvent] = field(default_factory=list, init=False)
+    warned_at: Optional[int] = field(default=None, init=False)
+    # Consecutive clean steps since the grace period ended; a full window of them clears the warning.
+    _clean_steps: int = field(default=0, init=False, repr=False)
+    terminated: bool = field(default=False, init=False)
+    termination_step: Optional[int] = field(default=None, init=False)
+    termination_reason: Optional[str] = field(default=None, init=False)
+    steps_saved: int = field(default=0, init=False)
+    estimated_tokens_saved: int = field(default=0, init=False)
+
+    def observe(
+        self,
+        step_id: int,
+        action: str,
+        success: bool,
+        observation: str,
+        env_revision: int,
+    ) -> Optional[TrajectoryVerdict]:
+        """Record one executed step and return a verdict when a loop or stall is detected."""
+        key = ((action or "").strip(), bool(success), observation_signature(observation))
+        self._entries.append(_Entry(step_id, key, bool(success), env_revision))
+        max_len = max(self.repeat_window, self.alternation_length, self.stall_window)
+        while len(self._entries) > max_len:
+            self._entries.popleft()
+
+        reason = self._detect()
+        if reason is None:
+            if self.warned_at is not None and step_id - self.warned_at > self.grace_steps:
+                self._clean_steps += 1
+                if self._clean_steps >= self.repeat_window:
+                    # The planner recovered; a new pattern gets its own warning first.
+                    self.warned_at = None
+                    self._clean_steps = 0
+            return None
+        self._clean_steps = 0
+
+        if self.warned_at is not None and step_id - self.warned_at > self.grace_steps:
+            self.terminated = True
+            self.termination_step = step_id
+            self.termination_reason = reason
+            self.events.append(TrajectoryEvent(step_id, "terminate", reason, key[0]))
+            print(f"[TrajectoryMonitor] Terminating run at step {step_id}: {reason}")
+            return TrajectoryVerdict("terminate", reason)
+
+        if self.warned_at is not None:
+            return None
+
+        self.warned_at = step_id
+        self.events.append(TrajectoryEvent(step_id, "warn", reason, key[0]))
+        # Start a fresh window so termination requires the pattern to recur after the warning.
+        self._entries.clear()
+        print(f"[TrajectoryMonitor] Warning at step {step_id}: {reason}")
+        message = (
+            f"[SYSTEM] ⚠️  NO PROGRESS DETECTED: {reason}.\n"
+            "[SYSTEM] Repeating the same approach will not change the result. Re-read the earlier "
+            "observations, identify the root cause, and try a substantially different command. "
+            "If the pattern continues, the run will be stopped."
+        )
+        return TrajectoryVerdict("warn", reason, message)
+
+    def _detect(self) -> Optional[str]:
+        entries = list(self._entries)
+
+        recent = entries[-self.repeat_window:]
+        latest = recent[-1]
+        # Re-running a passing command (a verification burst) is not a loop; only
+        # failures repeated against an unchanged environment are.
+        repeats = 0 if latest.success else sum(
+            1 for entry in recent
+            if entry.key == latest.key and entry.env_revision == latest.env_revision
+        )
+        if repeats >= self.repeat_threshold:
+            return (
+                f"the command `{latest.key[0] or '(no action)'}` failed with the same output "
+                f"{repeats} times in the last {len(recent)} steps"
+            )
+
+        if len(entries) >= self.alternation_length:
+            window = entries[-self.alternation_length:]
+            tail = [entry.key for entry in window]
+            first, second = tail[-2], tail[-1]
+            # As with repeats: an alternation that changes the environment or keeps
+            # succeeding (edit, then a passing run) is progress, not a loop.
+            stuck = len({entry.env_revision for entry in window}) == 1 and not all(
+                entry.success for entry in window
+            )
+            if stuck and first != second and all(
+                key == (first if index % 2 == 0 else second) for index, key in enumerate(tail)
+            ):
+                return (
+                    f"alternating between `{first[0] or '(no action)'}` and "
+                    f"`{second[0] or '(no action)'}` without new results"
+                )
+
+        if len(entries) >= self.stall_window:
+            window = entries[-self.stall_window:]
+            revisions = {entry.env_revision for entry in window}
+            failures = sum(1 for entry in window if not entry.success)
+            if len(revisions) == 1 and failures * 2 >= len(window):
+                return (
+                    f"the environment has not changed in {len(window)} steps and "
+                    f"{failures} of them failed"
+                )
+        return None
+
+    def record_savings(self, remaining_steps: int, avg_tokens_per_step: float):
+        """Estimate what the cut-off saved: remaining steps at the run's average planner cost."""
+        self.steps_saved = max(0, remaining_steps)
+        self.estimated_tokens_saved = int(self.steps_saved * max(0.0, avg_tokens_per_step))
+
+    def get_summary(self) -> Dict[str, Any]:
+        return {
+            "terminated": self.terminated,
+            "termination_step": self.termination_step,
+            "termination_reason": self.termination_reason,
+            "warnings": sum(1 for event in self.events if event.kind == "warn"),
+            "events": [event.__dict__ for event in self.events],
+            "steps_saved": self.steps_saved,
+            "estimated_tokens_saved": self.estimated_tokens_saved,
+        }
@@ -0,0 +1,617 @@
+"""
+Deterministic runtime-version solver for base image selection.
+
+Reads the version declarations a project makes (requires-python, classifiers,
+engines.node, rust-version, the go.mod `go` directive, composer's `php`
+requirement, Java compiler targets, ...), intersects them with the candidate
+images of the language handler and picks an image directly when the answer is
+unambiguous. Conflicting or missing declarations return no image so the caller
+can fall back to the LLM.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+Version = Tuple[int, ...]
+# A constraint is a disjunction of conjunctions of (operator, version) comparisons.
+Constraint = List[List[Tuple[str, Version]]]
+
+# Version pinned by a file whose only purpose is to name one version.
+PIN = "pin"
+# Range the runtime must fall in (requires-python, engines.node, rust-version, ...).
+RANGE = "range"
+# Build target: the lowest candidate at or above it is the closest match.
+TARGET = "target"
+# Versions the project says it supports (classifiers): the highest is taken.
+SUPPORTED = "supported"
+# Versions CI runs (workflow matrices, .travis.yml, tox envlist): the lowest is
+# taken, as the oldest tested interpreter is the one the code is kept working on.
+TESTED = "tested"
+
+# Which version to guess first when a repository declares none (prefetch
+# order): a concrete preferred version, or "highest" / "lowest".
+PREFERRED_VERSIONS = {
+    "python": "3.11",
+    "javascript": "20",
+    "typescript": "20",
+    "php": "8.3",
+    "ruby": "3.3",
+    "rust": "highest",
+    "go": "highest",
+    "dart": "highest",
+    "r": "highest",
+    "java": "lowest",
+    "kotlin": "lowest",
+    "scala": "lowest",
+    "c#": "lowest",
+}
+
+NODE_LTS_CODENAMES = {
+    "argon": 4, "boron": 6, "carbon": 8, "dubnium": 10, "erbium": 12,
+    "fermium": 14, "gallium": 16, "hydrogen": 18, "iron": 20, "jod": 22,
+}
+
+
+def parse_version(text: str) -> Optional[Version]:
+    """'v18.17.0' -> (18, 17, 0); returns None when no leading number is present."""
+    match = re.search(r'(\d+(?:\.\d+)*)', text or "")
+    if not match:
+        return None
+    return tuple(int(part) for part in match.group(1).split('.'))
+
+
+def format_version(version: Version) -> str:
+    return ".".join(str(part) for part in version)
+
+
+def _bump(version: Version, index: int) -> Version:
+    """Smallest version above every release sharing the first `index + 1` components."""
+    padded = list(version) + [0] * max(0, index + 1 - len(version))
+    return tuple(padded[:index]) + (padded[index] + 1,)
+
+
+def _compare(candidate: Version, op: str, version: Version) -> bool:
+    # Compare at the candidate's precision: python:3.8 stands for every 3.8.x release.
+    if len(version) > len(candidate):
+        extra = version[len(candidate):]
+        version = version[:len(candidate)]
+        if op == "!=":
+            return True
+        if op == ">":
+            op = ">="
+        elif op == "<" and any(extra):
+            op = "<="
+    width = max(len(candidate), len(version))
+    candidate = candidate + (0,) * (width - len(candidate))
+    version = version + (0,) * (width - len(version))
+    return {
+        ">=": candidate >= version,
+        ">": candidate > version,
+        "<=": candidate <= version,
+        "<": candidate < version,
+        "==": candidate == version,
+        "!=": candidate != version,
+    }[op]
+
+
+def constraint_allows(constraint: Constraint, candidate: Version) -> bool:
+    return any(all(_compare(candidate, op, version) for op, version in clause) for clause in constraint)
+
+
+def _wildcard_clause(text: str) -> Optional[List[Tuple[str, Version]]]:
+    """'3.9.*', '18.x', '18' style prefixes -> [>=prefix, <next]."""
+    parts = []
+    for part in text.split('.'):
+        if part in ("*", "x", "X", ""):
+            break
+        if not part.isdigit():
+            return None
+        parts.append(int(part))
+    if not parts:
+        return []
+    prefix = tuple(parts)
+    return [(">=", prefix), ("<", _bump(prefix, len(prefix) - 1))]
+
+
+def parse_pep440_spec(spec: str) -> Optional[Constraint]:
+    """Parse `>=3.8,<3.12`, `~=3.9`, `==3.9.*` style specifiers."""
+    clause: List[Tuple[str, Version]] = []
+    for item in re.split(r'\s*,\s*', (spec or "").strip()):
+        if not item:
+            continue
+        match = re.match(r'(~=|===|==|!=|<=|>=|<|>)\s*([\d.*]+)$', item.replace(' ', ''))
+        if not match:
+            return None
+        op, text = match.groups()
+        if op == "~=":
+            version = parse_version(text)
+            if not version or len(version) < 2:
+                return None
+            clause += [(">=", version), ("<", _bump(version, len(version) - 2))]
+        elif "*" in text:
+            wildcard = _wildcard_clause(text)
+            if wildcard is None:
+                return None
+            if op == "!=":
+                # Excluding a whole release line is rare; ignore rather than guess.
+                continue
+            clause += wildcard
+        else:
+            clause.append(("==" if op == "===" else op, parse_version(text)))
+    return [clause] if clause else None
+
+
+def parse_semver_range(spec: str, flavor: str = "npm") -> Optional[Constraint]:
+    """
+    Parse npm / composer / pub / gem ranges: `^18.0.0`, `~7.4`, `>=16 <21`,
+    `^7.4 || ^8.0`, `18.x`, `1.2 - 2.0`, `~> 3.1`.
+
+    Composer's `~7.4` means >=7.4 <8.0 whereas npm's means >=7.4 <7.5; gem's `~>`
+    follows composer's rule.
+    """
+    alternatives = re.split(r'\s*\|\|?\s*', (spec or "").strip())
+    constraint: Constraint = []
+    for alternative in alternatives:
+        alternative = alternative.strip()
+        if not alternative:
+            continue
+        clause: List[Tuple[str, Version]] = []
+        hyphen = re.match(r'^v?([\d.x*]+)\s+-\s+v?([\d.x*]+)$', alternative)
+        if hyphen:
+            low, high = parse_version(hyphen.group(1)), parse_version(hyphen.group(2))
+            if not low or not high:
+                return None
+            constraint.append([(">=", low), ("<=", high)])
+            continue
+        tokens = re.findall(r'(\^|~>|~|>=|<=|>|<|=|==)?\s*v?([\d][\w.*-]*|[*xX])', alternative.replace(',', ' '))
+        if not tokens:
+            return None
+        for op, text in tokens:
+            text = re.sub(r'[-+].*$', '', text)  # drop pre-release / build metadata
+            if text in ("*", "x", "X"):
+                continue
+            version = parse_version(text)
+            if version is None:
+                return None
+            if op == "^":
+                first_nonzero = next((i for i, part in enumerate(version) if part), len(version) - 1)
+                clause += [(">=", version), ("<", _bump(version, first_nonzero))]
+            elif op in ("~", "~>"):
+                if flavor == "npm" or len(version) == 1:
+                    clause += [(">=", version), ("<", _bump(version, min(1, len(version) - 1)))]
+                else:
+                    clause += [(">=", version), ("<", _bump(version, len(version) - 2))]
+            elif op in (">=", "<=", ">", "<"):
+                clause.append((op, version))
+            elif re.search(r'\.(x|\*)$', text) or (not op and flavor == "npm"):
+                clause += _wildcard_clause(text) or []
+            else:
+                clause.append(("==", version))
+        if clause:
+            constraint.append(clause)
+    return constraint or None
+
+
+@dataclass
+class Declaration:
+    source: str
+    kind: str
+    spec: str
+    constraint: Constraint = field(repr=False)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"source": self.source, "kind": self.kind, "spec": self.spec}
+
+
+@dataclass
+class VersionDecision:
+    image: Optional[str]
+    version: Optional[str]
+    reason: str
+    conflict: bool = False
+    declarations: List[Declaration] = field(default_factory=list)
+    # Every image the declarations make equally acceptable, `image` first; a
+    # caller may pick the cheapest of them (e.g. one that is already local).
+    alternatives: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            "image": self.image,
+            "version": self.version,
+            "reason": self.reason,
+            "conflict": self.conflict,
+            "alternatives": self.alternatives,
+            "declarations": [declaration.to_dict() for declaration in self.declarations],
+        }
+
+
+def _exact(version: Version) -> Constraint:
+    return [[(">=", version), ("<", _bump(version, len(version) - 1))]]
+
+
+def _minimum(version: Version) -> Constraint:
+    return [[(">=", version)]]
+
+
+def _one_of(versions: List[Version]) -> Constraint:
+    return [clause for version in versions for clause in _exact(version)]
+
+
+class VersionSolver:
+    """
+    `read_text(rel_path)` returns a file's text or None; `files` lists the
+    repository's relevant files (relative, '/'-separated), e.g. RepoIndex.manifest_files().
+    """
+
+    def __init__(self, read_text: Callable[[str], Optional[str]], files: Optional[List[str]] = None):
+        self.read_text = read_text
+        self.files = list(files or [])
+
+    # ------------------------------------------------------------------ helpers
+
+    def _find(self, *patterns: str) -> List[str]:
+        """Known files whose basename (or path, for patterns with '/') matches a regex."""
+        found = []
+        for rel_path in self.files:
+            basename = rel_path.rsplit('/', 1)[-1]
+            for pattern in patterns:
+                target = rel_path if '/' in pattern else basename
+                if re.fullmatch(pattern, target):
+                    found.append(rel_path)
+                    break
+        return found
+
+    def _root_or_known(self, name: str) -> List[str]:
+        known = [path for path in self.files if path == name]
+        if known:
+            return known
+        return [name] if self.read_text(name) is not None else []
+
+    # -------------------------------------------------------- per-language parsing
+
+    def _python_declarations(self) -> List[Declaration]:
+        declarations = []
+        for path in self._root_or_known(".python-version"):
+            text = (self.read_text(path) or "").strip().splitlines()
+            version = parse_version(text[0]) if text else None
+            if version and len(version) >= 2:
+                declarations.append(Declaration(path, PIN, text[0].strip(), _exact(version[:2])))
+
+        for path, pattern in (
+            ("pyproject.toml", r'requires-python\s*=\s*["\']([^"\']+)["\']'),
+            ("setup.cfg", r'python_requires\s*=\s*([^\n#]+)'),
+            ("setup.py", r'python_requires\s*=\s*["\']([^"\']+)["\']'),
+        ):
+            for rel_path in self._root_or_known(path):
+                match = re.search(pattern, self.read_text(rel_path) or "")
+                constraint = parse_pep440_spec(match.group(1)) if match else None
+                if constraint:
+                    declarations.append(Declaration(rel_path, RANGE, match.group(1).strip(), constraint))
+
+        classifier_versions = set()
+        classifier_sources = []
+        for path in ("setup.py", "setup.cfg", "pyproject.toml"):
+            for rel_path in self._root_or_known(path):
+                found = re.findall(
+                    r'Programming Language :: Python :: (3\.\d+)(?!\s*::\s*Only)', self.read_text(rel_path) or ""
+                )
+                if found:
+                    classifier_sources.append(rel_path)
+                    classifier_versions.update(found)
+        if classifier_versions:
+            versions = sorted(parse_version(v) for v in classifier_versions)
+            declarations.append(Declaration(
+                "+".join(classifier_sources), SUPPORTED,
+                "classifiers " + ", ".join(format_version(v) for v in versions), _one_of(versions),
+            ))
+            # Classifiers are authoritative; CI may describe a newer HEAD than the analysed commit.
+            return declarations
+
+        ci_versions = set()
+        ci_sources = []
+        for rel_path in self._find(r'\.github/workflows/.*\.ya?ml'):
+            found = re.findall(r'python-version["\s:]+["\[]*(3\.\d+)', self.read_text(rel_path) or "")
+            found += re.findall(r'python-version\s*:\s*\[([^\]]+)\]', self.read_text(rel_path) or "")
+            for item in found:
+                ci_versions.update(re.findall(r'3\.\d+', item))
+            if found:
+                ci_sources.append(rel_path)
+        for rel_path in self._root_or_known(".travis.yml"):
+            found = re.findall(r'["\s-]+(3\.\d+)["\s]', self.read_text(rel_path) or "")
+            if found:
+                ci_sources.append(rel_path)
+                ci_versions.update(found)
+        for rel_path in self._root_or_known("tox.ini"):
+            envlist = re.search(r'envlist\s*=\s*([^\[]+)', self.read_text(rel_path) or "")
+            found = [f"3.{minor}" for minor in re.findall(r'py3(\d+)', envlist.group(1) if envlist else "")]
+            if found:
+                ci_sources.append(rel_path)
+                ci_versions.update(found)
+        if ci_versions:
+            versions = sorted(parse_version(v) for v in ci_versions)
+            declarations.append(Declaration(
+                "+".join(ci_sources), TESTED,
+                "CI " + ", ".join(format_version(v) for v in versions), _one_of(versions),
+            ))
+        return declarations
+
+    def _node_declarations(self) -> List[Declaration]:
+        declarations = []
+        for name in (".nvmrc", ".node-version"):
+            for rel_path in self._root_or_known(name):
+                text = (self.read_text(rel_path) or "").strip().lower()
+                codename = re.match(r'lts/(\w+)', text)
+                if codename and codename.group(1) in NODE_LTS_CODENAMES:
+                    version = (NODE_LTS_CODENAMES[codename.group(1)],)
+                else:
+                    version = parse_version(text) if re.match(r'v?\d', text) else None
+                if version:
+                    declarations.append(Declaration(rel_path, PIN, text, _exact(version[:1])))
+        for rel_path in self._root_or_known("package.json"):
+            try:
+                engines = json.loads(self.read_text(rel_path) or "{}").get("engines") or {}
+            except (ValueError, AttributeError):
+                continue
+            spec = engines.get("node") if isinstance(engines, dict) else None
+            constraint = parse_semver_range(spec) if isinstance(spec, str) else None
+            if constraint:
+                declarations.append(Declaration(rel_path, RANGE, spec, constraint))
+        return declarations
+
+    def _rust_declarations(self) -> List[Declaration]:
+        declarations = []
+        for name in ("rust-toolchain.toml", "rust-toolchain"):
+            for rel_path in self._root_or_known(name):
+                text = self.read_text(rel_path) or ""
+                channel = re.search(r'channel\s*=\s*["\']([^"\']+)["\']', text)
+                value = channel.group(1) if channel else text.strip()
+                version = parse_version(value) if re.match(r'\d', value) else None
+                if version and len(version) >= 2:
+                    declarations.append(Declaration(rel_path, PIN, value, _exact(version[:2])))
+        for rel_path in self._find(r'Cargo\.toml'):
+            match = re.search(r'rust-version\s*=\s*["\']([\d.]+)["\']', self.read_text(rel_path) or "")
+            if match:
+                declarations.append(Declaration(rel_path, RANGE, match.group(1), _minimum(parse_version(match.group(1)))))
+        return declarations
+
+    def _go_declarations(self) -> List[Declaration]:
+        declarations = []
+        for rel_path in self._root_or_known(".go-version"):
+            version = parse_version(self.read_text(rel_path) or "")
+            if version and len(version) >= 2:
+                declarations.append(Declaration(rel_path, PIN, format_version(version), _exact(version[:2])))
+        for rel_path in self._find(r'go\.mod', r'go\.work'):
+            text = self.read_text(rel_path) or ""
+            for pattern in (r'^go\s+(\d+\.\d+(?:\.\d+)?)\s*$', r'^toolchain\s+go(\d+\.\d+(?:\.\d+)?)'):
+                match = re.search(pattern, text, re.MULTILINE)
+                if match:
+                    version = parse_version(match.group(1))
+                    declarations.append(Declaration(rel_path, RANGE, match.group(0).strip(), _minimum(version[:2])))
+        return declarations
+
+    def _jvm_declarations(self) -> List[Declaration]:
+        declarations = []
+        for rel_path in self._root_or_known(".java-version"):
+            version = parse_version(self.read_text(rel_path) or "")
+            if version:
+                major = version[1] if version[0] == 1 and len(version) > 1 else version[0]
+                declarations.append(Declaration(rel_path, PIN, str(major), _exact((major,))))
+
+        patterns = [
+            r'<maven\.compiler\.(?:release|source|target)>\s*([\d.]+)\s*<',
+            r'<java\.version>\s*([\d.]+)\s*<',
+            r'<release>\s*([\d.]+)\s*</release>',
+            r'sourceCompatibility\s*=\s*(?:JavaVersion\.VERSION_)?["\']?([\d._]+)',
+            r'targetCompatibility\s*=\s*(?:JavaVersion\.VERSION_)?["\']?([\d._]+)',
+            r'JavaLanguageVersion\.of\(\s*(\d+)\s*\)',
+            r'jvmToolchain\(\s*(\d+)\s*\)',
+            r'javacOptions\s*\+\+=\s*Seq\([^)]*"(?:--release|-target|-source)"\s*,\s*"([\d.]+)"',
+        ]
+        for rel_path in self._find(r'pom\.xml', r'build\.gradle(\.kts)?', r'build\.sbt', r'gradle\.properties'):
+            text = self.read_text(rel_path) or ""
+            majors = set()
+            for pattern in patterns:
+                for value in re.findall(pattern, text):
+                    version = parse_version(value.replace('_', '.'))
+                    if not version:
+                        continue
+                    majors.add(version[1] if version[0] == 1 and len(version) > 1 else version[0])
+            if majors:
+                major = max(majors)
+                declarations.append(Declaration(rel_path, TARGET, f"Java {major}", _minimum((major,))))
+        return declarations
+
+    def _dotnet_declarations(self) -> List[Declaration]:
+        declarations = []
+        for rel_path in self._root_or_known("global.json"):
+            try:
+                sdk = (json.loads(self.read_text(rel_path) or "{}").get("sdk") or {}).get("version")
+            except (ValueError, AttributeError):
+                sdk = None
+            version = parse_version(sdk) if isinstance(sdk, str) else None
+            if version and len(version) >= 2:
+                declarations.append(Declaration(rel_path, PIN, sdk, _exact(version[:2])))
+        for rel_path in self._find(r'.*\.csproj', r'Directory\.Build\.props'):
+            frameworks = re.findall(r'<TargetFrameworks?>([^<]+)<', self.read_text(rel_path) or "")
+            versions = []
+            for value in ";".join(frameworks).split(';'):
+                match = re.match(r'\s*net(?:coreapp)?(\d+\.\d+)', value)
+                if match:
+                    versions.append(parse_version(match.group(1)))
+            if versions:
+                highest = max(versions)
+                declarations.append(Declaration(rel_path, TARGET, f"net{format_version(highest)}", _minimum(highest)))
+        return declarations
+
+    def _ruby_declarations(self) -> List[Declaration]:
+        declarations = []
+        for rel_path in self._root_or_known(".ruby-version"):
+            text = (self.read_text(rel_path) or "").strip()
+            version = parse_version(text)
+            if version and len(version) >= 2:
+                declarations.append(Declaration(rel_path, PIN, text, _exact(version[:2])))
+        for rel_path in self._root_or_known("Gemfile"):
+            match = re.search(r'^\s*ruby\s+["\']([^"\']+)["\']', self.read_text(rel_path) or "", re.MULTILINE)
+            constraint = parse_semver_range(match.group(1), flavor="gem") if match else None
+            if constraint:
+                declarations.append(Declaration(rel_path, RANGE, match.group(1), constraint))
+        for rel_path in self._find(r'.*\.gemspec'):
+            match = re.search(r'required_ruby_version\s*=\s*(?:Gem::Requirement\.new\()?\s*["\']([^"\']+)["\']',
+                              self.read_text(rel_path) or "")
+            constraint = parse_semver_range(match.group(1), flavor="gem") if match else None
+            if constraint:
+                declarations.append(Declaration(rel_path, RANGE, match.group(1), constraint))
+        return declarations
+
+    def _php_declarations(self) -> List[Declaration]:
+        declarations = []
+        for rel_path in self._root_or_known(".php-version"):
+            version = parse_version(self.read_text(rel_path) or "")
+            if version and len(version) >= 2:
+                declarations.append(Declaration(rel_path, PIN, format_version(version), _exact(version[:2])))
+        for rel_path in self._root_or_known("composer.json"):
+            try:
+                require = json.loads(self.read_text(rel_path) or "{}").get("require") or {}
+            except (ValueError, AttributeError):
+                continue
+            spec = require.get("php") if isinstance(require, dict) else None
+            constraint = parse_semver_range(spec, flavor="composer") if isinstance(spec, str) else None
+            if constraint:
+                declarations.append(Declaration(rel_path, RANGE, spec, constraint))
+        return declarations
+
+    def _dart_declarations(self) -> List[Declaration]:
+        declarations = []
+        for rel_path in self._root_or_known("pubspec.yaml"):
+            match = re.search(r'^\s+sdk\s*:\s*["\']?([^"\'\n]+)', self.read_text(rel_path) or "", re.MULTILINE)
+            constraint = parse_semver_range(match.group(1)) if match else None
+            if constraint:
+                declarations.append(Declaration(rel_path, RANGE, match.group(1).strip(), constraint))
+        return declarations
+
+    def _r_declarations(self) -> List[Declaration]:
+        declarations = []
+        for rel_path in self._root_or_known("DESCRIPTION"):
+            match = re.search(r'\bR\s*\(\s*(>=|>)\s*([\d.]+)\s*\)', self.read_text(rel_path) or "")
+            if match:
+                declarations.append(Declaration(
+                    rel_path, RANGE, f"R {match.group(1)} {match.group(2)}",
+                    [[(match.group(1), parse_version(match.group(2)))]],
+                ))
+        return declarations
+
+    def declarations_for(self, language: str) -> List[Declaration]:
+        parser = {
+            "python": self._python_declarations,
+            "javascript": self._node_declarations,
+            "typescript": self._node_declarations,
+            "rust": self._rust_declarations,
+            "go": self._go_declarations,
+            "java": self._jvm_declarations,
+            "kotlin": self._jvm_declarations,
+            "scala": self._jvm_declarations,
+            "c#": self._dotnet_declarations,
+            "ruby": self._ruby_declarations,
+            "php": self._php_declarations,
+            "dart": self._dart_declarations,
+            "r": self._r_declarations,
+        }.get(language)
+        return parser() if parser else []
+
+    # ------------------------------------------------------------------ solving
+
+    @staticmethod
+    def versioned_candidates(candidate_images: List[str]) -> List[Tuple[Version, str]]:
+        """(version, image) for images of the dominant repository, e.g. php:*-cli but not composer:2."""
+        repositories: Dict[str, int] = {}
+        for image in candidate_images:
+            repositories[image.rsplit(':', 1)[0]] = repositories.get(image.rsplit(':', 1)[0], 0) + 1
+        if not repositories:
+            return []
+        dominant = max(repositories, key=repositories.get)
+        versioned = []
+        for image in candidate_images:
+            repository, _, tag = image.rpartition(':')
+            version = parse_version(tag) if repository == dominant and re.match(r'\d', tag) else None
+            if version:
+                versioned.append((version, image))
+        return versioned
+
+    @classmethod
+    def likely_candidates(cls, language: str, candidate_images: List[str], limit: int = 2) -> List[str]:
+        """Best guesses without declarations: the preferred version first, then the newest."""
+        candidates = sorted(cls.versioned_candidates(candidate_images))
+        if not candidates:
+            return candidate_images[:limit]
+        preference = PREFERRED_VERSIONS.get(language, "highest")
+        if preference == "highest":
+            first = candidates[-1]
+        elif preference == "lowest":
+            first = candidates[0]
+        else:
+            below = [c for c in candidates if c[0] <= parse_version(preference)]
+            first = below[-1] if below else candidates[0]
+        ordered = [first] + [c for c in reversed(candidates) if c != first]
+        return [image for _, image in ordered[:limit]]
+
+    def solve(self, language: str, candidate_images: List[str]) -> VersionDecision:
+        candidates = self.versioned_candidates(candidate_images)
+        if not candidates:
+            return VersionDecision(None, None, f"no versioned candidates for {language}")
+
+        declarations = self.declarations_for(language)
+        if not declarations:
+            return VersionDecision(None, None, "no version declarations found")
+
+        def allowed(kind: str) -> List[Tuple[Version, str]]:
+            remaining = candidates
+            for declaration in declarations:
+                if declaration.kind == kind:
+                    remaining = [c for c in remaining if constraint_allows(declaration.constraint, c[0])]
+            return remaining
+
+        feasible = candidates
+        for kind in (RANGE, TARGET):
+            feasible = [c for c in feasible if c in allowed(kind)]
+        if not feasible:
+            return VersionDecision(None, None, "declared ranges exclude every candidate image",
+                                   conflict=True, declarations=declarations)
+
+        if any(d.kind == PIN for d in declarations):
+            pinned = [c for c in feasible if c in allowed(PIN)]
+            if len(pinned) != 1:
+                return VersionDecision(None, None, "pinned version conflicts with declared ranges or candidates",
+                                       conflict=True, declarations=declarations)
+            return self._decision(pinned[0], "pinned version", declarations)
+
+        if any(d.kind == SUPPORTED for d in declarations):
+            supported = [c for c in feasible if c in allowed(SUPPORTED)]
+            if not supported:
+                return VersionDecision(None, None, "supported versions fall outside declared ranges",
+                                       conflict=True, declarations=declarations)
+            decision = self._decision(max(supported), "highest declared supported version", declarations)
+            decision.alternatives = [image for _, image in sorted(supported, reverse=True)]
+            return decision
+
+        if any(d.kind == TESTED for d in declarations):
+            tested = [c for c in feasible if c in allowed(TESTED)]
+            if not tested:
+                return VersionDecision(None, None, "CI-tested versions fall outside declared ranges",
+                                       conflict=True, declarations=declarations)
+            decision = self._decision(min(tested), "lowest CI-tested version", declarations)
+            decision.alternatives = [image for _, image in sorted(tested)]
+            return decision
+
+        if any(d.kind == TARGET for d in declarations):
+            return self._decision(min(feasible), "lowest image at or above the build target", declarations)
+
+        # Open ranges keep the baseline rule: the declared floor, i.e. the lowest
+        # satisfying image. PREFERRED_VERSIONS only applies with no declarations.
+        return self._decision(min(feasible), "lowest version within declared ranges", declarations)
+
+    @staticmethod
+    def _decision(candidate: Tuple[Version, str], reason: str, declarations: List[Declaration]) -> VersionDecision:
+        version, image = candidate
+        return VersionDecision(image, format_version(version), reason, declarations=declarations, alternatives=[image])
@@ -0,0 +1,53 @@
+"""Shared fixtures for the observation compression tests."""
+from agent import DockerAgent
+from src.observation_compressor import AgentStep, RunTokenLedger, build_observation_metadata
+from src.planner import Planner
+
+
+PIP_LOG = "\n".join(f"Collecting package{i}\n  Downloading package{i}-1.0.tar.gz (2 MB)" for i in range(120)) + (
+    "\nSuccessfully installed " + " ".join(f"package{i}-1.0" for i in range(120))
+)
+# Output no rule recognises, so only the LLM compressor can shrink it.
+OPAQUE_LOG = "\n".join(f"custom build step {i}: generated artifact_{i}.bin" for i in range(300))
+
+
+def make_step(step_id, observation, action="./build.sh"):
+    step = AgentStep(step_id=step_id, thought="", action=action, success=True, exit_code=0,
+                     mutates_environment=False, env_revision_before=0, env_revision_after=0,
+                     observation_raw=observation, observation_prompt=observation)
+    step.metadata = build_observation_metadata(observation)
+    return step
+
+
+def make_compression_agent(
+    compressor=None,
+    context_budget_tokens=1000,
+    background=False,
+    delta=False,
+    paging=False,
+    batch=True,
+):
+    """A DockerAgent with managed history and compression state only: no sandbox, no LLM client."""
+    agent = DockerAgent.__new__(DockerAgent)
+    agent.run_token_ledger = RunTokenLedger()
+    agent._init_compression_state(
+        enable_observation_compression=True,
+        context_budget_tokens=context_budget_tokens,
+        enable_background_compression=background,
+        enable_delta_observations=delta,
+        enable_batch_compression=batch,
+        enable_output_paging=paging,
+    )
+    if compressor is not None:
+        agent._attach_observation_compressor(compressor)
+    agent._max_steps = 30
+    agent.planner = Planner(client=None, output_paging=paging)
+    agent.planner.init_managed_history("repo")
+    return agent
+
+
+def add_step(agent, step):
+    """Append an executed step to the history and run the compression pass, as the run loop does."""
+    agent.agent_steps.append(step)
+    agent.planner.append_step(step.step_id, "Thought", step.observation_raw)
+    agent._maybe_compress_old_observation()
@@ -0,0 +1,120 @@
+import threading
+import time
+import unittest
+
+from compression_helpers import OPAQUE_LOG, add_step, make_compression_agent, make_step as _step
+from src.background_compression import BackgroundCompressor
+from src.observation_compressor import CompressionRecord
+
+
+class GatedCompressor:
+    """Compresses only once `release` is set, like a slow reflection call."""
+
+    def __init__(self, fail=False):
+        self.release = threading.Event()
+        self.fail = fail
+
+    def has_cached_result(self, step):
+        return False
+
+    def compress(self, target_step, context_steps):
+        self.release.wait(timeout=5)
+        if self.fail:
+            raise RuntimeError("rate limited")
+        reduced = "(compressed)"
+        record = CompressionRecord(eligible=True, method="llm",
+                                   original_chars=len(target_step.observation_raw),
+                                   original_tokens_est=target_step.metadata["raw_tokens_est"],
+                                   reduced_chars=len(reduced), reduced_tokens_est=3,
+                                   reflect_input_tokens=500, reflect_output_tokens=20)
+        record.saved_tokens_est = record.original_tokens_est - 3
+        return reduced, record
+
+
+class BackgroundCompressorTests(unittest.TestCase):
+    def test_result_collected_after_it_finishes_counts_as_overlap(self):
+        compressor = GatedCompressor()
+        background = BackgroundCompressor(compressor)
+        background.submit(_step(1, OPAQUE_LOG), [])
+        self.assertTrue(background.in_flight(1))
+        self.assertEqual(background.collect(), [])
+
+        compressor.release.set()
+        deadline = time.monotonic() + 5
+        finished = []
+        while not finished and time.monotonic() < deadline:
+            finished = background.collect()
+            time.sleep(0.01)
+        self.assertEqual(finished[0][1], "(compressed)")
+        self.assertFalse(background.in_flight(1))
+        summary = background.get_summary()
+        self.assertEqual(summary["blocking_seconds"], 0)
+        self.assertEqual(summary["tasks"], 1)
+        background.shutdown(wait=True)
+
+    def test_wait_blocks_and_is_reported(self):
+        compressor = GatedCompressor()
+        background = BackgroundCompressor(compressor)
+        background.submit(_step(1, OPAQUE_LOG), [])
+        threading.Timer(0.1, compressor.release.set).start()
+        finished = background.collect(wait=True)
+        self.assertEqual(len(finished), 1)
+        self.assertGreater(background.blocking_seconds, 0)
+        background.shutdown(wait=True)
+
+    def test_failed_compression_yields_failed_record(self):
+        compressor = GatedCompressor(fail=True)
+        compressor.release.set()
+        background = BackgroundCompressor(compressor)
+        background.submit(_step(1, OPAQUE_LOG), [])
+        (_, reduced, record, _), = background.collect(wait=True)
+        self.assertEqual(record.reason, "compression_failed")
+        self.assertEqual(reduced, OPAQUE_LOG)
+        self.assertEqual(background.get_summary()["failed"], 1)
+        background.shutdown(wait=True)
+
+
+class AgentBackgroundCompressionTests(unittest.TestCase):
+    def _agent(self, compressor):
+        return make_compression_agent(compressor, background=True)
+
+    def _add(self, agent, step):
+        add_step(agent, step)
+
+    def test_result_is_applied_when_collected(self):
+        compressor = GatedCompressor()
+        agent = self._agent(compressor)
+        for step_id in range(1, 4):
+            self._add(agent, _step(step_id, OPAQUE_LOG if step_id == 1 else "ok"))
+        self.assertTrue(agent.background_compressor.in_flight(1))
+        self.assertFalse(agent.agent_steps[0].compression.applied)
+
+        compressor.release.set()
+        agent._collect_background_compressions(wait=True)
+        self.assertTrue(agent.agent_steps[0].compression.applied)
+        self.assertIn("(compressed)", agent.planner.managed_history[2]["content"])
+        self.assertEqual(agent.run_token_ledger.reflection.input_tokens, 500)
+        self.assertEqual(agent.compression_stats["compressed_steps"], 1)
+        agent.background_compressor.shutdown(wait=True)
+
+    def test_result_for_evicted_step_is_discarded(self):
+        compressor = GatedCompressor()
+        agent = self._agent(compressor)
+        for step_id in range(1, 4):
+            self._add(agent, _step(step_id, OPAQUE_LOG if step_id == 1 else "ok"))
+        for step_id in range(4, 20):
+            agent.planner.append_step(step_id, "Thought", "ok")
+
+        compressor.release.set()
+        agent._collect_background_compressions(wait=True)
+        compression = agent.agent_steps[0].compression
+        self.assertFalse(compression.applied)
+        self.assertEqual(compression.reason, "evicted_before_result")
+        self.assertNotIn("(compressed)", agent.planner.managed_history[2]["content"])
+        self.assertEqual(agent.background_compressor.get_summary()["discarded"], 1)
+        self.assertEqual(agent.run_token_ledger.reflection.input_tokens, 500)
+        agent.background_compressor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+
+from agent import DockerAgent
+from src.planner import Planner
+from src.sandbox import Sandbox
+from src.synthesizer import Synthesizer
+
+
+class FakeSandbox:
+    def __init__(self):
+        self.executed = []
+        self.batches = []
+
+    def is_parallel_safe_command(self, command):
+        return Sandbox.is_parallel_safe_command(Sandbox.__new__(Sandbox), command)
+
+    def execute_readonly_batch(self, commands):
+        self.batches.append(list(commands))
+        return [(0, f"output {index} of {command}") for index, command in enumerate(commands)]
+
+    def execute(self, command):
+        self.executed.append(command)
+        return True, f"ran {command}"
+
+
+class BatchActionParsingTests(unittest.TestCase):
+    def test_extracts_json_action_list(self):
+        planner = Planner(client=None, batch_actions=True)
+        actions = planner.extract_batch_actions(
+            'Thought: inspect manifests\nActions: ["cat package.json", "ls tests"]'
+        )
+        self.assertEqual(actions, ["cat package.json", "ls tests"])
+
+    def test_extracts_numbered_action_list(self):
+        planner = Planner(client=None, batch_actions=True)
+        actions = planner.extract_batch_actions(
+            "Thought: inspect\nActions:\n1. `cat README.md`\n2. ls tests"
+        )
+        self.assertEqual(actions, ["cat README.md", "ls tests"])
+
+    def test_single_action_is_not_a_batch(self):
+        planner = Planner(client=None, batch_actions=True)
+        self.assertIsNone(planner.extract_batch_actions("Thought: t\nAction: cat README.md"))
+
+
+class ParallelSafetyTests(unittest.TestCase):
+    def setUp(self):
+        self.sandbox = Sandbox.__new__(Sandbox)
+
+    def test_readonly_pipelines_are_parallel_safe(self):
+        self.assertTrue(self.sandbox.is_parallel_safe_command("cat package.json"))
+        self.assertTrue(self.sandbox.is_parallel_safe_command("find . -name '*.py' | head -20"))
+        self.assertTrue(self.sandbox.is_parallel_safe_command("ls tests 2>&1"))
+
+    def test_redirection_and_mutating_segments_are_not_parallel_safe(self):
+        self.assertFalse(self.sandbox.is_parallel_safe_command("cat a > b"))
+        self.assertFalse(self.sandbox.is_parallel_safe_command("ls && pip install -e ."))
+        self.assertFalse(self.sandbox.is_parallel_safe_command("find . -name '*.pyc' -delete"))
+
+    def test_wrapped_commands_are_not_parallel_safe(self):
+        self.assertFalse(self.sandbox.is_parallel_safe_command("env FOO=1 pip install x"))
+        self.assertFalse(self.sandbox.is_parallel_safe_command("echo $(rm -rf build)"))
+        self.assertFalse(self.sandbox.is_parallel_safe_command("echo `touch x`"))
+        self.assertFalse(self.sandbox.is_parallel_safe_command("cat <(make)"))
+        self.assertFalse(self.sandbox.is_parallel_safe_command("find . -name '*.pyc' | xargs rm"))
+        self.assertTrue(self.sandbox.is_parallel_safe_command("env"))
+        self.assertTrue(self.sandbox.is_parallel_safe_command("echo $HOME"))
+
+
+class AgentBatchExecutionTests(unittest.TestCase):
+    def _make_agent(self):
+        agent = DockerAgent.__new__(DockerAgent)
+        agent.synthesizer = Synthesizer()
+        agent.sandbox = FakeSandbox()
+        agent.successful_test_commands = []
+        agent.verified_test_command = None
+        agent.verified_test_commands = []
+        agent.verified_runtime_preparation_commands = []
+        agent.test_run_attempts = []
+        agent.successful_actions = []
+        agent._environment_revision = 0
+        agent._current_verification_group = []
+        agent.batch_stats = {"batches": 0, "batched_commands": 0, "rejected_batches": 0}
+        return agent
+
+    def test_runs_readonly_commands_together_and_mutating_command_last(self):
+        agent = self._make_agent()
+
+        success, observation, mutates = agent._run_batch(
+            1, ["pip install -e .", "cat setup.py", "ls tests"]
+        )
+
+        self.assertTrue(success)
+        self.assertTrue(mutates)
+        self.assertEqual(agent.sandbox.batches, [["cat setup.py", "ls tests"]])
+        self.assertEqual(agent.sandbox.executed, ["pip install -e ."])
+        self.assertIn("[3/3] $ pip install -e . (ok)", observation)
+        self.assertEqual(agent._environment_revision, 1)
+
+    def test_repeated_command_keeps_each_output(self):
+        agent = self._make_agent()
+
+        _, observation, _ = agent._run_batch(1, ["ls tests", "ls tests"])
+
+        self.assertIn("[1/2] $ ls tests (ok) ---\noutput 0 of ls tests", observation)
+        self.assertIn("[2/2] $ ls tests (ok) ---\noutput 1 of ls tests", observation)
+
+    def test_rejects_batches_with_multiple_mutating_commands(self):
+        agent = self._make_agent()
+
+        success, observation, _ = agent._run_batch(1, ["pip install a", "npm install"])
+
+        self.assertFalse(success)
+        self.assertIn("at most one command", observation)
+        self.assertEqual(agent.sandbox.executed, [])
+        self.assertEqual(agent.batch_stats["rejected_batches"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import re
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from compression_helpers import PIP_LOG, make_compression_agent, make_step as _step
+from src.observation_compressor import ObservationCompressor, extract_result_blocks_from_rewritten_steps
+from src.persistent_cache import JsonFileCache
+
+
+def _log(name, lines=300):
+    return "\n".join(f"{name} step {i}: generated artifact_{i}.bin" for i in range(lines))
+
+
+class ScriptedClient:
+    """Rewrites every target of a request, except the step ids listed in `malformed`."""
+
+    def __init__(self, malformed=()):
+        self.malformed = set(malformed)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        target_ids = [int(step_id) for step_id in re.findall(r'<step id="(\d+)" target="true">', prompt)]
+        self.requests.append(target_ids)
+        parts = []
+        for step_id in target_ids:
+            if len(target_ids) > 1 and step_id in self.malformed:
+                parts.append(f'<step id="{step_id}"><result>\ntruncated')
+            else:
+                parts.append(f'<step id="{step_id}"><result>\n(step {step_id} compressed)\n</result></step>')
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="\n".join(parts)))],
+            usage=SimpleNamespace(prompt_tokens=9001, completion_tokens=30, total_tokens=9031),
+        )
+
+
+class ExtractResultBlocksTests(unittest.TestCase):
+    def test_each_step_is_validated_on_its_own(self):
+        content = (
+            '<step id="1"><result>\none &amp; done\n</result></step>\n'
+            '<step id="2"><think>t</think></step>\n'
+            '<step id="3"><result>a</result><result>b</result></step>\n'
+            '<step id="4"><result>x</result></step><step id="4"><result>y</result></step>\n'
+            '<step id="5" target="true"><result>\nfive\n</result></step>'
+        )
+        self.assertEqual(extract_result_blocks_from_rewritten_steps(content), {1: "one & done", 5: "five"})
+
+
+class CompressBatchTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+    def _compressor(self, client):
+        cache = JsonFileCache("observation_compression", cache_dir=self._tmp.name, enabled=True)
+        return ObservationCompressor(client, "m", cache=cache)
+
+    def test_one_call_compresses_every_target(self):
+        client = ScriptedClient()
+        compressor = self._compressor(client)
+        steps = [_step(1, _log("alpha")), _step(2, "ok"), _step(3, _log("beta"))]
+        results = compressor.compress_batch([steps[0], steps[2]], steps)
+
+        self.assertEqual(client.requests, [[1, 3]])
+        self.assertEqual([reduced for reduced, _ in results], ["(step 1 compressed)", "(step 3 compressed)"])
+        records = [record for _, record in results]
+        self.assertEqual([record.batch_size for record in records], [2, 2])
+        self.assertEqual(sum(record.reflect_input_tokens for record in records), 9001)
+        self.assertEqual(sum(record.reflect_output_tokens for record in records), 30)
+        self.assertTrue(compressor.has_cached_result(steps[2]))
+        self.assertEqual(compressor.batch_stats, {"calls": 1, "steps": 2, "fallbacks": 0})
+
+    def test_malformed_result_falls_back_to_a_single_step_call(self):
+        client = ScriptedClient(malformed={3})
+        compressor = self._compressor(client)
+        steps = [_step(1, _log("alpha")), _step(2, _log("gamma")), _step(3, _log("beta"))]
+        results = compressor.compress_batch([steps[0], steps[2]], steps)
+
+        self.assertEqual(client.requests, [[1, 3], [3]])
+        self.assertEqual(results[1][0], "(step 3 compressed)")
+        self.assertEqual(results[1][1].batch_size, 1)
+        # The fallback record carries its own call plus its share of the batch call.
+        self.assertGreater(results[1][1].reflect_input_tokens, 9001)
+        self.assertEqual(compressor.batch_stats["fallbacks"], 1)
+
+    def test_rule_compressible_targets_stay_out_of_the_call(self):
+        client = ScriptedClient()
+        steps = [_step(1, PIP_LOG, "pip install -r r.txt"), _step(2, _log("alpha"))]
+        results = self._compressor(client).compress_batch(steps, steps)
+        self.assertEqual(client.requests, [[2]])
+        self.assertEqual([record.method for _, record in results], ["rules", "llm"])
+
+
+class AgentBatchCompressionTests(unittest.TestCase):
+    def _agent(self, compressor, background=False):
+        return make_compression_agent(compressor, background=background)
+
+    def _run(self, agent, observations):
+        for step_id, observation in enumerate(observations, start=1):
+            step = _step(step_id, observation)
+            agent.agent_steps.append(step)
+            agent.planner.append_step(step_id, "Thought", observation)
+        agent._maybe_compress_old_observation()
+
+    def test_eligible_steps_in_one_window_share_a_call(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = ScriptedClient()
+            compressor = ObservationCompressor(client, "m", cache=JsonFileCache("c", cache_dir=cache_dir))
+            agent = self._agent(compressor)
+            self._run(agent, [_log("alpha"), "ok", _log("beta", lines=100), "ok", "ok", "ok"])
+
+        self.assertEqual(client.requests, [[1, 3]])
+        self.assertTrue(agent.agent_steps[0].compression.applied)
+        self.assertTrue(agent.agent_steps[2].compression.applied)
+        self.assertEqual(agent.compression_stats["compressed_steps"], 2)
+        self.assertEqual(agent.run_token_ledger.reflection.input_tokens, 9001)
+
+    def test_background_batch_is_collected_together(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            client = ScriptedClient()
+            compressor = ObservationCompressor(client, "m", cache=JsonFileCache("c", cache_dir=cache_dir))
+            agent = self._agent(compressor, background=True)
+            self._run(agent, [_log("alpha"), _log("beta"), "ok", "ok"])
+            agent._collect_background_compressions(wait=True)
+            agent.background_compressor.shutdown(wait=True)
+
+        self.assertEqual(client.requests, [[1, 2]])
+        self.assertEqual(agent.background_compressor.get_summary()["tasks"], 1)
+        self.assertIn("(step 2 compressed)", agent.planner.managed_history[4]["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from compression_helpers import OPAQUE_LOG, make_step as _step
+from src import observation_compressor
+from src.compression_scheduler import CompressionScheduler
+from src.observation_compressor import ObservationCompressor, RunTokenLedger
+from src.persistent_cache import JsonFileCache
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        content = '<step id="1"><result>\n(300 build steps, all artifacts generated)\n</result></step>'
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=4000, completion_tokens=20, total_tokens=4020),
+        )
+
+
+class CompressionCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.client = CountingClient()
+
+    def _compressor(self):
+        # A fresh compressor per run, sharing only the on-disk cache.
+        cache = JsonFileCache("observation_compression", cache_dir=self._tmp.name, enabled=True)
+        return ObservationCompressor(self.client, "m", cache=cache)
+
+    def test_repeated_output_is_served_from_cache(self):
+        first = _step(1, OPAQUE_LOG)
+        reduced, record = self._compressor().compress(first, [first])
+        self.assertFalse(record.cache_hit)
+        self.assertEqual(record.reflect_total_tokens, 4020)
+
+        later = _step(7, OPAQUE_LOG)
+        cached, record = self._compressor().compress(later, [later])
+        self.assertEqual(self.client.calls, 1)
+        self.assertEqual(cached, reduced)
+        self.assertTrue(record.cache_hit)
+        self.assertEqual(record.method, "llm")
+        self.assertEqual(record.reflect_total_tokens, 0)
+        self.assertEqual(record.saved_tokens_est, record.original_tokens_est - record.reduced_tokens_est)
+
+        ledger = RunTokenLedger()
+        ledger.add("reflection", input_tokens=record.reflect_input_tokens,
+                   output_tokens=record.reflect_output_tokens)
+        self.assertEqual(ledger.reflection.total_tokens, 0)
+
+    def test_different_output_or_prompt_version_misses(self):
+        step = _step(1, OPAQUE_LOG)
+        self._compressor().compress(step, [step])
+        other = _step(2, OPAQUE_LOG + "\ncustom build step 300: done")
+        self.assertFalse(self._compressor().compress(other, [other])[1].cache_hit)
+        with mock.patch.object(observation_compressor, "COMPRESSION_PROMPT_VERSION", "edited"):
+            self.assertFalse(self._compressor().compress(step, [step])[1].cache_hit)
+        self.assertEqual(self.client.calls, 3)
+
+    def test_unparseable_responses_are_not_cached(self):
+        self.client.chat.completions.create = lambda **kwargs: SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="no xml"))],
+            usage=SimpleNamespace(prompt_tokens=1, completion_tokens=1, total_tokens=2),
+        )
+        step = _step(1, OPAQUE_LOG)
+        self._compressor().compress(step, [step])
+        self.assertFalse(self._compressor().has_cached_result(step))
+
+    def test_cached_results_skip_the_pressure_gate(self):
+        compressor = self._compressor()
+        scheduler = CompressionScheduler(context_budget_tokens=100000, is_cached=compressor.has_cached_result)
+        step = _step(1, OPAQUE_LOG)
+        self.assertEqual(scheduler.decide(step, 1000, 8, 4000).reason, "low_context_pressure")
+        compressor.compress(step, [step])
+        decision = scheduler.decide(_step(2, OPAQUE_LOG), 1000, 8, 4000)
+        self.assertTrue(decision.compress)
+        self.assertEqual(decision.method, "cached")
+
+
+if __name__ == "__main__":
+    unittest.main()
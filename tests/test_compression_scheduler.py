@@ -0,0 +1,103 @@
+import unittest
+
+from compression_helpers import OPAQUE_LOG, PIP_LOG, add_step, make_compression_agent, make_step as _step
+from src.compression_scheduler import CompressionScheduler
+from src.observation_compressor import CompressionRecord
+from src.planner import Planner
+
+
+class CompressionSchedulerTests(unittest.TestCase):
+    def test_rule_compressible_logs_skip_pressure_gate(self):
+        scheduler = CompressionScheduler(context_budget_tokens=100000)
+        decision = scheduler.decide(_step(1, PIP_LOG, "pip install -r r.txt"), 1000, 5, 4000)
+        self.assertTrue(decision.compress)
+        self.assertEqual(decision.method, "rules")
+
+    def test_llm_waits_for_context_pressure(self):
+        scheduler = CompressionScheduler(context_budget_tokens=100000)
+        step = _step(1, OPAQUE_LOG)
+        self.assertEqual(scheduler.decide(step, 1000, 8, 4000).reason, "low_context_pressure")
+        self.assertTrue(scheduler.decide(step, 60000, 8, 4000).compress)
+
+    def test_llm_must_amortise_its_cost(self):
+        scheduler = CompressionScheduler(context_budget_tokens=10000)
+        decision = scheduler.decide(_step(1, OPAQUE_LOG), 9000, 1, 20000)
+        self.assertEqual(decision.reason, "not_amortised")
+
+    def test_head_tail_view_limits_the_predicted_saving(self):
+        scheduler = CompressionScheduler()
+        step = _step(1, OPAQUE_LOG)
+        full, _, _ = scheduler.predict_saving(step)
+        step.metadata["prompt_tokens_est"] = step.metadata["raw_tokens_est"] // 2
+        paged, _, _ = scheduler.predict_saving(step)
+        self.assertEqual(paged, max(0, step.metadata["prompt_tokens_est"] - (step.metadata["raw_tokens_est"] - full)))
+        self.assertLess(paged, full)
+
+    def test_small_predicted_benefit_is_skipped(self):
+        decision = CompressionScheduler().decide(_step(1, "x" * 800), 99999, 10, 0)
+        self.assertEqual(decision.reason, "predicted_benefit_too_small")
+
+    def test_outcomes_update_ratio_and_summary(self):
+        scheduler = CompressionScheduler(context_budget_tokens=1000)
+        step = _step(1, OPAQUE_LOG)
+        decision = scheduler.decide(step, 900, 8, 100)
+        record = CompressionRecord(original_tokens_est=step.metadata["raw_tokens_est"])
+        record.saved_tokens_est = record.original_tokens_est // 10
+        scheduler.record_outcome(decision, record)
+        summary = scheduler.get_summary()
+        self.assertEqual(summary["scheduled"], 1)
+        self.assertLess(summary["realised_to_predicted"], 1)
+        self.assertAlmostEqual(summary["learned_ratios"]["feature:plain"], 0.1, places=2)
+
+
+class FakeCompressor:
+    def __init__(self):
+        self.calls = []
+
+    def has_cached_result(self, step):
+        return False
+
+    def compress(self, target_step, context_steps):
+        self.calls.append(target_step.step_id)
+        reduced = "(compressed)"
+        record = CompressionRecord(eligible=True, method="llm",
+                                   original_chars=len(target_step.observation_raw),
+                                   original_tokens_est=target_step.metadata["raw_tokens_est"],
+                                   reduced_chars=len(reduced), reduced_tokens_est=3)
+        record.saved_tokens_est = record.original_tokens_est - 3
+        return reduced, record
+
+
+class AgentSchedulingTests(unittest.TestCase):
+    def _agent(self, budget):
+        return make_compression_agent(FakeCompressor(), context_budget_tokens=budget)
+
+    def _add(self, agent, step):
+        add_step(agent, step)
+
+    def test_deferred_step_is_compressed_once_pressure_rises(self):
+        agent = self._agent(budget=12000)
+        self._add(agent, _step(1, OPAQUE_LOG))
+        self._add(agent, _step(2, "ok"))
+        self._add(agent, _step(3, "ok"))
+        self.assertEqual(agent.observation_compressor.calls, [])
+        self.assertEqual(agent.agent_steps[0].compression.reason, "deferred:low_context_pressure")
+
+        self._add(agent, _step(4, OPAQUE_LOG))
+        self._add(agent, _step(5, OPAQUE_LOG))
+        self.assertEqual(agent.observation_compressor.calls, [1])
+        self.assertTrue(agent.agent_steps[0].compression.applied)
+        self.assertIn("(compressed)", agent.planner.managed_history[2]["content"])
+
+    def test_calls_until_evicted(self):
+        planner = Planner(client=None)
+        planner.init_managed_history("repo")
+        for step_id in range(1, 4):
+            planner.append_step(step_id, "a", "o")
+        self.assertEqual(planner.calls_until_evicted(3), 12)
+        self.assertEqual(planner.calls_until_evicted(1), 10)
+        self.assertEqual(planner.calls_until_evicted(99), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import unittest
+
+from src.context_packer import (
+    PRIORITY_BOILERPLATE,
+    PRIORITY_DEPENDENCIES,
+    PRIORITY_PIN,
+    PRIORITY_SETUP_DOCS,
+    PRIORITY_TEST,
+    ContextPacker,
+    split_sections,
+)
+
+
+PYPROJECT = "\n".join(
+    ["[project]", 'name = "demo"', 'requires-python = ">=3.9"', 'dependencies = ["requests>=2"]', ""]
+    + ["[tool.black]"] + [f"option_{i} = {i}" for i in range(200)]
+    + ["", "[tool.pytest.ini_options]", 'addopts = "-q"'] + [f"# note {i}" for i in range(60)]
+)
+
+README = "\n".join(
+    ["# Demo", "A library."] + [f"Marketing line {i}." for i in range(300)]
+    + ["## Installation", "pip install -e .[test]", "## Running tests", "pytest tests/"]
+)
+
+WORKFLOW = """name: CI
+on: [push]
+jobs:
+  test:
+    runs-on: ubuntu-latest
+    strategy:
+      matrix:
+        python-version: ["3.10", "3.11"]
+    steps:
+      - uses: actions/checkout@v4
+      - name: Test
+        run: |
+          pip install -e .
+          pytest -x
+""" + "\n".join(f"# padding {i} " + "x" * 40 for i in range(40))
+
+
+class SplitSectionsTests(unittest.TestCase):
+    def test_toml_tables_are_prioritised(self):
+        sections = {s.title: s.priority for s in split_sections("pyproject.toml", PYPROJECT)}
+        self.assertEqual(sections["[project]"], PRIORITY_PIN)
+        self.assertEqual(sections["[tool.black]"], PRIORITY_BOILERPLATE)
+        self.assertEqual(sections["[tool.pytest.ini_options]"], PRIORITY_TEST)
+
+    def test_package_json_keys(self):
+        package = json.dumps({"name": "x", "engines": {"node": ">=18"}, "dependencies": {"a": "1"},
+                              "scripts": {"test": "jest"}, "keywords": ["k"] * 200})
+        sections = {s.title: s.priority for s in split_sections("package.json", package)}
+        self.assertEqual(sections["engines"], PRIORITY_PIN)
+        self.assertEqual(sections["dependencies"], PRIORITY_DEPENDENCIES)
+        self.assertEqual(sections["scripts"], PRIORITY_TEST)
+        self.assertEqual(sections["keywords"], PRIORITY_BOILERPLATE)
+
+    def test_ci_steps_and_versions_extracted(self):
+        sections = {s.title: s for s in split_sections(".github/workflows/ci.yml", WORKFLOW)}
+        self.assertIn('python-version: ["3.10", "3.11"]', sections["runtime versions"].text)
+        self.assertIn("pytest -x", sections["run steps"].text)
+
+    def test_readme_setup_headings(self):
+        sections = {s.title: s.priority for s in split_sections("README.md", README)}
+        self.assertEqual(sections["Installation"], PRIORITY_SETUP_DOCS)
+        self.assertLess(sections["Demo"], PRIORITY_SETUP_DOCS)
+
+    def test_small_files_stay_whole(self):
+        sections = split_sections("setup.cfg", "[metadata]\nname = x\n[options]\npython_requires = >=3.8\n")
+        self.assertEqual(len(sections), 1)
+        self.assertEqual(sections[0].priority, PRIORITY_PIN)
+
+
+class ContextPackerTests(unittest.TestCase):
+    def test_high_signal_sections_survive_tight_budget(self):
+        files = {"README.md": README, "pyproject.toml": PYPROJECT, ".github/workflows/ci.yml": WORKFLOW}
+        result = ContextPacker(400).pack(files)
+        self.assertLessEqual(result.used_tokens, 400)
+        self.assertIn('requires-python = ">=3.9"', result.text)
+        self.assertIn("pytest -x", result.text)
+        self.assertIn("pip install -e .[test]", result.text)
+        self.assertNotIn("option_150", result.text)
+        dropped = {(path, title) for path, title, _ in result.dropped}
+        self.assertIn(("pyproject.toml", "[tool.black]"), dropped)
+        self.assertIn("omitted: ", result.text)
+
+    def test_everything_fits_in_large_budget(self):
+        files = {"pyproject.toml": PYPROJECT}
+        result = ContextPacker(100000).pack(files)
+        self.assertEqual(result.dropped, [])
+        self.assertIn("option_199", result.text)
+        self.assertTrue(result.text.startswith("File: pyproject.toml"))
+
+    def test_sections_rendered_in_file_order(self):
+        result = ContextPacker(100000).pack({"pyproject.toml": PYPROJECT})
+        self.assertLess(result.text.index("[project]"), result.text.index("[tool.black]"))
+
+    def test_report_lists_dropped_sections(self):
+        report = ContextPacker(50).pack({"README.md": README}).report()
+        self.assertEqual(report["budget_tokens"], 50)
+        self.assertTrue(any(item["section"] == "Demo" for item in report["dropped"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
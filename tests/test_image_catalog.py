@@ -0,0 +1,134 @@
+import os
+import re
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import docker
+
+from src.image_catalog import ImageCatalog, build_probe_script, parse_probe_output
+from src.image_selector import ImageSelector
+from src.persistent_cache import JsonFileCache
+
+
+PROBE_OUTPUT = b"tool:git\ntool:curl\ntool:make\ntool:gcc\ntool:apt-get\nruntime:python:Python 3.11.9\n"
+
+
+class FakeDocker:
+    def __init__(self, local):
+        self.local = local
+        self.runs = []
+        self.images = SimpleNamespace(get=self._get)
+        self.containers = SimpleNamespace(run=self._run)
+
+    def _get(self, image):
+        if image not in self.local:
+            raise docker.errors.ImageNotFound(image)
+        image_id, size = self.local[image]
+        return SimpleNamespace(id=image_id, attrs={"Size": size})
+
+    def _run(self, image, command, **kwargs):
+        self.runs.append(image)
+        return PROBE_OUTPUT
+
+
+class ImageCatalogTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = JsonFileCache("image_catalog", cache_dir=self._tmp.name, enabled=True)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_probe_script_round_trip(self):
+        self.assertIn('command -v git', build_probe_script())
+        parsed = parse_probe_output(PROBE_OUTPUT.decode())
+        self.assertEqual(parsed["runtimes"], {"python": "3.11.9"})
+        self.assertIn("gcc", parsed["tools"])
+
+    def test_local_image_probed_once_across_catalogs(self):
+        client = FakeDocker({"python:3.11": ("sha256:aaa", 1_000_000_000)})
+        first = ImageCatalog(client=client, cache=self.cache).lookup("python:3.11")
+        second = ImageCatalog(client=client, cache=self.cache).lookup("python:3.11")
+        self.assertEqual(client.runs, ["python:3.11"])
+        self.assertTrue(first.probed and second.local)
+        self.assertEqual(second.missing_tools, ["zip", "unzip"])
+
+    def test_repulled_tag_is_probed_again(self):
+        client = FakeDocker({"python:3.11": ("sha256:aaa", 1)})
+        ImageCatalog(client=client, cache=self.cache).lookup("python:3.11")
+        client.local["python:3.11"] = ("sha256:bbb", 1)
+        ImageCatalog(client=client, cache=self.cache).lookup("python:3.11")
+        self.assertEqual(client.runs, ["python:3.11", "python:3.11"])
+
+    def test_missing_image_is_not_pulled_and_uses_last_probe(self):
+        client = FakeDocker({"php:8.3-cli": ("sha256:ccc", 500_000_000)})
+        ImageCatalog(client=client, cache=self.cache).lookup("php:8.3-cli")
+        del client.local["php:8.3-cli"]
+        capabilities = ImageCatalog(client=client, cache=self.cache).lookup("php:8.3-cli")
+        self.assertFalse(capabilities.local)
+        self.assertTrue(capabilities.probed)
+        unknown = ImageCatalog(client=client, cache=self.cache).lookup("composer:2")
+        self.assertFalse(unknown.probed)
+        self.assertIn("not pulled yet", unknown.describe())
+
+    def test_rank_prefers_local_then_fewer_missing_tools(self):
+        client = FakeDocker({"php:8.3-cli": ("sha256:ccc", 500_000_000)})
+        catalog = ImageCatalog(client=client, cache=self.cache)
+        ranked = [c.image for c in catalog.rank(["composer:2", "php:8.3-cli"])]
+        self.assertEqual(ranked, ["php:8.3-cli", "composer:2"])
+        hint = catalog.setup_hint("php:8.3-cli")
+        self.assertIn("Already installed (do not reinstall)", hint)
+        self.assertIn("Not installed: zip, unzip", hint)
+        self.assertIn("500 MB on disk", catalog.lookup("php:8.3-cli").describe())
+
+
+class RelevantClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        paths = re.findall(r"------ START FILE (\S+) ------", kwargs["messages"][0]["content"])
+        content = "\n".join(f'<rel file="{path}">Yes</rel>' for path in paths)
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class SolverTieBreakTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.repo = os.path.join(self._tmp.name, "repo")
+        os.makedirs(self.repo)
+        classifiers = "".join(f"'Programming Language :: Python :: 3.{minor}',\n" for minor in (8, 9, 10))
+        with open(os.path.join(self.repo, "setup.py"), "w", encoding="utf-8") as f:
+            f.write(f"setup(\n{classifiers})\n")
+
+    def _select(self, local, tie_break=True, selection_cache=None):
+        cache_dir = os.path.join(self._tmp.name, "cache")
+        selector = ImageSelector(
+            RelevantClient(), model="m",
+            relevance_cache=JsonFileCache("relevance", cache_dir=cache_dir, enabled=False),
+            selection_cache=selection_cache or JsonFileCache("image_selection", cache_dir=cache_dir, enabled=False),
+            catalog=ImageCatalog(client=FakeDocker(local), cache=JsonFileCache("c", cache_dir=cache_dir)),
+            catalog_tie_break=tie_break,
+        )
+        return selector.select_base_image(self.repo, log_dir=os.path.join(self._tmp.name, "logs"))[0]
+
+    def test_local_supported_version_wins_the_tie(self):
+        self.assertEqual(self._select({"python:3.9": ("sha256:aaa", 1_000_000_000)}), "python:3.9")
+
+    def test_solver_choice_stands_when_nothing_is_local(self):
+        self.assertEqual(self._select({}), "python:3.10")
+
+    def test_solver_choice_stands_by_default_when_it_is_not_local(self):
+        local = {"python:3.9": ("sha256:aaa", 1_000_000_000)}
+        self.assertEqual(self._select(local, tie_break=False), "python:3.10")
+
+    def test_host_dependent_pick_is_not_cached(self):
+        cache = JsonFileCache("image_selection", cache_dir=os.path.join(self._tmp.name, "selections"))
+        self.assertEqual(self._select({"python:3.9": ("sha256:aaa", 1)}, selection_cache=cache), "python:3.9")
+        self.assertEqual(self._select({}, selection_cache=cache), "python:3.10")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+import docker
+
+from src.image_prefetcher import ImagePrefetcher
+from src.version_solver import VersionSolver
+
+
+class FakeImages:
+    def __init__(self, local=None):
+        self.local = dict(local or {})
+        self.pulls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def get(self, image):
+        if image not in self.local:
+            raise docker.errors.ImageNotFound(image)
+        return SimpleNamespace(attrs=self.local[image])
+
+    def pull(self, image, platform=None):
+        self.release.wait(5)
+        self.pulls.append((image, platform))
+        self.local[image] = {"Os": "linux", "Architecture": (platform or "linux/arm64").split("/")[1]}
+
+
+class ImagePrefetcherTests(unittest.TestCase):
+    def test_local_image_is_not_pulled(self):
+        images = FakeImages({"python:3.11": {"Os": "linux", "Architecture": "amd64"}})
+        prefetcher = ImagePrefetcher(client=SimpleNamespace(images=images))
+        record = prefetcher.ensure("python:3.11", "linux/amd64")
+        self.assertEqual(record["status"], "cached")
+        self.assertEqual(images.pulls, [])
+
+    def test_platform_mismatch_triggers_pull(self):
+        images = FakeImages({"python:3.11": {"Os": "linux", "Architecture": "arm64"}})
+        prefetcher = ImagePrefetcher(client=SimpleNamespace(images=images))
+        record = prefetcher.ensure("python:3.11", "linux/amd64")
+        self.assertEqual(record["status"], "pulled")
+        self.assertEqual(images.pulls, [("python:3.11", "linux/amd64")])
+
+    def test_ensure_waits_for_prefetch_instead_of_pulling_again(self):
+        images = FakeImages()
+        images.release.clear()
+        prefetcher = ImagePrefetcher(client=SimpleNamespace(images=images))
+        prefetcher.prefetch(["node:20", "node:22"])
+        prefetcher.prefetch(["node:20"])
+        images.release.set()
+        record = prefetcher.ensure("node:20")
+        prefetcher.shutdown(wait=True)
+        self.assertEqual(record["source"], "prefetch")
+        self.assertTrue(record["used"])
+        self.assertEqual(images.pulls.count(("node:20", None)), 1)
+
+        summary = prefetcher.get_summary()
+        self.assertEqual({r["image"] for r in summary["images"]}, {"node:20", "node:22"})
+        self.assertEqual(summary["unused_pulls"], ["node:22"])
+
+    def test_failed_pull_is_recorded(self):
+        images = FakeImages()
+
+        def broken_pull(image, platform=None):
+            raise docker.errors.APIError("registry unavailable")
+
+        images.pull = broken_pull
+        record = ImagePrefetcher(client=SimpleNamespace(images=images)).ensure("ruby:3.3")
+        self.assertEqual(record["status"], "failed")
+
+
+class LikelyCandidatesTests(unittest.TestCase):
+    def test_preferred_version_first(self):
+        images = [f"python:3.{v}" for v in range(8, 14)]
+        self.assertEqual(VersionSolver.likely_candidates("python", images), ["python:3.11", "python:3.13"])
+
+    def test_highest_preference(self):
+        images = ["golang:1.21", "golang:1.22", "golang:1.23"]
+        self.assertEqual(VersionSolver.likely_candidates("go", images, limit=1), ["golang:1.23"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from src.language_handlers import LANGUAGE_SIGNALS, detect_language_with_confidence, extension_histogram
+from src.manifest_locator import ManifestLocator
+
+
+class ConfidenceDetectionTests(unittest.TestCase):
+    def test_python_project_is_confident(self):
+        language, confidence, _ = detect_language_with_confidence(
+            ["pyproject.toml", "requirements.txt", "docs/package.json"],
+            {},
+            extension_histogram(["a.py"] * 40 + ["app.js"] * 3),
+        )
+        self.assertEqual(language, "python")
+        self.assertGreaterEqual(confidence, 0.7)
+
+    def test_pyo3_crate_is_python(self):
+        language, confidence, scores = detect_language_with_confidence(
+            ["Cargo.toml", "pyproject.toml"],
+            {"pyproject.toml": '[build-system]\nrequires = ["maturin>=1.0"]', "Cargo.toml": 'pyo3 = "0.20"'},
+            extension_histogram(["lib.rs"] * 20 + ["x.py"] * 5),
+        )
+        self.assertEqual(language, "python")
+        self.assertGreater(scores["python"], scores["rust"])
+        self.assertGreaterEqual(confidence, 0.7)
+
+    def test_tsconfig_makes_typescript(self):
+        language, _, _ = detect_language_with_confidence(
+            ["package.json", "tsconfig.json"], {}, extension_histogram(["a.ts"] * 10 + ["b.js"] * 4)
+        )
+        self.assertEqual(language, "typescript")
+
+    def test_thin_evidence_has_low_confidence(self):
+        language, confidence, _ = detect_language_with_confidence(
+            ["README.md"], {}, extension_histogram(["a.sh", "b.py"])
+        )
+        self.assertLess(confidence, 0.7)
+
+    def test_no_evidence(self):
+        self.assertEqual(detect_language_with_confidence([], {}, {})[:2], (None, 0.0))
+
+    def test_every_scored_manifest_can_be_located(self):
+        locator = ManifestLocator()
+        for language, signals in LANGUAGE_SIGNALS.items():
+            for pattern in signals["manifests"]:
+                name = pattern.replace("*", "example")
+                self.assertEqual(locator.select([name]), [name], f"{language}: {pattern}")
+
+
+if __name__ == "__main__":
+    unittest.main()
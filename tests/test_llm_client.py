@@ -0,0 +1,128 @@
+import unittest
+from types import SimpleNamespace
+
+from src.llm_client import (
+    AdaptiveConcurrencyLimiter,
+    LLMClientPool,
+    RateLimiter,
+    get_shared_client_pool,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class RateLimitedError(Exception):
+    status_code = 429
+
+
+class FakeClient:
+    def __init__(self, failures_before_success=0, error_cls=RateLimitedError):
+        self.failures_before_success = failures_before_success
+        self.error_cls = error_cls
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures_before_success:
+            raise self.error_cls("throttled")
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15),
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+        )
+
+
+class RateLimiterTests(unittest.TestCase):
+    def test_waits_for_request_bucket_to_refill(self):
+        clock = FakeClock()
+        limiter = RateLimiter(requests_per_minute=2, clock=clock, sleep=clock.sleep)
+
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertEqual(limiter.acquire(), 0.0)
+        waited = limiter.acquire()
+
+        self.assertAlmostEqual(waited, 30.0, places=3)
+
+    def test_token_bucket_caps_oversized_requests(self):
+        clock = FakeClock()
+        limiter = RateLimiter(tokens_per_minute=100, clock=clock, sleep=clock.sleep)
+
+        self.assertEqual(limiter.acquire(tokens=5000), 0.0)
+        self.assertGreater(limiter.acquire(tokens=50), 0.0)
+
+
+class AdaptiveConcurrencyLimiterTests(unittest.TestCase):
+    def test_additive_increase_and_multiplicative_decrease(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8)
+
+        limiter.acquire()
+        limiter.release()
+        self.assertAlmostEqual(limiter.limit, 4.25)
+
+        limiter.acquire()
+        limiter.release(throttled=True)
+        self.assertAlmostEqual(limiter.limit, 2.125)
+
+
+class LLMClientPoolTests(unittest.TestCase):
+    def test_retries_rate_limited_calls_with_backoff(self):
+        client = FakeClient(failures_before_success=2)
+        delays = []
+        pool = LLMClientPool(client, sleep=delays.append, base_delay=0.5)
+
+        response = pool.chat.completions.create(
+            model="m",
+            messages=[{"role": "user", "content": "hi"}],
+        )
+
+        self.assertEqual(response.choices[0].message.content, "ok")
+        self.assertEqual(client.calls, 3)
+        self.assertEqual(len(delays), 2)
+        self.assertLessEqual(delays[1], 1.0)
+        stats = pool.get_stats()
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["rate_limited"], 2)
+        self.assertEqual(stats["calls"], 1)
+
+    def test_does_not_retry_non_retryable_errors(self):
+        client = FakeClient(failures_before_success=1, error_cls=ValueError)
+        pool = LLMClientPool(client, sleep=lambda _: None)
+
+        with self.assertRaises(ValueError):
+            pool.chat.completions.create(model="m", messages=[])
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(pool.get_stats()["failures"], 1)
+
+    def test_get_stats_since_reports_the_delta(self):
+        client = FakeClient(failures_before_success=1)
+        pool = LLMClientPool(client, sleep=lambda _: None, base_delay=0.0)
+        pool.chat.completions.create(model="m", messages=[])
+        snapshot = pool.get_stats()
+
+        pool.chat.completions.create(model="m", messages=[])
+        delta = pool.get_stats(since=snapshot)
+
+        self.assertEqual(delta["calls"], 1)
+        self.assertEqual(delta["retries"], 0)
+        self.assertEqual(pool.get_stats()["calls"], 2)
+
+
+class SharedClientPoolTests(unittest.TestCase):
+    def test_pools_are_keyed_by_credentials_and_endpoint(self):
+        first = get_shared_client_pool(api_key="key-a", base_url="http://a.invalid/v1")
+        self.assertIs(first, get_shared_client_pool(api_key="key-a", base_url="http://a.invalid/v1"))
+        self.assertIsNot(first, get_shared_client_pool(api_key="key-b", base_url="http://a.invalid/v1"))
+        self.assertIsNot(first, get_shared_client_pool(api_key="key-a", base_url="http://b.invalid/v1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
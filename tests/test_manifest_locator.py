@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from src.image_selector import ImageSelector
+from src.manifest_locator import ManifestLocator, build_manifest_catalog
+from src.persistent_cache import JsonFileCache
+from src.repo_index import RepoIndex
+
+
+def _touch(root, rel_path):
+    full_path = os.path.join(root, rel_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w", encoding="utf-8") as f:
+        f.write("x\n")
+
+
+class ManifestCatalogTests(unittest.TestCase):
+    def test_catalog_includes_handler_and_generic_patterns(self):
+        catalog = build_manifest_catalog()
+        for pattern in ("pom.xml", "Cargo.toml", ".nvmrc", "tsconfig.json", ".github/workflows/*.yml"):
+            self.assertIn(pattern, catalog)
+        self.assertEqual(len(catalog), len(set(catalog)))
+
+    def test_pattern_kinds(self):
+        locator = ManifestLocator()
+        self.assertEqual(locator.select(["mod/pom.xml"]), ["mod/pom.xml"])
+        self.assertEqual(locator.select(["README.md", "docs/README.md"]), ["README.md"])
+        self.assertEqual(locator.select(["requirements/dev.txt"]), ["requirements/dev.txt"])
+        self.assertEqual(locator.select(["svc/.mvn/wrapper/maven-wrapper.properties"]),
+                         ["svc/.mvn/wrapper/maven-wrapper.properties"])
+
+
+class ManifestLocatorTests(unittest.TestCase):
+    def test_locates_manifests_from_the_index(self):
+        with tempfile.TemporaryDirectory() as repo:
+            for path in ("README.md", "pom.xml", "core/pom.xml", ".github/workflows/ci.yml",
+                         "core/src/Main.java", "docs/README.md", "node_modules/x/package.json"):
+                _touch(repo, path)
+
+            located = RepoIndex.build(repo).manifest_files()
+
+        self.assertEqual(located, ["README.md", "pom.xml", "core/pom.xml", ".github/workflows/ci.yml"])
+
+    def test_keeps_shallowest_when_capped(self):
+        with tempfile.TemporaryDirectory() as repo:
+            for i in range(5):
+                _touch(repo, f"a/b{i}/package.json")
+            _touch(repo, "package.json")
+            located = ManifestLocator(max_files=2).select(RepoIndex.build(repo).paths())
+        self.assertEqual(located, ["package.json", "a/b0/package.json"])
+
+
+class SelectorLocateTests(unittest.TestCase):
+    def _selector(self, cache_dir, reply="<file>setup.py</file>"):
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        selector = ImageSelector(client, model="m", relevance_cache=JsonFileCache("r", cache_dir=cache_dir))
+        return selector, calls
+
+    def test_rules_skip_llm_when_enough_files(self):
+        with tempfile.TemporaryDirectory() as repo, tempfile.TemporaryDirectory() as cache:
+            for path in ("README.md", "setup.py", "requirements.txt"):
+                _touch(repo, path)
+            selector, calls = self._selector(cache)
+            files, method = selector._locate_files(RepoIndex.build(repo).manifest_files(), "")
+        self.assertEqual(method, "rules")
+        self.assertEqual(calls, [])
+        self.assertEqual(len(files), 3)
+
+    def test_falls_back_to_llm_below_threshold(self):
+        with tempfile.TemporaryDirectory() as repo, tempfile.TemporaryDirectory() as cache:
+            _touch(repo, "README.md")
+            selector, calls = self._selector(cache)
+            files, method = selector._locate_files(RepoIndex.build(repo).manifest_files(), "repo/\n  README.md")
+        self.assertEqual(method, "rules+llm")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(files, ["README.md", "setup.py"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from types import SimpleNamespace
+
+from src.model_router import ModelRouter, parse_route_specs
+
+
+class FakeClient:
+    def __init__(self, replies):
+        self.replies = replies
+        self.models = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, **kwargs):
+        self.models.append(model)
+        reply = self.replies[model]
+        if isinstance(reply, Exception):
+            raise reply
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=7, completion_tokens=3, total_tokens=10),
+            choices=[SimpleNamespace(message=SimpleNamespace(content=reply))],
+        )
+
+
+class ModelRouterTests(unittest.TestCase):
+    def test_parse_route_specs_builds_chains(self):
+        routes = parse_route_specs(["relevance=cheap,mid", "planner=big"])
+        self.assertEqual(routes, {"relevance": ["cheap", "mid"], "planner": ["big"]})
+
+        with self.assertRaises(ValueError):
+            parse_route_specs(["unknown=cheap"])
+
+    def test_unrouted_call_types_use_default_model(self):
+        client = FakeClient({"default": "ok"})
+        router = ModelRouter(client, "default", routes={"relevance": "cheap"})
+
+        router.bind("planner").chat.completions.create(model="ignored", messages=[])
+
+        self.assertEqual(client.models, ["default"])
+        self.assertEqual(router.model_for("relevance"), "cheap")
+
+    def test_escalates_on_error_and_rejected_output(self):
+        client = FakeClient({
+            "cheap": RuntimeError("boom"),
+            "mid": "no tag here",
+            "big": "<rel>Yes</rel>",
+        })
+        router = ModelRouter(client, "big", routes={"relevance": ["cheap", "mid", "big"]})
+
+        response = router.create(
+            "relevance",
+            accept=lambda r: "<rel>" in r.choices[0].message.content,
+            messages=[],
+        )
+
+        self.assertEqual(response.choices[0].message.content, "<rel>Yes</rel>")
+        self.assertEqual(client.models, ["cheap", "mid", "big"])
+        stats = router.get_stats()["relevance"]
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["failures"], 1)
+        self.assertEqual(stats["escalations"], 2)
+        self.assertEqual(stats["input_tokens"], 14)
+
+
+if __name__ == "__main__":
+    unittest.main()
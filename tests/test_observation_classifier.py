@@ -0,0 +1,64 @@
+import unittest
+
+from src.observation_classifier import classify_observation
+from src.observation_compressor import build_observation_metadata
+from src.sandbox import Sandbox
+from src.synthesizer import Synthesizer
+
+
+class ObservationClassifierTests(unittest.TestCase):
+    def test_test_run_signals(self):
+        features = classify_observation("===== 3 failed, 12 passed in 4.20s =====")
+        self.assertTrue(features.has_effective_test_signal)
+        self.assertEqual(features.failed_count, 3)
+        self.assertTrue(features.has_test_markers)
+        self.assertTrue(classify_observation("ok  \tgithub.com/x/y\t0.012s").has_effective_test_signal)
+        self.assertTrue(classify_observation("OK (94 tests, 185 assertions)").has_effective_test_signal)
+        self.assertTrue(classify_observation("100% tests passed, 0 tests failed out of 7").has_effective_test_signal)
+
+    def test_word_boundaries_are_kept(self):
+        self.assertFalse(classify_observation("build a12 passed to stage two").has_effective_test_signal)
+        self.assertFalse(classify_observation("book (3 tests, pending)").has_effective_test_signal)
+        self.assertFalse(classify_observation("v10 tests ran").has_empty_test_run_signal)
+
+    def test_empty_runs_and_help_text(self):
+        self.assertTrue(classify_observation("collected 0 items\n\nno tests ran").has_empty_test_run_signal)
+        self.assertTrue(classify_observation("0 examples, 0 failures").has_empty_test_run_signal)
+        help_text = classify_observation("usage: pytest [options] [file_or_dir]\npositional arguments:")
+        self.assertTrue(help_text.looks_like_help_text)
+        self.assertTrue(help_text.has_usage_markers)
+        self.assertFalse(help_text.has_effective_test_signal)
+
+    def test_ansi_codes_are_stripped_once(self):
+        features = classify_observation("\x1b[32m5 passed\x1b[0m in 0.1s")
+        self.assertTrue(features.has_effective_test_signal)
+
+    def test_results_are_cached_per_output(self):
+        text = "Successfully installed requests-2.31.0"
+        self.assertIs(classify_observation(text), classify_observation("Successfully installed " + "requests-2.31.0"))
+        self.assertTrue(classify_observation(text).has_install_markers)
+
+
+class ConsumerTests(unittest.TestCase):
+    def test_sandbox_informational_exit_and_failure_prefix(self):
+        sandbox = Sandbox.__new__(Sandbox)
+        self.assertTrue(sandbox._is_informational_exit(2, "Usage: tool [OPTIONS]\nOptions:\n  --help"))
+        self.assertFalse(sandbox._is_informational_exit(2, "Usage: tool\nTraceback (most recent call last):"))
+        self.assertFalse(sandbox._is_informational_exit(0, "Usage: tool"))
+        self.assertIn("3 test(s) FAILED", sandbox._get_test_failure_prefix(1, "Failed: 3\nPassed: 10"))
+        self.assertIn("2 test(s) FAILED", sandbox._get_test_failure_prefix(1, "== 2 failed, 5 passed =="))
+        self.assertIn("TEST FAILURE DETECTED in command output", sandbox._get_test_failure_prefix(1, "not ok 4 - x"))
+        self.assertEqual(sandbox._get_test_failure_prefix(1, "make: *** [all] Error 2"), "")
+        self.assertEqual(sandbox._get_test_failure_prefix(0, "1 failed"), "")
+
+    def test_metadata_and_synthesizer_read_the_same_record(self):
+        log = "collected 4 items\n\ntests/test_a.py ....\n\n===== 4 passed in 0.02s ====="
+        metadata = build_observation_metadata(log)
+        self.assertTrue(metadata["has_test_markers"])
+        self.assertFalse(metadata["has_error_markers"])
+        analysis = Synthesizer().analyze_test_run("pytest -q", log)
+        self.assertTrue(analysis["is_effective_test_run"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+from compression_helpers import make_compression_agent
+from src.observation_delta import ObservationDeltaEncoder, shingle_signature, jaccard
+
+
+def pytest_log(failing=(), seconds="12.31"):
+    lines = ["============================= test session starts =============================="]
+    for i in range(120):
+        status = "FAILED" if i in failing else "PASSED"
+        lines.append(f"tests/test_module{i // 10}.py::test_case_{i} {status}")
+    lines.append(f"========== {len(failing)} failed, {120 - len(failing)} passed in {seconds}s ==========")
+    return "\n".join(lines)
+
+
+class DeltaEncoderTests(unittest.TestCase):
+    def test_near_duplicate_is_sent_as_delta(self):
+        encoder = ObservationDeltaEncoder()
+        encoder.add(3, pytest_log(failing=(5, 17)))
+        delta = encoder.encode(pytest_log(failing=(17,), seconds="11.02"))
+        self.assertIsNotNone(delta)
+        self.assertEqual(delta.base_step_id, 3)
+        self.assertEqual(delta.changed_lines, 2)
+        self.assertIn("Same as the output of step 3", delta.text)
+        self.assertIn("- tests/test_module0.py::test_case_5 FAILED", delta.text)
+        self.assertIn("+ tests/test_module0.py::test_case_5 PASSED", delta.text)
+        self.assertIn("passed in 11.02s", delta.text)
+        self.assertLess(len(delta.text), len(pytest_log()) // 5)
+
+    def test_digits_do_not_break_similarity(self):
+        self.assertEqual(
+            jaccard(shingle_signature(pytest_log(seconds="1.00")), shingle_signature(pytest_log(seconds="9.87"))),
+            1.0,
+        )
+
+    def test_identical_output(self):
+        encoder = ObservationDeltaEncoder()
+        encoder.add(1, pytest_log())
+        self.assertEqual(encoder.encode(pytest_log()).text, "[Identical to the output of step 1]")
+
+    def test_unrelated_or_invisible_bases_are_not_used(self):
+        encoder = ObservationDeltaEncoder()
+        encoder.add(1, pytest_log())
+        unrelated = "\n".join(f"Get:{i} http://deb.debian.org/debian bookworm/main pkg{i} amd64" for i in range(80))
+        self.assertIsNone(encoder.encode(unrelated))
+        self.assertIsNone(encoder.encode(pytest_log(failing=(1,)), is_visible=lambda step_id: False))
+
+    def test_latest_equally_similar_base_wins(self):
+        encoder = ObservationDeltaEncoder()
+        encoder.add(1, pytest_log())
+        encoder.add(4, pytest_log())
+        self.assertEqual(encoder.encode(pytest_log(failing=(3,))).base_step_id, 4)
+
+
+class AgentDeltaTests(unittest.TestCase):
+    def _agent(self):
+        return make_compression_agent(delta=True)
+
+    def _record(self, agent, step_id, observation):
+        agent._record_agent_step(
+            step_id=step_id, thought="", action="pytest", assistant_content="Action: pytest",
+            success=True, observation=observation, mutates_environment=False,
+            env_revision_before=0, env_revision_after=0,
+            planner_usage={"input_tokens": 0, "output_tokens": 0},
+        )
+
+    def test_delta_in_history_raw_kept_and_expanded_when_base_is_evicted(self):
+        agent = self._agent()
+        self._record(agent, 1, pytest_log(failing=(5,)))
+        self._record(agent, 2, pytest_log())
+
+        second = agent.agent_steps[1]
+        self.assertEqual(second.compression.method, "delta")
+        self.assertEqual(second.compression.reference_step_id, 1)
+        self.assertEqual(second.observation_raw, pytest_log())
+        observation_index = agent.planner.managed_step_to_history_index[2]["observation"]
+        self.assertIn("Same as the output of step 1", agent.planner.managed_history[observation_index]["content"])
+        self.assertEqual(agent.compression_stats["delta_encoded_steps"], 1)
+
+        step_id = 3
+        while agent.planner.calls_until_evicted(1) > 0:
+            self._record(agent, step_id, "ok")
+            step_id += 1
+        self.assertFalse(second.compression.applied)
+        self.assertEqual(second.compression.reason, "delta_base_evicted")
+        observation_index = agent.planner.managed_step_to_history_index[2]["observation"]
+        self.assertEqual(agent.planner.managed_history[observation_index]["content"], f"Observation: {pytest_log()}")
+        self.assertEqual(agent.compression_stats["delta_expanded_steps"], 1)
+        self.assertEqual(agent.compression_stats["saved_tokens_est"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
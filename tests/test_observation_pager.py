@@ -0,0 +1,173 @@
+import unittest
+
+from agent import DockerAgent
+from compression_helpers import make_compression_agent
+from src.observation_compressor import CompressionRecord
+from src.observation_pager import ObservationPager
+
+
+def pytest_log(lines=1000, failing=500):
+    return "\n".join(
+        f"tests/test_{i}.py::test_case FAILED - assert 1 == 2" if i == failing else f"tests/test_{i}.py::test_case PASSED"
+        for i in range(1, lines + 1)
+    )
+
+
+class ObservationPagerTests(unittest.TestCase):
+    def test_short_output_is_sent_whole(self):
+        pager = ObservationPager()
+        self.assertEqual(pager.add(1, "ok\n"), "ok\n")
+        self.assertEqual(pager.get_summary()["truncated_steps"], 0)
+
+    def test_long_output_keeps_head_and_tail_with_a_handle(self):
+        pager = ObservationPager(head_lines=10, tail_lines=10, max_view_tokens=500)
+        view = pager.add(4, pytest_log())
+        self.assertIn("tests/test_1.py::test_case PASSED", view)
+        self.assertIn("tests/test_1000.py::test_case PASSED", view)
+        self.assertNotIn("test_500.py", view)
+        self.assertIn("[... 980 lines (11-990) omitted; `show_output 4 <start>-<end>`", view)
+        self.assertGreater(pager.get_summary()["omitted_tokens_est"], 0)
+
+    def test_single_huge_line_is_cut_by_tokens(self):
+        pager = ObservationPager(max_view_tokens=200)
+        text = '{"data": [' + ", ".join(f'"item-{i}"' for i in range(5000)) + "]}"
+        view = pager.add(2, text)
+        self.assertTrue(view.startswith('{"data": ["item-0"'))
+        self.assertTrue(view.endswith('"item-4999"]}'))
+        self.assertIn("characters omitted", view)
+
+    def test_line_ranges_are_served_with_line_numbers(self):
+        pager = ObservationPager()
+        pager.add(3, pytest_log())
+        served = pager.serve("show_output 3 499-501")
+        self.assertEqual(served.splitlines(), [
+            "[show_output 3: lines 499-501 of 1000]",
+            "   499| tests/test_499.py::test_case PASSED",
+            "   500| tests/test_500.py::test_case FAILED - assert 1 == 2",
+            "   501| tests/test_501.py::test_case PASSED",
+        ])
+        self.assertIn("lines 998-1000 of 1000", pager.serve("show_output 3 998-5000"))
+        self.assertIn("lines 7-7 of 1000", pager.serve("show_output 3 7"))
+
+    def test_grep_supports_ignore_case_and_literal_fallback(self):
+        pager = ObservationPager()
+        pager.add(3, pytest_log() + "\nfailed: (unclosed")
+        self.assertIn("500| tests/test_500.py::test_case FAILED", pager.serve("show_output 3 grep FAILED"))
+        self.assertIn("2 of 1001 lines match '-i failed'", pager.serve("show_output 3 grep -i failed"))
+        self.assertIn("1001| failed: (unclosed", pager.serve("show_output 3 grep '(unclosed'"))
+
+    def test_large_answers_are_clipped(self):
+        pager = ObservationPager()
+        pager.add(3, pytest_log())
+        served = pager.serve("show_output 3 grep PASSED")
+        self.assertIn("999 of 1000 lines match", served)
+        self.assertTrue(served.endswith("narrow the range or the pattern to see the rest ...]"))
+        self.assertLessEqual(served.count("\n"), ObservationPager.MAX_SERVED_LINES + 2)
+
+    def test_bad_requests_get_errors_and_other_actions_are_ignored(self):
+        pager = ObservationPager()
+        pager.add(3, "a\nb")
+        self.assertIn("No stored output for step 9. Stored steps: 3", pager.serve("show_output 9 1-2"))
+        self.assertIn("Usage:", pager.serve("show_output 3 lines"))
+        self.assertIn("needs a pattern", pager.serve("show_output 3 grep"))
+        self.assertIsNone(pager.serve("cat show_output.txt"))
+        self.assertEqual(pager.get_summary()["failed_requests"], 3)
+
+
+class FakePlanner:
+    def __init__(self, actions):
+        self.actions = list(actions)
+        self.observations = []
+        self.last_batch_actions = None
+
+    def plan(self, repo_url=None, last_observation=None, manage_history=True):
+        self.observations.append(last_observation)
+        usage = {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+        if not self.actions:
+            return "done", None, "Final Answer: Failure", True, usage
+        action = self.actions.pop(0)
+        return "t", action, f"Action: {action}", False, usage
+
+
+class FakeSandbox:
+    def __init__(self, output):
+        self.output = output
+        self.commands = []
+
+    def execute(self, command):
+        self.commands.append(command)
+        return True, self.output
+
+    def close(self, keep_alive=False):
+        pass
+
+
+class FakeSynthesizer:
+    def record_success(self, action):
+        pass
+
+    def command_mutates_environment(self, action):
+        return False
+
+
+class AgentPagingTests(unittest.TestCase):
+    def _agent(self, actions, output):
+        agent = make_compression_agent(paging=True)
+        agent.enable_observation_compression = False
+        agent.observation_pager = ObservationPager(head_lines=5, tail_lines=5, max_view_tokens=200)
+        agent.repo_url = "repo"
+        agent._environment_revision = 0
+        agent.enable_tool_calling = False
+        agent.trajectory_monitor = None
+        agent.planner = FakePlanner(actions)
+        agent.sandbox = FakeSandbox(output)
+        agent.synthesizer = FakeSynthesizer()
+        agent._record_successful_action = lambda *args: None
+        agent._write_run_summary = lambda *args: None
+        return agent
+
+    def test_paging_is_off_without_observation_compression(self):
+        agent = DockerAgent.__new__(DockerAgent)
+        agent._init_compression_state(enable_observation_compression=False)
+        self.assertIsNone(agent.observation_pager)
+        agent._init_compression_state(enable_observation_compression=True)
+        self.assertIsNotNone(agent.observation_pager)
+
+    def test_show_output_is_served_without_the_sandbox(self):
+        agent = self._agent(["pytest", "show_output 1 grep FAILED"], pytest_log())
+        agent.run(max_steps=3)
+
+        self.assertEqual(agent.sandbox.commands, ["pytest"])
+        view, served = agent.planner.observations[1:3]
+        self.assertIn("show_output 1 <start>-<end>", view)
+        self.assertNotIn("test_500.py", view)
+        self.assertIn("500| tests/test_500.py::test_case FAILED", served)
+
+    def test_compressed_observation_keeps_the_handle(self):
+        agent = make_compression_agent(paging=True)
+        agent.observation_pager = ObservationPager(max_view_tokens=200)
+        agent.compression_scheduler = type("Scheduler", (), {"record_outcome": lambda self, d, r: None})()
+
+        raw = pytest_log()
+        agent._record_agent_step(
+            step_id=1, thought="", action="pytest", assistant_content="Action: pytest", success=True,
+            observation=raw, mutates_environment=False, env_revision_before=0, env_revision_after=0,
+            planner_usage={"input_tokens": 0, "output_tokens": 0},
+            observation_prompt=agent.observation_pager.add(1, raw),
+        )
+        step = agent.agent_steps[0]
+        self.assertEqual(step.observation_raw, raw)
+        shown = step.metadata["prompt_tokens_est"]
+        self.assertLess(shown, step.metadata["raw_tokens_est"])
+
+        record = CompressionRecord(eligible=True, method="rules", original_tokens_est=step.metadata["raw_tokens_est"],
+                                   reduced_chars=30, reduced_tokens_est=20,
+                                   saved_tokens_est=step.metadata["raw_tokens_est"] - 20)
+        agent._apply_compression(step, "999 passed, 1 failed (test_500)", record, None)
+        # Savings are measured against the head/tail view the planner actually had.
+        self.assertEqual(record.saved_tokens_est, shown - 20)
+        self.assertIn("show_output 1 <start>-<end>", agent.planner.managed_history[2]["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import re
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+
+from src.image_selector import ImageSelector
+from src.persistent_cache import JsonFileCache
+
+
+class FakeRelevanceClient:
+    """Answers Yes for manifests and No for everything else, per file in the prompt."""
+
+    def __init__(self, omit=()):
+        self.omit = set(omit)
+        self.prompts = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        with self._lock:
+            self.prompts.append(prompt)
+        lines = []
+        for path in re.findall(r"------ START FILE (\S+) ------", prompt):
+            if path in self.omit:
+                continue
+            verdict = "Yes" if path.endswith(("pom.xml", "requirements.txt")) else "No"
+            lines.append(f'<rel file="{path}">{verdict}</rel>')
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15),
+            choices=[SimpleNamespace(message=SimpleNamespace(content="\n".join(lines)))],
+        )
+
+
+class RelevanceBatchingTests(unittest.TestCase):
+    def setUp(self):
+        self.repo = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.files = [f"module{i}/pom.xml" for i in range(10)] + ["src/main.py", "requirements.txt"]
+        for path in self.files:
+            full_path = os.path.join(self.repo.name, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w", encoding="utf-8") as f:
+                f.write(f"contents of {path}\n")
+
+    def tearDown(self):
+        self.repo.cleanup()
+        self.cache_dir.cleanup()
+
+    def _selector(self, client):
+        return ImageSelector(
+            client,
+            model="m",
+            relevance_cache=JsonFileCache("relevance", cache_dir=self.cache_dir.name),
+        )
+
+    def test_batches_files_and_preserves_order(self):
+        client = FakeRelevanceClient()
+        selector = self._selector(client)
+
+        relevant = selector._filter_relevant_files(self.repo.name, self.files)
+
+        self.assertEqual(len(client.prompts), 2)
+        self.assertEqual(relevant, [path for path in self.files if path != "src/main.py"])
+        self.assertEqual(selector.get_token_usage()["total_tokens"], 30)
+
+    def test_cached_verdicts_cost_no_calls(self):
+        self._selector(FakeRelevanceClient())._filter_relevant_files(self.repo.name, self.files)
+
+        client = FakeRelevanceClient()
+        relevant = self._selector(client)._filter_relevant_files(self.repo.name, self.files)
+
+        self.assertEqual(client.prompts, [])
+        self.assertNotIn("src/main.py", relevant)
+        self.assertEqual(len(relevant), 11)
+
+    def test_missing_verdict_is_kept_but_not_cached(self):
+        selector = self._selector(FakeRelevanceClient(omit={"src/main.py"}))
+        self.assertIn("src/main.py", selector._filter_relevant_files(self.repo.name, ["src/main.py"]))
+
+        client = FakeRelevanceClient()
+        relevant = self._selector(client)._filter_relevant_files(self.repo.name, ["src/main.py"])
+        self.assertEqual(len(client.prompts), 1)
+        self.assertEqual(relevant, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+from src.repo_index import RepoIndex
+
+
+def _write(root, rel_path, content="x\n"):
+    full_path = os.path.join(root, rel_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+class RepoIndexTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = self._tmp.name
+        for path in ("setup.py", "README.md", "pkg/__init__.py", "pkg/core.py",
+                     "pkg/sub/util.py", "node_modules/dep/package.json", ".github/workflows/ci.yml"):
+            _write(self.repo, path)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_build_matches_os_walk_order_and_skips_dirs(self):
+        index = RepoIndex.build(self.repo)
+        self.assertEqual(index.files, [
+            "README.md", "setup.py", ".github/workflows/ci.yml",
+            "pkg/__init__.py", "pkg/core.py", "pkg/sub/util.py",
+        ])
+        self.assertIsNone(index.size("node_modules/dep/package.json"))
+        self.assertEqual(index.size("./pkg/core.py"), 2)
+
+    def test_manifests_and_histogram(self):
+        index = RepoIndex.build(self.repo)
+        self.assertIn("setup.py", index.manifest_files())
+        self.assertIn(".github/workflows/ci.yml", index.manifest_files())
+        self.assertEqual(index.extension_histogram()[".py"], 4)
+
+    def test_language_hints_use_indexed_manifests(self):
+        _write(self.repo, "setup.py", "from setuptools import setup\nsetup(name='pkg')\n")
+        language, confidence, scores = RepoIndex.build(self.repo).language_hints()
+        self.assertEqual(language, "python")
+        self.assertGreater(confidence, 0)
+        self.assertIn("python", scores)
+
+    def test_read_text_reads_each_file_once(self):
+        index = RepoIndex.build(self.repo)
+        self.assertEqual(index.read_text("setup.py"), "x\n")
+        _write(self.repo, "setup.py", "changed\n")
+        self.assertEqual(index.read_text("setup.py"), "x\n")
+        self.assertEqual(index.read_text("setup.py", max_bytes=1), "x")
+        self.assertIsNone(index.read_text("missing.txt"))
+
+    def test_large_files_are_truncated(self):
+        _write(self.repo, "big.txt", "a" * (RepoIndex.MAX_READ_BYTES + 10))
+        index = RepoIndex.build(self.repo)
+        self.assertEqual(len(index.read_text("big.txt")), RepoIndex.MAX_READ_BYTES)
+
+    def test_small_tree_renders_in_full(self):
+        index = RepoIndex.build(self.repo)
+        name = os.path.basename(self.repo)
+        self.assertEqual(index.render_collapsed_structure(4000).splitlines(), [
+            f"{name}/", "  README.md", "  setup.py",
+            "  .github/workflows/", "    ci.yml",
+            "  pkg/", "    __init__.py", "    core.py", "    sub/", "      util.py",
+        ])
+
+
+
+class CollapsedStructureTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = self._tmp.name
+        for path in ("setup.py", ".github/workflows/ci.yml", "services/api/deep/requirements.txt"):
+            _write(self.repo, path)
+        for i in range(300):
+            _write(self.repo, f"tests/fixtures/case_{i}.json")
+        for i in range(60):
+            _write(self.repo, f"pkg/module_{i}.py")
+            _write(self.repo, f"services/api/deep/handler_{i}.py")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_homogeneous_directories_collapse(self):
+        text = RepoIndex.build(self.repo).render_collapsed_structure(4000)
+        self.assertIn("  tests/fixtures/ (300 *.json)", text.splitlines())
+        self.assertNotIn("case_10.json", text)
+        self.assertIn("... (20 *.py)", text)
+
+    def test_manifests_survive_tight_budget(self):
+        index = RepoIndex.build(self.repo)
+        text = index.render_collapsed_structure(60)
+        self.assertLessEqual(len(text) // 4, 60)
+        self.assertIn("requirements.txt", text)
+        self.assertIn("ci.yml", text)
+        self.assertIn("setup.py", text)
+        self.assertNotIn("module_1.py", text)
+
+    def test_budget_is_a_hard_cap(self):
+        text = RepoIndex.build(self.repo).render_collapsed_structure(5)
+        self.assertIn("structure truncated", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import json
+import os
+import re
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from src.image_selector import ImageSelector
+from src.persistent_cache import JsonFileCache
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls += 1
+        prompt = kwargs["messages"][0]["content"]
+        paths = re.findall(r"------ START FILE (\S+) ------", prompt)
+        content = "\n".join(f'<rel file="{path}">Yes</rel>' for path in paths)
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class SelectionCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.repo = tempfile.TemporaryDirectory()
+        self.cache = tempfile.TemporaryDirectory()
+        self.logs = tempfile.TemporaryDirectory()
+        self._write("pyproject.toml", '[project]\nrequires-python = ">=3.9,<3.11"\n')
+        self._write("requirements.txt", "requests\n")
+        self._write("README.md", "# demo\n")
+        for i in range(12):
+            self._write(f"pkg/mod{i}.py", "x = 1\n")
+
+    def tearDown(self):
+        for directory in (self.repo, self.cache, self.logs):
+            directory.cleanup()
+
+    def _write(self, rel_path, content):
+        path = os.path.join(self.repo.name, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def _select(self):
+        client = CountingClient()
+        selector = ImageSelector(
+            client,
+            model="m",
+            relevance_cache=JsonFileCache("relevance", cache_dir=self.cache.name, enabled=False),
+            selection_cache=JsonFileCache("image_selection", cache_dir=self.cache.name),
+        )
+        result = selector.select_base_image(self.repo.name, log_dir=self.logs.name)
+        with open(os.path.join(self.logs.name, "summary.json"), encoding="utf-8") as f:
+            summary = json.load(f)
+        return client.calls, result, summary
+
+    def test_hit_skips_all_llm_calls_and_still_writes_logs(self):
+        first_calls, first, first_summary = self._select()
+        self.assertGreater(first_calls, 0)
+        self.assertFalse(first_summary["cache_hit"])
+
+        os.remove(os.path.join(self.logs.name, "structure.txt"))
+        calls, result, summary = self._select()
+
+        self.assertEqual(calls, 0)
+        self.assertEqual(result[0], first[0])
+        self.assertEqual(result[0], "python:3.9")
+        self.assertEqual(result[1].language, "python")
+        self.assertEqual(result[2], first[2])
+        self.assertTrue(summary["cache_hit"])
+        self.assertEqual(summary["relevant_files"], first_summary["relevant_files"])
+        self.assertTrue(os.path.exists(os.path.join(self.logs.name, "structure.txt")))
+
+    def test_manifest_change_invalidates_entry(self):
+        self._select()
+        self._write("pyproject.toml", '[project]\nrequires-python = ">=3.12"\n')
+
+        calls, result, summary = self._select()
+
+        self.assertGreater(calls, 0)
+        self.assertFalse(summary["cache_hit"])
+        self.assertEqual(result[0], "python:3.12")
+
+    def test_source_change_invalidates_entry(self):
+        self._select()
+        for i in range(40):
+            self._write(f"web/app{i}.js", "module.exports = 1;\n")
+
+        calls, _, summary = self._select()
+
+        self.assertGreater(calls, 0)
+        self.assertFalse(summary["cache_hit"])
+
+
+class LLMSelectionPlatformTests(unittest.TestCase):
+    def test_rule_based_arch_override_survives_the_llm_path(self):
+        reply = SimpleNamespace(content="<image>python:3.9</image>")
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            create=lambda **kwargs: SimpleNamespace(usage=None, choices=[SimpleNamespace(message=reply)])
+        )))
+        selector = ImageSelector(client, model="m")
+        self.assertEqual(
+            selector._llm_select_base_image("docs", "python", ["python:3.9"], "linux/amd64"),
+            ("python:3.9", "linux/amd64"),
+        )
+        self.assertEqual(selector._llm_select_base_image("docs", "python", ["python:3.9"]), ("python:3.9", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+
+from src import tokenizer
+from src.observation_compressor import RunTokenLedger
+from src.planner import Planner
+from src.tokenizer import (
+    HeuristicCounter,
+    TokenCounter,
+    encoding_for_model,
+    get_tokenizer,
+    register_tokenizer,
+)
+
+
+class CharCounter(TokenCounter):
+    name = "chars"
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def _count(self, text):
+        self.calls += 1
+        return len(text)
+
+
+class HeuristicCounterTests(unittest.TestCase):
+    def test_counts_dense_text_above_four_chars_per_token(self):
+        counter = HeuristicCounter()
+        cjk = "安装依赖时出现错误，请检查网络连接并重试。"
+        self.assertEqual(counter.count(""), 0)
+        self.assertGreaterEqual(counter.count(cjk), len(cjk) - 2)
+        self.assertGreater(counter.count("numpy==1.26.4 (18.3 MB)"), len("numpy==1.26.4 (18.3 MB)") // 4)
+        self.assertLessEqual(counter.count("hello world"), 3)
+
+    def test_truncate_stays_within_budget(self):
+        counter = HeuristicCounter()
+        text = "\n".join(f"tests/test_{i}.py::test_case PASSED [ {i}%]" for i in range(500))
+        cut = counter.truncate(text, 300)
+        self.assertTrue(text.startswith(cut))
+        self.assertLessEqual(counter.count(cut), 300)
+        self.assertGreater(counter.count(cut), 250)
+        self.assertEqual(counter.truncate("short", 300), "short")
+
+
+class MemoTests(unittest.TestCase):
+    def test_repeated_long_strings_are_counted_once(self):
+        counter = CharCounter()
+        text = "x" * 500
+        self.assertEqual(counter.count(text), 500)
+        self.assertEqual(counter.count("x" * 500), 500)
+        self.assertEqual(counter.calls, 1)
+        self.assertEqual(counter.get_stats()["memo_hits"], 1)
+
+    def test_memo_evicts_least_recently_used(self):
+        counter = CharCounter()
+        counter.memo_size = 2
+        a, b, c = ("a" * 100), ("b" * 100), ("c" * 100)
+        counter.count(a)
+        counter.count(b)
+        counter.count(a)
+        counter.count(c)
+        calls = counter.calls
+        counter.count(a)
+        self.assertEqual(counter.calls, calls)
+        counter.count(b)
+        self.assertEqual(counter.calls, calls + 1)
+
+
+class RegistryTests(unittest.TestCase):
+    def tearDown(self):
+        tokenizer._factories[:] = [entry for entry in tokenizer._factories if entry[0] != "toy-"]
+
+    def test_model_prefixes_pick_encodings(self):
+        self.assertEqual(encoding_for_model("gpt-4o-mini"), "o200k_base")
+        self.assertEqual(encoding_for_model("openai/gpt-4-turbo"), "cl100k_base")
+        self.assertEqual(encoding_for_model("qwen3-max-2026-01-23"), tokenizer.DEFAULT_ENCODING)
+
+    def test_counters_are_shared_and_custom_factories_win(self):
+        self.assertIs(get_tokenizer("qwen3-max"), get_tokenizer("qwen3-plus"))
+        register_tokenizer("toy-", CharCounter)
+        counter = get_tokenizer("toy-1")
+        self.assertIsInstance(counter, CharCounter)
+        self.assertIs(get_tokenizer("toy-2"), counter)
+        self.assertEqual(tokenizer.count_tokens("abcdef", model="toy-1"), 6)
+
+
+class PlannerCountingTests(unittest.TestCase):
+    def test_prompt_estimate_is_maintained_incrementally(self):
+        planner = Planner(client=None, model="gpt-4o")
+        planner.init_managed_history("https://github.com/example/repo")
+        planner.append_step(1, "Thought: install\nAction: pip install .", "Collecting x\n" * 200)
+        planner.append_step(2, "Thought: test\nAction: pytest", "ok")
+
+        def recount():
+            return planner.tokenizer.count(planner.system_prompt) + sum(
+                planner.tokenizer.count(message["content"]) for message in planner.managed_history
+            )
+
+        self.assertEqual(planner.estimate_prompt_tokens(), recount())
+        before = planner.estimate_prompt_tokens()
+        planner.replace_observation(1, "installed x")
+        self.assertEqual(planner.estimate_prompt_tokens(), recount())
+        self.assertLess(planner.estimate_prompt_tokens(), before)
+
+    def test_ledger_tracks_estimated_input(self):
+        ledger = RunTokenLedger()
+        ledger.add("planner", input_tokens=1000, output_tokens=50, estimated_input_tokens=950)
+        ledger.add("reflection", input_tokens=10, output_tokens=5)
+        self.assertEqual(ledger.planner.estimated_input_tokens, 950)
+        self.assertEqual(ledger.total.estimated_input_tokens, 950)
+        self.assertEqual(ledger.total.total_tokens, 1065)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import unittest
+from types import SimpleNamespace
+
+from src.planner import PLANNER_TOOLS, Planner
+
+
+def _tool_call(name, arguments):
+    return SimpleNamespace(
+        function=SimpleNamespace(name=name, arguments=json.dumps(arguments))
+    )
+
+
+class FakeToolClient:
+    def __init__(self, message):
+        self.message = message
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        return SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=20, completion_tokens=5, total_tokens=25),
+            choices=[SimpleNamespace(message=self.message)],
+        )
+
+
+class ToolCallingPlannerTests(unittest.TestCase):
+    def test_run_command_tool_call_becomes_action(self):
+        client = FakeToolClient(
+            SimpleNamespace(
+                content="Inspect the manifest first.",
+                tool_calls=[_tool_call("run_command", {"command": "cat setup.py"})],
+            )
+        )
+        planner = Planner(client=client, tool_calling=True)
+
+        thought, action, content, is_finished, _ = planner.plan(repo_url="https://example.com/r")
+
+        self.assertEqual(thought, "Inspect the manifest first.")
+        self.assertEqual(action, "cat setup.py")
+        self.assertFalse(is_finished)
+        self.assertEqual(client.requests[0]["tools"], PLANNER_TOOLS)
+        self.assertNotIn("stop", client.requests[0])
+        self.assertEqual(planner.history[-1]["content"], content)
+
+    def test_finish_tool_call_sets_verification_bundle(self):
+        bundle = {"runtime_preparation_commands": [], "test_commands": ["pytest -q"]}
+        client = FakeToolClient(
+            SimpleNamespace(content="Tests pass.", tool_calls=[_tool_call("finish", bundle)])
+        )
+        planner = Planner(client=client, tool_calling=True)
+
+        _, _, content, is_finished, _ = planner.plan(repo_url="https://example.com/r")
+
+        self.assertTrue(is_finished)
+        self.assertIn("Final Answer: Success", content)
+        self.assertEqual(planner.last_verification_bundle, bundle)
+
+    def test_multiple_run_commands_batch_only_when_enabled(self):
+        message = SimpleNamespace(
+            content="",
+            tool_calls=[
+                _tool_call("run_command", {"command": "cat README.md"}),
+                _tool_call("run_command", {"command": "ls tests"}),
+            ],
+        )
+        planner = Planner(client=FakeToolClient(message), tool_calling=True, batch_actions=True)
+        planner.plan(repo_url="https://example.com/r")
+        self.assertEqual(planner.last_batch_actions, ["cat README.md", "ls tests"])
+
+        planner = Planner(client=FakeToolClient(message), tool_calling=True)
+        _, action, content, _, _ = planner.plan(repo_url="https://example.com/r")
+        self.assertEqual(action, "cat README.md")
+        self.assertIsNone(planner.last_batch_actions)
+        self.assertIn("1 additional run_command call(s) were not executed", content)
+
+    def test_multi_line_command_is_kept_verbatim(self):
+        command = "cat > conf.yml <<EOF\nname: demo\nversion: 1\nEOF"
+        client = FakeToolClient(
+            SimpleNamespace(content="Write the config.", tool_calls=[_tool_call("run_command", {"command": command})])
+        )
+        planner = Planner(client=client, tool_calling=True)
+
+        thought, action, _, _, _ = planner.plan(repo_url="https://example.com/r")
+
+        self.assertEqual(thought, "Write the config.")
+        self.assertEqual(action, command)
+
+    def test_falls_back_to_text_when_no_tool_call(self):
+        client = FakeToolClient(
+            SimpleNamespace(content="Thought: check\nAction: ls -la", tool_calls=None)
+        )
+        planner = Planner(client=client, tool_calling=True)
+
+        _, action, _, _, _ = planner.plan(repo_url="https://example.com/r")
+
+        self.assertEqual(action, "ls -la")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+
+from agent import DockerAgent
+from src.observation_compressor import RunTokenLedger
+from src.trajectory_monitor import TrajectoryMonitor, observation_signature
+
+
+class ObservationSignatureTests(unittest.TestCase):
+    def test_ignores_numbers_and_whitespace(self):
+        self.assertEqual(
+            observation_signature("Took 1.23s\nerror at line 42"),
+            observation_signature("Took 9.87s   error at line 7"),
+        )
+        self.assertNotEqual(
+            observation_signature("ModuleNotFoundError: foo"),
+            observation_signature("ModuleNotFoundError: bar"),
+        )
+
+
+class TrajectoryMonitorTests(unittest.TestCase):
+    def test_repeated_failure_warns_then_terminates(self):
+        monitor = TrajectoryMonitor()
+        verdicts = [
+            monitor.observe(step, "pip install foo", False, "ERROR: no matching distribution", 0)
+            for step in range(1, 4)
+        ]
+        self.assertIsNone(verdicts[0])
+        self.assertEqual(verdicts[2].kind, "warn")
+        self.assertIn("[SYSTEM]", verdicts[2].message)
+
+        later = [
+            monitor.observe(step, "pip install foo", False, "ERROR: no matching distribution", 0)
+            for step in range(4, 7)
+        ]
+        self.assertEqual(later[-1].kind, "terminate")
+        self.assertTrue(monitor.terminated)
+        self.assertEqual(monitor.termination_step, 6)
+
+    def test_repeated_successful_runs_are_not_flagged(self):
+        monitor = TrajectoryMonitor()
+        for step in range(1, 8):
+            self.assertIsNone(monitor.observe(step, "pytest", True, "5 passed in 0.12s", 2))
+
+    def test_repeated_failure_after_an_environment_change_is_not_flagged(self):
+        monitor = TrajectoryMonitor()
+        verdicts = [
+            monitor.observe(step, "pytest", False, "1 failed", revision)
+            for step, revision in enumerate([0, 0, 1], start=1)
+        ]
+        self.assertEqual(verdicts, [None, None, None])
+
+    def test_warning_is_cleared_after_recovery(self):
+        monitor = TrajectoryMonitor()
+        verdicts = [monitor.observe(step, "make", False, "make: *** No rule", 0) for step in range(1, 4)]
+        self.assertEqual(verdicts[-1].kind, "warn")
+        for step in range(4, 12):
+            self.assertIsNone(monitor.observe(step, f"cat file{step}", True, f"contents {step}", 0))
+        self.assertIsNone(monitor.warned_at)
+
+        # An unrelated loop much later is warned about before it can stop the run.
+        verdicts = [monitor.observe(step, "npm ci", False, "npm ERR! 404", 0) for step in range(30, 33)]
+        self.assertEqual(verdicts[-1].kind, "warn")
+        self.assertFalse(monitor.terminated)
+
+    def test_detects_alternation(self):
+        monitor = TrajectoryMonitor()
+        verdict = None
+        for step, command in enumerate(["npm test", "yarn test", "npm test", "yarn test"], start=1):
+            verdict = monitor.observe(step, command, False, f"{command}: failed", 0)
+        self.assertEqual(verdict.kind, "warn")
+        self.assertIn("alternating", verdict.reason)
+
+    def test_alternation_that_makes_progress_is_not_flagged(self):
+        monitor = TrajectoryMonitor()
+        revision = 0
+        for step in range(1, 9):
+            if step % 2:
+                revision += 1
+                self.assertIsNone(monitor.observe(step, "sed -i 's/a/b/' conf.py", True, "", revision))
+            else:
+                self.assertIsNone(monitor.observe(step, "pytest -q", True, "3 passed", revision))
+
+        monitor = TrajectoryMonitor()
+        for step in range(1, 9):
+            command = "cat README.md" if step % 2 else "pytest -q"
+            self.assertIsNone(monitor.observe(step, command, True, f"{command}: ok", 0))
+
+    def test_distinct_progress_is_not_flagged(self):
+        monitor = TrajectoryMonitor()
+        for step in range(1, 15):
+            self.assertIsNone(
+                monitor.observe(step, f"cat file{step}", True, f"contents {chr(96 + step)}", step)
+            )
+
+    def test_stall_requires_unchanged_revision_and_failures(self):
+        monitor = TrajectoryMonitor(stall_window=4)
+        verdict = None
+        for step, command in enumerate(["a", "b", "c", "d"], start=1):
+            verdict = monitor.observe(step, command, False, f"{command} missing", 3)
+        self.assertEqual(verdict.kind, "warn")
+        self.assertIn("has not changed", verdict.reason)
+
+
+class AgentTrajectoryTests(unittest.TestCase):
+    def test_check_trajectory_records_savings(self):
+        agent = DockerAgent.__new__(DockerAgent)
+        agent.trajectory_monitor = TrajectoryMonitor(grace_steps=0)
+        agent.run_token_ledger = RunTokenLedger()
+        agent._environment_revision = 0
+        agent.run_token_ledger.add("planner", input_tokens=900, output_tokens=100)
+
+        results = [
+            agent._check_trajectory(step, 30, "make", False, "make: *** No rule")
+            for step in range(1, 7)
+        ]
+
+        self.assertTrue(results[2][0].startswith("[SYSTEM]"))
+        self.assertTrue(results[-1][1])
+        summary = agent.trajectory_monitor.get_summary()
+        self.assertEqual(summary["steps_saved"], 24)
+        self.assertEqual(summary["estimated_tokens_saved"], 4000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import unittest
+
+from src.language_handlers import get_language_handler
+from src.version_solver import (
+    VersionSolver,
+    constraint_allows,
+    parse_pep440_spec,
+    parse_semver_range,
+)
+
+
+def _solver(files):
+    return VersionSolver(lambda path: files.get(path), list(files))
+
+
+def _solve(language, files):
+    return _solver(files).solve(language, get_language_handler(language).base_images("linux"))
+
+
+class ConstraintParsingTests(unittest.TestCase):
+    def test_pep440(self):
+        constraint = parse_pep440_spec(">=3.8, <3.11")
+        self.assertTrue(constraint_allows(constraint, (3, 10)))
+        self.assertFalse(constraint_allows(constraint, (3, 11)))
+        self.assertFalse(constraint_allows(constraint, (3, 7)))
+        self.assertTrue(constraint_allows(parse_pep440_spec(">=3.8.1"), (3, 8)))
+        self.assertFalse(constraint_allows(parse_pep440_spec("~=3.9"), (4, 0)))
+        self.assertFalse(constraint_allows(parse_pep440_spec("==3.9.*"), (3, 10)))
+
+    def test_semver_flavors(self):
+        self.assertTrue(constraint_allows(parse_semver_range("^7.4 || ^8.0", "composer"), (8, 3)))
+        self.assertFalse(constraint_allows(parse_semver_range("~7.4", "npm"), (7, 5)))
+        self.assertTrue(constraint_allows(parse_semver_range("~7.4", "composer"), (7, 5)))
+        self.assertFalse(constraint_allows(parse_semver_range(">=16 <20"), (20,)))
+        self.assertTrue(constraint_allows(parse_semver_range("18.x"), (18,)))
+        self.assertFalse(constraint_allows(parse_semver_range("~> 3.1.2", "gem"), (3, 2)))
+
+
+class VersionSolverTests(unittest.TestCase):
+    def test_python_classifiers_are_authoritative(self):
+        decision = _solve("python", {
+            "setup.py": (
+                "python_requires='>=3.6',\n"
+                "'Programming Language :: Python :: 3.7',\n"
+                "'Programming Language :: Python :: 3.8',\n"
+            ),
+            ".github/workflows/ci.yml": "python-version: ['3.11', '3.12']",
+        })
+        self.assertEqual(decision.image, "python:3.8")
+
+    def test_python_ci_and_tox_take_the_lowest_tested_version(self):
+        workflow = 'python-version: ["3.8", "3.9", "3.12"]'
+        self.assertEqual(_solve("python", {".github/workflows/ci.yml": workflow}).image, "python:3.8")
+        self.assertEqual(_solve("python", {"tox.ini": "[tox]\nenvlist = py311, py39, lint\n"}).image, "python:3.9")
+        decision = _solve("python", {
+            ".github/workflows/ci.yml": workflow,
+            "pyproject.toml": 'requires-python = ">=3.9"',
+        })
+        self.assertEqual(decision.image, "python:3.9")
+        self.assertEqual(decision.alternatives, ["python:3.9", "python:3.12"])
+
+    def test_python_classifiers_take_the_highest_supported_version(self):
+        classifiers = "".join(f"'Programming Language :: Python :: 3.{minor}',\n" for minor in (8, 9, 10))
+        decision = _solve("python", {"setup.py": classifiers})
+        self.assertEqual(decision.image, "python:3.10")
+        self.assertEqual(decision.alternatives, ["python:3.10", "python:3.9", "python:3.8"])
+
+    def test_python_pin_conflicting_with_range_defers_to_llm(self):
+        decision = _solve("python", {
+            ".python-version": "3.7.9\n",
+            "pyproject.toml": 'requires-python = ">=3.9"',
+        })
+        self.assertIsNone(decision.image)
+        self.assertTrue(decision.conflict)
+
+    def test_python_open_range_takes_the_declared_floor(self):
+        self.assertEqual(_solve("python", {"pyproject.toml": 'requires-python = ">=3.8,<3.11"'}).image, "python:3.8")
+        self.assertEqual(_solve("python", {"pyproject.toml": 'requires-python = ">=3.8"'}).image, "python:3.8")
+        self.assertEqual(_solve("python", {"setup.py": 'python_requires=">=3.6"'}).image, "python:3.6")
+
+    def test_node_engines_and_nvmrc(self):
+        package = json.dumps({"engines": {"node": ">=18"}})
+        self.assertEqual(_solve("javascript", {"package.json": package}).image, "node:18")
+        self.assertEqual(_solve("javascript", {"package.json": package, ".nvmrc": "lts/hydrogen"}).image, "node:18")
+
+    def test_rust_go_php_java(self):
+        self.assertEqual(_solve("rust", {"Cargo.toml": 'rust-version = "1.74"'}).image, "rust:1.74")
+        self.assertEqual(_solve("rust", {"rust-toolchain.toml": '[toolchain]\nchannel = "1.75.0"'}).image, "rust:1.75")
+        self.assertEqual(_solve("go", {"go.mod": "module x\n\ngo 1.21\n"}).image, "golang:1.21")
+        self.assertEqual(
+            _solve("php", {"composer.json": json.dumps({"require": {"php": "^7.4 || ~8.0.0"}})}).image,
+            "php:7.4-cli",
+        )
+        self.assertEqual(
+            _solve("java", {"pom.xml": "<maven.compiler.release>17</maven.compiler.release>",
+                            "core/pom.xml": "<java.version>1.8</java.version>"}).image,
+            "eclipse-temurin:17-jdk-noble",
+        )
+
+    def test_no_declarations_defers_to_llm(self):
+        decision = _solve("go", {"README.md": "hello"})
+        self.assertIsNone(decision.image)
+        self.assertFalse(decision.conflict)
+
+
+if __name__ == "__main__":
+    unittest.main()